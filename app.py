@@ -1,79 +1,157 @@
 import os
-from flask import Flask
+
+import click
+from flask import Flask, current_app, session
+from flask.cli import with_appcontext
 from flask_login import LoginManager
-from flask_wtf.csrf import CSRFProtect
-from flask_ckeditor import CKEditor
-from flask_bootstrap import Bootstrap5
-from flask_migrate import upgrade
-from sqlalchemy.exc import SQLAlchemyError
 
+from config import Config, INSTANCE_PATH
 from models import db
-from models.user import User
-from custom_flask_auth.auth import auth_bp  # Only auth for now
-
-# Initialize Flask application
-app = Flask(__name__)
-
-# Define instance folder
-BASEDIR = os.path.abspath(os.path.dirname(__file__))
-instance_path = os.path.join(BASEDIR, 'instance')
-os.makedirs(instance_path, exist_ok=True)
-
-# Basic configuration
-app.config['SECRET_KEY'] = os.environ.get("SECRET_APP_KEY", "default_secret_key")
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
-    "DATABASE_URI", f"sqlite:///{os.path.join(instance_path, 'User_Auth.db')}"
-)
-
-# Auto-run migrations on startup
-@app.before_first_request
-def apply_migrations():
-    with app.app_context():
-        try:
-            upgrade()
-        except Exception as e:
-            print(f"Migration error: {e}")
-
-# Initialize extensions
-ckeditor = CKEditor(app)
-Bootstrap5(app)
-csrf = CSRFProtect(app)
-db.init_app(app)
+from custom_flask_auth.auth import auth_bp
+from custom_flask_auth.dashboard import dashboard_bp
+from utils.hash_executor import hash_executor
+from utils.password_hashing import hashing_cli
+from utils.user_io import users_cli
+from utils.user_cache import user_cache, parse_session_id
+from utils.permissions import permission_table
+from utils.metrics import metrics
+from utils.rate_limit import rate_limiter
+from utils.background import background_tasks
+from utils.reset_tokens import reset_tokens
+from utils.templating import template_cache
+from utils.db_routing import db_routing, read_primary, read_replica
+from utils.breached_passwords import breached_passwords, breached_cli
+from utils.validation import validation
+from utils.audit import audit_log, audit_cli
+from utils.sharding import user_shards, shards_cli
 
 # Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth_bp.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, user_id)
+    if session.modified and session.get('_fresh') is False:
+        # Flask-Login is restoring a remember-me cookie (it writes the id to the session just before calling
+        # this): this process's cached epoch may predate a "log out everywhere" done in another worker
+        user_cache.invalidate(parse_session_id(user_id)[0])
+        with read_primary():
+            return user_cache.load(user_id)
+    # Served from the per-process principal cache; only a miss touches the database (a replica, if any)
+    with read_replica():
+        return user_cache.load(user_id)
+
+
+def init_optional_extensions(app):
+    """Initializes only the extensions listed in EXTENSIONS, importing each one on demand."""
+    enabled = set(app.config['EXTENSIONS'])
+
+    if 'csrf' in enabled:
+        from flask_wtf.csrf import CSRFProtect
+        CSRFProtect(app)
+    if 'bootstrap' in enabled:
+        from flask_bootstrap import Bootstrap5
+        Bootstrap5(app)
+    if 'ckeditor' in enabled:
+        from flask_ckeditor import CKEditor
+        CKEditor(app)
+    if 'migrate' in enabled:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if 'sessions' in enabled:
+        # Server-side sessions; the cookie only carries a session id
+        from utils.server_session import server_sessions
+        server_sessions.init_app(app)
+        metrics.registry.add_collector(server_sessions.store.collect)
+    if 'outbox' in enabled:
+        # Background delivery of queued emails
+        from utils.outbox import outbox_worker
+        outbox_worker.init_app(app)
+
+
+def create_app(config=None):
+    """
+    Application factory.
+
+    param config: A config class/object, or a dict of overrides applied on top of `Config`
+    Returns: The configured Flask app (Flask)
 
-# Register blueprints
-app.register_blueprint(auth_bp)
+    Nothing here touches the database: run `flask init-db` (or `flask db upgrade`) once per deployment
+    instead of migrating on the first request of every worker.
+    """
+    app = Flask(__name__, instance_path=INSTANCE_PATH)
+    if isinstance(config, dict):
+        app.config.from_object(Config)
+        app.config.from_mapping(config)
+    else:
+        app.config.from_object(config or Config)
+    os.makedirs(app.instance_path, exist_ok=True)
 
-# TODO: Register `dashboard_bp/ admin_dashboard` when dashboard module is ready
-# from custom_flask_auth.dashboard import dashboard_bp
-# app.register_blueprint(dashboard_bp)
+    # Core extensions
+    metrics.init_app(app)
+    db_routing.init_app(app)  # Replica binds and pool options, before db creates the engines
+    user_shards.init_app(app)  # One bind per user shard, if USER_SHARD_URIS is set
+    db.init_app(app)
+    hash_executor.init_app(app)  # Bounded pool for password hashing
+    user_cache.init_app(app)
+    rate_limiter.init_app(app)
+    background_tasks.init_app(app)
+    reset_tokens.init_app(app)
+    breached_passwords.init_app(app)  # Opens the breached-password index lazily, if one is installed
+    validation.init_app(app)
+    audit_log.init_app(app)  # Write-behind audit log of logins, registrations and resets
+    metrics.registry.add_collector(user_cache.collect)
+    metrics.registry.add_collector(validation.collect)
+    metrics.registry.add_collector(audit_log.collect)
+    login_manager.init_app(app)
+    init_optional_extensions(app)
 
-# TODO: Register `portfolio_bp/ user_dashboard` when portfolio module is ready
-# from custom_flask_auth.portfolio import portfolio_bp
-# app.register_blueprint(portfolio_bp)
+    # Register blueprints
+    app.register_blueprint(auth_bp)
 
-# Optional: Custom error handlers
-@app.errorhandler(404)
-def page_not_found(e):
-    return "Page not found", 404  # Simplified for now
-    #return render_template('404.html'), 404
+    # Admin dashboard (user listing API for now)
+    app.register_blueprint(dashboard_bp)
 
+    # TODO: Register `portfolio_bp/ user_dashboard` when portfolio module is ready
+    # from custom_flask_auth.portfolio import portfolio_bp
+    # app.register_blueprint(portfolio_bp)
 
-# Auto-create tables
-with app.app_context():
-    try:
+    # Bytecode cache and template prewarm (after every blueprint has added its template folder)
+    template_cache.init_app(app)
+
+    # Compile the endpoint -> required-role table (after every blueprint is registered)
+    permission_table.init_app(app)
+
+    app.cli.add_command(hashing_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(breached_cli)
+    app.cli.add_command(audit_cli)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(init_db_command)
+
+    # Optional: Custom error handlers
+    @app.errorhandler(404)
+    def page_not_found(e):
+        return "Page not found", 404  # Simplified for now
+        #return render_template('404.html'), 404
+
+    return app
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the database schema (run once per deployment, not per worker)."""
+    if 'migrate' in current_app.config['EXTENSIONS']:
+        from flask_migrate import upgrade
+        upgrade()
+    else:
         db.create_all()
-    except SQLAlchemyError as e:
-        db.session.rollback()
+    if 'user_shards' in current_app.extensions:
+        user_shards.create_tables()
+    click.echo('Database is up to date.')
+
 
 # Run the app
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    create_app().run(debug=True, port=5002)
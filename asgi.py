@@ -0,0 +1,45 @@
+# asgi.py
+# ASGI entry point: uvicorn owns the sockets on an event loop and runs the Flask app in a wide thread pool.
+#
+#   uvicorn asgi:application --workers 4 --port 5002
+#
+# Idle and slow clients cost a coroutine, not a worker, and a request waiting on a password hash parks a
+# thread (hashing runs in the process pool) instead of a whole sync worker, so one process can keep many
+# logins and resets in flight. Mail is already off the request path (outbox, background tasks).
+import os
+import warnings
+
+from app import create_app
+from config import Config
+
+
+class AsgiConfig(Config):
+    # Hash in processes so request threads only wait; the limit covers every thread in this process
+    HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS', os.cpu_count() or 1))
+    HASH_MAX_CONCURRENT = int(os.environ.get('HASH_MAX_CONCURRENT', 4 * (os.cpu_count() or 1)))
+    HASH_QUEUE_TIMEOUT = float(os.environ.get('HASH_QUEUE_TIMEOUT', 2.0))
+    # Requests handled at once by this process
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 64))
+
+
+def create_asgi_app(config=AsgiConfig):
+    """
+    This function wraps create_app() for an ASGI server.
+    param config: As for create_app(); ASGI_THREADS sizes the request thread pool
+    Returns: The ASGI application
+    """
+    flask_app = create_app(config)
+    threads = flask_app.config.get('ASGI_THREADS', AsgiConfig.ASGI_THREADS)
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError:
+        # uvicorn's own adapter works the same way but warns that a2wsgi is preferred. It never calls the
+        # response's close(), which is why BackgroundTasks.submit_after_response() does not rely on it.
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            return WSGIMiddleware(flask_app, workers=threads)
+    return WSGIMiddleware(flask_app, workers=threads)
+
+
+application = create_asgi_app()
@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+
+# Standalone performance scripts, run with `python -m benchmarks.<name>` from the project root.
@@ -0,0 +1,201 @@
+# benchmarks/asgi_vs_sync.py
+# Concurrent logins against gunicorn sync workers vs `uvicorn asgi:application`, same number of processes.
+# Optionally holds --idle-clients connections open with a half-sent request first, the way slow mobile
+# clients do: each one pins a sync worker, while the ASGI server parks it on the event loop.
+#
+# `--scenario reset` runs the forgot-password flow instead: concurrent POST /forgot-password for distinct
+# accounts, a count of the reset emails each server queued once its responses were sent, and concurrent
+# POST /reset-password/<token> with the links from those emails.
+#
+#   python -m benchmarks.asgi_vs_sync --processes 2 --concurrency 32 --requests 400 --idle-clients 4
+#   python -m benchmarks.asgi_vs_sync --scenario reset --requests 200
+import argparse
+import http.client
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks.auth_endpoints import BENCH_PASSWORD, load_app, seed_users
+
+RESET_PASSWORD = 'benchmark-password-reset'
+RESET_LINK = re.compile(r'/reset-password/([^"\'<>\s]+)')
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def csrf_credentials(port):
+    """GETs the login form once; returns (session cookie, csrf token) a client can reuse for many POSTs."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('GET', '/login')
+    response = connection.getresponse()
+    cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+    token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', response.read().decode()).group(1)
+    connection.close()
+    return cookie, token
+
+
+def post(port, path, fields, credentials, i):
+    """POSTs a form as client `i`. Returns: (seconds, status, Location header, body); status 0 on a socket error."""
+    cookie, token = credentials[i % len(credentials)]
+    body = urlencode({**fields, 'csrf_token': token})
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request('POST', path, body, {'Content-Type': 'application/x-www-form-urlencoded',
+                                                'Cookie': cookie})
+        response = connection.getresponse()
+        status, location, content = response.status, response.getheader('Location', ''), response.read()
+    except OSError:
+        status, location, content = 0, '', b''
+    finally:
+        connection.close()
+    return time.perf_counter() - started, status, location, content
+
+
+def login(port, users, credentials, i):
+    seconds, status, _, content = post(port, '/login', {'email': f'user{i % users}@example.com',
+                                                        'password': BENCH_PASSWORD}, credentials, i)
+    # A successful login answers with its plain-text welcome, a failed one re-renders the form
+    return seconds, status if content.startswith(b'Login successful') else 0
+
+
+def redirected_to_login(result):
+    # Both forms answer a success with a redirect to the login page, and a failure with one elsewhere
+    seconds, status, location, _ = result
+    return seconds, 200 if status == 302 and location.endswith('/login') else 0
+
+
+def in_parallel(concurrency, requests, fn):
+    """Returns: ([(seconds, status)] per request, wall-clock seconds for all of them)"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        results = list(clients.map(fn, range(requests)))
+    return results, time.perf_counter() - started
+
+
+def login_scenario(port, credentials, args, flask_app):
+    login(port, args.users, credentials, 0)  # warm up
+    return [('logins', *in_parallel(args.concurrency, args.requests,
+                                    lambda i: login(port, args.users, credentials, i)))]
+
+
+def queued_reset_tokens(flask_app, expected, timeout=60):
+    """Waits until `expected` reset emails are in the outbox (or `timeout` passes); returns their tokens."""
+    from models import db
+    from models.outbox import OutboxMessage
+
+    deadline = time.monotonic() + timeout
+    while True:
+        with flask_app.app_context():
+            bodies = db.session.execute(db.select(OutboxMessage.body)).scalars().all()
+        if len(bodies) >= expected or time.monotonic() > deadline:
+            return [match.group(1) for match in map(RESET_LINK.search, bodies) if match]
+        time.sleep(0.2)
+
+
+def reset_scenario(port, credentials, args, flask_app):
+    # Distinct accounts: redeeming one link invalidates every other link for the same account
+    accounts = min(args.requests, args.users)
+    forgot = in_parallel(args.concurrency, accounts, lambda i: redirected_to_login(
+        post(port, '/forgot-password', {'email': f'user{i}@example.com'}, credentials, i)))
+    tokens = queued_reset_tokens(flask_app, accounts)
+    print(f'{"":<16} reset emails queued: {len(tokens)} of {accounts}')
+    reset = in_parallel(args.concurrency, len(tokens), lambda i: redirected_to_login(
+        post(port, f'/reset-password/{tokens[i]}', {'password': RESET_PASSWORD,
+                                                      'confirm_password': RESET_PASSWORD}, credentials, i)))
+    return [('forgot', *forgot), ('reset', *reset)]
+
+
+def run(name, command, env, port, args, scenario, flask_app):
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    idle = []
+    try:
+        wait_for_port(port)
+        credentials = [csrf_credentials(port) for _ in range(args.concurrency)]
+        for _ in range(args.idle_clients):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(b'POST /login HTTP/1.1\r\nHost: localhost\r\n')  # never finishes the request
+            idle.append(sock)
+        rows = scenario(port, credentials, args, flask_app)
+    finally:
+        for sock in idle:
+            sock.close()
+        server.terminate()
+        server.wait()
+    for label, results, seconds in rows:
+        report(f'{name} {label}', results, seconds)
+
+
+def report(name, results, seconds):
+    latencies = sorted(latency for latency, status in results if status == 200)
+    errors = sum(1 for _, status in results if status != 200)
+    if not latencies:
+        print(f'{name:<24} every request failed')
+        return
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'{name:<24} {len(latencies) / seconds:>8.1f} {statistics.median(latencies) * 1000:>9.0f} '
+          f'{p99 * 1000:>9.0f} {errors:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='workers per server')
+    parser.add_argument('--concurrency', type=int, default=32, help='requests in flight')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--idle-clients', type=int, default=0)
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:100000')
+    parser.add_argument('--scenario', choices=['login', 'reset'], default='login')
+    args = parser.parse_args()
+    scenario = login_scenario if args.scenario == 'login' else reset_scenario
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['PASSWORD_HASH_METHOD'] = args.hash_method
+        print(f'{"server":<24} {"req/s":>8} {"p50 (ms)":>9} {"p99 (ms)":>9} {"errors":>7}')
+        servers = [
+            ('gunicorn sync', lambda port: [sys.executable, '-m', 'gunicorn', '-w', str(args.processes),
+                                            '-b', f'127.0.0.1:{port}', '--timeout', '120', 'app:create_app()']),
+            ('uvicorn asgi', lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:application',
+                                           '--workers', str(args.processes), '--port', str(port),
+                                           '--log-level', 'warning']),
+        ]
+        for name, command in servers:
+            # A database per server: the reset scenario changes passwords and fills the outbox
+            uri = f'sqlite:///{os.path.join(tmp, name.split()[0] + ".db")}'
+            flask_app = load_app(uri)
+            seed_users(flask_app, args.users)
+            env = dict(
+                os.environ,
+                DATABASE_URI=uri,
+                APP_EXTENSIONS='csrf,bootstrap',  # no outbox thread: reset emails stay queued
+                RATELIMIT_ENABLED='false',    # every request comes from 127.0.0.1
+                PASSWORD_HASH_METHOD=args.hash_method,
+            )
+            port = free_port()
+            run(name, command(port), env, port, args, scenario, flask_app)
+
+
+if __name__ == '__main__':
+    main()
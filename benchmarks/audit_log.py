@@ -0,0 +1,70 @@
+# benchmarks/audit_log.py
+# Cost of audit logging on the request path: a synchronous INSERT + commit per event vs the write-behind
+# buffer (utils.audit), plus how long the flusher takes to write the same events in batches, per sink.
+#
+#   python -m benchmarks.audit_log --events 20000
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app import create_app
+from models import db
+from models.audit import AuditEvent, partition_key
+from utils.audit import audit_log, query_events
+
+
+def build(tmp, sink, batch_size, name=None):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, (name or sink) + ".db")}',
+        'EXTENSIONS': ('bootstrap',),
+        'OUTBOX_WORKER_ENABLED': False,
+        'AUDIT_SINK': sink,
+        'AUDIT_DIR': os.path.join(tmp, 'audit'),
+        'AUDIT_WORKER_ENABLED': False,  # flushed explicitly below, so the two phases are timed separately
+        'AUDIT_BUFFER_SIZE': 10 ** 7,
+        'AUDIT_BATCH_SIZE': batch_size,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build(tmp, 'database', args.batch_size, name='sync')
+        with app.app_context():
+            started = time.perf_counter()
+            for i in range(args.events):
+                now = datetime.utcnow()
+                db.session.add(AuditEvent(partition_key=partition_key(now), occurred_at=now, event='login_failure',
+                                          user_id=i % 1000, email=f'user{i % 1000}@example.com', ip='127.0.0.1'))
+                db.session.commit()
+            sync_us = (time.perf_counter() - started) / args.events * 1e6
+        print(f'{"sync insert + commit":<22} request path {sync_us:>8.1f} us/event')
+
+        for sink in ('database', 'jsonl'):
+            app = build(tmp, sink, args.batch_size)
+            with app.test_request_context():
+                started = time.perf_counter()
+                for i in range(args.events):
+                    audit_log.record('login_failure', i % 1000, f'user{i % 1000}@example.com', 'wrong password')
+                record_us = (time.perf_counter() - started) / args.events * 1e6
+                started = time.perf_counter()
+                written = audit_log.flush()
+                flush_us = (time.perf_counter() - started) / written * 1e6
+                started = time.perf_counter()
+                found = query_events(user_id=7, limit=args.events)
+                query_ms = (time.perf_counter() - started) * 1000
+            print(f'{"write-behind " + sink:<22} request path {record_us:>8.1f} us/event, '
+                  f'flusher {flush_us:>6.1f} us/event, query one user ({len(found)} rows) {query_ms:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
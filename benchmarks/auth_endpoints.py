@@ -0,0 +1,337 @@
+# benchmarks/auth_endpoints.py
+# End-to-end benchmark of the auth blueprint: /login, /register, /forgot-password and /reset-password/<token>.
+#
+# Drives the endpoints through the Flask test client and/or a real local WSGI server, against in-memory or
+# file-backed SQLite seeded with N users, and reports throughput, p50/p95/p99 latency, SQL queries per request
+# and time spent hashing. Results are written as JSON so runs on different commits can be compared:
+#
+#   python -m benchmarks.auth_endpoints --database memory file --users 1000 100000 --output bench.json
+#   python -m benchmarks.auth_endpoints --compare before.json after.json
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+BENCH_PASSWORD = 'benchmark-password'
+
+
+def is_in_memory(database_uri):
+    # An in-memory SQLite database is a single connection shared by every thread that uses the app
+    return database_uri in ('sqlite://', 'sqlite:///:memory:')
+
+
+def load_app(database_uri):
+    """Builds the app against the given database with mail delivery off, and creates the schema."""
+    from app import create_app
+    from models import db
+
+    # With an in-memory database nothing may use the connection next to a request: the forgot-password lookup
+    # and send stay in the request's thread, and there is no audit flusher
+    in_memory = is_in_memory(database_uri)
+    flask_app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'WTF_CSRF_ENABLED': False,
+        # Queued mail stays in the outbox table instead of being sent while we measure
+        'OUTBOX_WORKER_ENABLED': False,
+        # Every request comes from one client and a handful of accounts: measure the endpoints, not 429s
+        'RATELIMIT_ENABLED': False,
+        'BACKGROUND_SYNC': in_memory,
+        'AUDIT_ENABLED': not in_memory,
+    })
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+
+class Probe:
+    """Counts SQL statements and hashing time for the request in flight."""
+
+    def __init__(self):
+        self.queries = 0
+        self.hash_seconds = 0.0
+
+    def reset(self):
+        self.queries = 0
+        self.hash_seconds = 0.0
+
+    def install(self, flask_app):
+        from sqlalchemy import event
+        import utils.encryption as encryption
+        from models import db
+
+        with flask_app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._count_query)
+
+        for name in ('generate_hash', 'verify_hash'):
+            original = getattr(encryption, name)
+            setattr(encryption, name, self._timed(original))
+
+    def _count_query(self, *args):
+        self.queries += 1
+
+    def _timed(self, fn):
+        def timed(*args):
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.hash_seconds += time.perf_counter() - started
+        return timed
+
+
+def seed_users(flask_app, total, already=0, batch_size=10000):
+    """Bulk-inserts users `already`..`total`, all sharing one precomputed hash so seeding stays fast."""
+    from sqlalchemy import insert
+    from models import db
+    from models.user import User
+    from utils.encryption import hash_and_salt_password
+
+    with flask_app.app_context():
+        pwhash = hash_and_salt_password(BENCH_PASSWORD)
+        for offset in range(already, total, batch_size):
+            rows = [
+                {
+                    'email': f'user{i}@example.com',
+                    'email_normalized': f'user{i}@example.com',
+                    'password': pwhash,
+                    'first_name': 'Bench',
+                    'last_name': str(i),
+                    'role': 'Admin' if i == 0 else 'User',
+                }
+                for i in range(offset, min(offset + batch_size, total))
+            ]
+            db.session.execute(insert(User), rows)
+        db.session.commit()
+
+
+def build_scenarios(flask_app, users):
+    """Returns [(name, method, path_factory, form_factory)]; factories are called per request."""
+    from utils.email_utils import generate_reset_token
+
+    def random_email():
+        return f'user{random.randrange(users)}@example.com'
+
+    tokens = []
+    with flask_app.test_request_context():
+        for _ in range(50):
+            tokens.append(generate_reset_token(random_email()))
+
+    def reset_path():
+        return f'/reset-password/{random.choice(tokens)}'
+
+    return [
+        ('GET /login', 'GET', lambda: '/login', None),
+        ('POST /login ok', 'POST', lambda: '/login',
+         lambda: {'email': random_email(), 'password': BENCH_PASSWORD}),
+        ('POST /login bad password', 'POST', lambda: '/login',
+         lambda: {'email': random_email(), 'password': 'wrong-password'}),
+        ('POST /login unknown email', 'POST', lambda: '/login',
+         lambda: {'email': 'nobody@example.com', 'password': BENCH_PASSWORD}),
+        ('GET /register', 'GET', lambda: '/register', None),
+        ('GET /forgot-password', 'GET', lambda: '/forgot-password', None),
+        ('POST /forgot-password', 'POST', lambda: '/forgot-password', lambda: {'email': random_email()}),
+        ('GET /reset-password/<token>', 'GET', reset_path, None),
+        ('POST /reset-password/<token> mismatch', 'POST', reset_path,
+         lambda: {'password': 'new-password-1', 'confirm_password': 'new-password-2'}),
+    ]
+
+
+class TestClientTransport:
+    name = 'test_client'
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client(use_cookies=False)
+
+    def request(self, method, path, form):
+        response = self.client.open(path, method=method, data=form)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class WSGIServerTransport:
+    """Serves the app with werkzeug's (by default threaded) WSGI server on an ephemeral port, over keep-alive HTTP."""
+    name = 'wsgi_server'
+
+    def __init__(self, flask_app, threaded=True):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+        WSGIRequestHandler.log_request = lambda *args, **kwargs: None
+        self.server = make_server('127.0.0.1', 0, flask_app, threaded=threaded)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port)
+
+    def request(self, method, path, form):
+        body = urlencode(form) if form else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded', 'Host': 'localhost'}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.connection.close()
+        self.server.shutdown()
+
+
+def run_scenario(transport, probe, method, path_factory, form_factory, requests, warmup):
+    for _ in range(warmup):
+        transport.request(method, path_factory(), form_factory() if form_factory else None)
+
+    latencies, queries, hashing, statuses = [], 0, 0.0, {}
+    started = time.perf_counter()
+    for _ in range(requests):
+        path, form = path_factory(), form_factory() if form_factory else None
+        probe.reset()
+        request_started = time.perf_counter()
+        status = transport.request(method, path, form)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        queries += probe.queries
+        hashing += probe.hash_seconds
+        statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 2),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'queries_per_request': round(queries / requests, 2),
+        'hashing_ms_per_request': round(hashing * 1000 / requests, 3),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_database(database, sizes, transports, args):
+    """Runs every size/transport/scenario combination for one database kind in a fresh subprocess."""
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = 'sqlite://' if database == 'memory' else f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        command = [
+            sys.executable, '-m', 'benchmarks.auth_endpoints', '--worker', uri,
+            '--users', *map(str, sizes), '--transport', *transports,
+            '--requests', str(args.requests), '--warmup', str(args.warmup),
+        ]
+        output = subprocess.check_output(command, text=True)
+    results = json.loads(output.strip().splitlines()[-1])
+    for result in results:
+        result['database'] = database
+    return results
+
+
+def worker(uri, sizes, transports, requests, warmup):
+    """Runs inside a fresh interpreter so each database kind starts from a cold process."""
+    flask_app = load_app(uri)
+    probe = Probe()
+    probe.install(flask_app)
+
+    results, seeded = [], 0
+    for size in sorted(sizes):
+        seed_users(flask_app, size, already=seeded)
+        seeded = size
+        scenarios = build_scenarios(flask_app, size)
+        for transport_name in transports:
+            if transport_name == 'test_client':
+                transport = TestClientTransport(flask_app)
+            else:
+                # A connection's thread can still be finishing its response (see submit_after_response) when
+                # the next request arrives on a new one: serve an in-memory database from one thread
+                transport = WSGIServerTransport(flask_app, threaded=not is_in_memory(uri))
+            try:
+                for name, method, path_factory, form_factory in scenarios:
+                    print(f'{size:>8} users  {transport_name:<12} {name}', file=sys.stderr)
+                    stats = run_scenario(transport, probe, method, path_factory, form_factory, requests, warmup)
+                    results.append({'users': size, 'transport': transport_name, 'scenario': name, **stats})
+            finally:
+                transport.close()
+    print(json.dumps(results))
+
+
+def print_table(results):
+    header = f'{"db":<7}{"users":>9}  {"transport":<12}{"scenario":<40}{"rps":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"sql/req":>9}{"hash ms":>9}'
+    print(header)
+    for r in results:
+        print(f'{r["database"]:<7}{r["users"]:>9}  {r["transport"]:<12}{r["scenario"]:<40}{r["throughput_rps"]:>9}'
+              f'{r["p50_ms"]:>9}{r["p95_ms"]:>9}{r["p99_ms"]:>9}{r["queries_per_request"]:>9}{r["hashing_ms_per_request"]:>9}')
+
+
+def compare(before_path, after_path):
+    """Prints the p50/p99/throughput change per matching row of two result files."""
+    with open(before_path) as f:
+        before = {(r['database'], r['users'], r['transport'], r['scenario']): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = json.load(f)['results']
+    print(f'{"db":<7}{"users":>9}  {"transport":<12}{"scenario":<40}{"rps %":>9}{"p50 %":>9}{"p99 %":>9}')
+    for r in after:
+        key = (r['database'], r['users'], r['transport'], r['scenario'])
+        if key not in before:
+            continue
+        b = before[key]
+        change = lambda new, old: f'{(new - old) / old * 100:+.1f}' if old else 'n/a'
+        print(f'{key[0]:<7}{key[1]:>9}  {key[2]:<12}{key[3]:<40}{change(r["throughput_rps"], b["throughput_rps"]):>9}'
+              f'{change(r["p50_ms"], b["p50_ms"]):>9}{change(r["p99_ms"], b["p99_ms"]):>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database', nargs='+', choices=['memory', 'file'], default=['memory', 'file'])
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--transport', nargs='+', choices=['test_client', 'wsgi_server'],
+                        default=['test_client', 'wsgi_server'])
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.worker:
+        worker(args.worker, args.users, args.transport, args.requests, args.warmup)
+        return
+
+    results = []
+    for database in args.database:
+        results.extend(run_database(database, args.users, args.transport, args))
+    print_table(results)
+
+    if args.output:
+        report = {
+            'commit': git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests_per_scenario': args.requests,
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/breached_lookup.py
+# Builds breached-password indexes of growing size from synthetic SHA-1 corpora and measures build time,
+# file size, per-lookup latency (hits and misses) and the heap a worker spends on it, against a Python set.
+#
+#   python -m benchmarks.breached_lookup --sizes 100000 1000000 10000000
+import argparse
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from utils.breached_passwords import BreachedIndex, build_index, password_digest
+
+
+def corpus(size, seed=0):
+    """Yields `size` HIBP-style lines for the passwords 'pw<n>' (n < size), in random order."""
+    rng = random.Random(seed)
+    for n in rng.sample(range(size), size):
+        yield f'{password_digest(f"pw{n}").hex().upper()}:{rng.randint(1, 1000)}\n'
+
+
+def time_lookups(contains, digests, rounds=5):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for digest in digests:
+            contains(digest)
+        samples.append((time.perf_counter() - started) / len(digests) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f'{"digests":>10} {"build s":>8} {"file MB":>8} {"hit us":>7} {"miss us":>8} '
+          f'{"index heap KB":>14} {"set us":>7} {"set heap MB":>12}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f'{size}.idx')
+            started = time.perf_counter()
+            build_index(io.StringIO(''.join(corpus(size))), path, chunk_size=args.chunk_size)
+            build_seconds = time.perf_counter() - started
+
+            rng = random.Random(1)
+            hits = [password_digest(f'pw{rng.randrange(size)}') for _ in range(args.lookups)]
+            misses = [password_digest(f'not-breached-{i}') for i in range(args.lookups)]
+
+            tracemalloc.start()
+            index = BreachedIndex(path)
+            assert all(digest in index for digest in hits[:100]) and not any(d in index for d in misses[:100])
+            index_heap = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            hit_us = time_lookups(index.__contains__, hits)
+            miss_us = time_lookups(index.__contains__, misses)
+
+            # The alternative: every worker loads the corpus into its own heap
+            tracemalloc.start()
+            loaded = {password_digest(f'pw{n}') for n in range(size)}
+            set_heap = tracemalloc.get_traced_memory()[0] / 2 ** 20
+            tracemalloc.stop()
+            set_us = time_lookups(loaded.__contains__, hits)
+            del loaded
+
+            print(f'{size:>10} {build_seconds:>8.1f} {os.path.getsize(path) / 2 ** 20:>8.1f} {hit_us:>7.2f} '
+                  f'{miss_us:>8.2f} {index_heap:>14.1f} {set_us:>7.2f} {set_heap:>12.1f}')
+            index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bulk_notify.py
+# Fan-out of one notification to N recipients against the local SMTP stand-in: one connection per message
+# (what one-recipient senders cost without a pool) vs send_bulk_email() over one session.
+#
+#   python -m benchmarks.bulk_notify --recipients 500 --connect-delay 0.02
+import argparse
+import os
+import smtplib
+import tempfile
+import time
+
+os.environ.setdefault('EMAIL_KEY', 'admin@example.com')  # From address; read when utils.email_utils is imported
+
+from app import create_app
+from models import db
+from utils.email_utils import send_bulk_email
+from utils.templating import render_email
+from benchmarks.smtp_stand_in import SMTPStandIn
+
+TEMPLATE = 'email/user_aknowledgement_email.html'
+
+
+def recipients(count, reject_every):
+    for i in range(count):
+        local = 'reject' if reject_every and i % reject_every == 0 else 'contributor'
+        yield {'email': f'{local}{i}@example.com', 'name': f'Contributor {i}'}
+
+
+def per_message_connections(port, count, reject_every):
+    # Baseline: render and open/close a connection for every recipient
+    failures = 0
+    for recipient in recipients(count, reject_every):
+        body = render_email(TEMPLATE, {'name': recipient['name']})
+        connection = smtplib.SMTP('127.0.0.1', port)
+        try:
+            connection.sendmail('admin@example.com', [recipient['email']], body.encode())
+        except smtplib.SMTPRecipientsRefused:
+            failures += 1
+        connection.quit()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipients', type=int, default=500)
+    parser.add_argument('--connect-delay', type=float, default=0.02, help='simulated STARTTLS + AUTH cost')
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--reject-every', type=int, default=50, help='every Nth recipient is refused (0: none)')
+    args = parser.parse_args()
+
+    server = SMTPStandIn(connect_delay=args.connect_delay).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'EXTENSIONS': ('outbox',),
+            'OUTBOX_WORKER_ENABLED': False,
+            'AUDIT_ENABLED': False,
+            'SMTP_HOST': '127.0.0.1',
+            'SMTP_PORT': server.port,
+            'SMTP_USE_TLS': False,
+            'SMTP_USERNAME': None,
+        })
+        with app.test_request_context():
+            db.create_all()
+            print(f'{"mode":<24} {"msgs/s":>8} {"connections":>12} {"failed":>7}')
+
+            connections = server.connections
+            started = time.perf_counter()
+            failed = per_message_connections(server.port, args.recipients, args.reject_every)
+            seconds = time.perf_counter() - started
+            print(f'{"connection per message":<24} {args.recipients / seconds:>8.0f} '
+                  f'{server.connections - connections:>12} {failed:>7}')
+
+            connections = server.connections
+            started = time.perf_counter()
+            results = send_bulk_email(TEMPLATE, 'Hello {name}', recipients(args.recipients, args.reject_every),
+                                      chunk_size=args.chunk_size)
+            seconds = time.perf_counter() - started
+            failed = sum(1 for result in results if result.error)
+            print(f'{"send_bulk_email":<24} {args.recipients / seconds:>8.0f} '
+                  f'{server.connections - connections:>12} {failed:>7}')
+            app.extensions['outbox'].stop()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/cold_start.py
+# Measures worker cold-start cost: importing `app`, running create_app() and serving the first request.
+# Every sample runs in a fresh interpreter, like a newly forked gunicorn worker without --preload.
+#
+#   python -m benchmarks.cold_start --runs 10
+#   python -m benchmarks.cold_start --extensions csrf,bootstrap csrf,bootstrap,ckeditor,migrate,outbox
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SAMPLE = r'''
+import json, os, sys, tempfile, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+from models import db
+flask_app = app_module.create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cold.db'),
+    'EXTENSIONS': tuple(filter(None, sys.argv[1].split(','))),
+    'OUTBOX_WORKER_ENABLED': False,
+})
+created = time.perf_counter()
+with flask_app.app_context():
+    db.create_all()
+schema_ready = time.perf_counter()
+response = flask_app.test_client().get('/login')
+first_request = time.perf_counter()
+response = flask_app.test_client().get('/login')
+second_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - schema_ready) * 1000,
+    'warm_request_ms': (second_request - first_request) * 1000,
+    'status': response.status_code,
+}))
+'''
+
+
+def sample(extensions):
+    output = subprocess.check_output([sys.executable, '-c', SAMPLE, extensions], text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--extensions', nargs='+', default=['csrf,bootstrap', 'csrf,bootstrap,ckeditor,migrate,outbox'],
+                        help='comma-separated EXTENSIONS sets to compare')
+    args = parser.parse_args()
+
+    columns = ('import_ms', 'create_app_ms', 'first_request_ms', 'warm_request_ms')
+    print(f'{"extensions":<42}' + ''.join(f'{column:>18}' for column in columns))
+    for extensions in args.extensions:
+        runs = [sample(extensions) for _ in range(args.runs)]
+        medians = [statistics.median(run[column] for run in runs) for column in columns]
+        print(f'{extensions:<42}' + ''.join(f'{value:>18.1f}' for value in medians))
+
+
+if __name__ == '__main__':
+    main()
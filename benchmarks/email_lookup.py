@@ -0,0 +1,87 @@
+# benchmarks/email_lookup.py
+# Measures the cost of the email lookup used by login, register and password reset as the user table grows.
+#
+#   python -m benchmarks.email_lookup --sizes 1000 10000 100000 1000000
+import argparse
+import random
+import statistics
+import time
+
+from flask import Flask
+from sqlalchemy import insert, func
+
+from models import db
+from models.user import User
+
+
+def build_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    db.init_app(app)
+    return app
+
+
+def seed(size, start=0, batch_size=10000):
+    """Bulk inserts users `start`..`size` with executemany batches."""
+    for offset in range(start, size, batch_size):
+        rows = [
+            {
+                'email': f'User{i}@Example.com',
+                'email_normalized': f'user{i}@example.com',
+                'password': 'x',
+                'first_name': 'Bench',
+                'last_name': str(i),
+                'role': 'User',
+            }
+            for i in range(offset, min(offset + batch_size, size))
+        ]
+        db.session.execute(insert(User), rows)
+    db.session.commit()
+
+
+def time_lookups(lookup, emails):
+    timings = []
+    for email in emails:
+        started = time.perf_counter()
+        lookup(email)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def indexed_lookup(email):
+    db.session.expunge_all()
+    return User.get_by_email(email)
+
+
+def scan_lookup(email):
+    # What a case-insensitive lookup costs without the normalized column
+    db.session.expunge_all()
+    return db.session.execute(
+        db.select(User).where(func.lower(User.email) == email.lower())
+    ).scalar_one_or_none()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--database-uri', default='sqlite://')
+    args = parser.parse_args()
+
+    app = build_app(args.database_uri)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seeded = 0
+        print(f'{"users":>10} {"indexed (us)":>14} {"lower() scan (us)":>18}')
+        for size in sorted(args.sizes):
+            seed(size, start=seeded)
+            seeded = size
+            emails = [f'USER{random.randrange(size)}@example.com' for _ in range(args.lookups)]
+            indexed = time_lookups(indexed_lookup, emails)
+            scanned = time_lookups(scan_lookup, emails[:max(1, args.lookups // 10)])
+            print(f'{size:>10} {indexed:>14.1f} {scanned:>18.1f}')
+
+
+if __name__ == '__main__':
+    main()
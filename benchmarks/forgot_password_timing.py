@@ -0,0 +1,107 @@
+# benchmarks/forgot_password_timing.py
+# Checks that POST /forgot-password takes the same time whether or not the account exists.
+# Exits non-zero if the median or p95 latencies of the two populations differ by more than --tolerance-ms,
+# so it can gate a CI job.
+#
+#   python -m benchmarks.forgot_password_timing --requests 300
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+
+def build_app(users):
+    from app import create_app
+    from models import db
+    from models.user import User
+
+    # File-backed: background threads need their own connections, which in-memory SQLite cannot share
+    database = os.path.join(tempfile.mkdtemp(), 'forgot.db')
+    flask_app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+        'WTF_CSRF_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'OUTBOX_WORKER_ENABLED': False,
+        'AUDIT_ENABLED': False,
+    })
+    with flask_app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [
+            {'email': f'user{i}@example.com', 'email_normalized': f'user{i}@example.com', 'password': 'x',
+             'first_name': 'Bench', 'last_name': str(i), 'role': 'User'}
+            for i in range(users)
+        ])
+        db.session.commit()
+    return flask_app
+
+
+def measure(client, emails):
+    timings = []
+    for email in emails:
+        started = time.perf_counter()
+        response = client.post('/forgot-password', data={'email': email})
+        timings.append((time.perf_counter() - started) * 1000)
+        # A server closes the response once it is written, which starts the background send
+        response.close()
+        assert response.status_code == 302, response.status_code
+    return timings
+
+
+def compare(flask_app, client, known, unknown, seed=0):
+    """
+    This function times the two populations interleaved in a random order, so drift (GC, flushes) hits both
+    equally, and waits for the background send of each request before timing the next one: otherwise a
+    known account's send would run during, and be charged to, whichever request follows it.
+    Returns: (known timings, unknown timings) in ms (tuple)
+    """
+    background = flask_app.extensions['background']
+    samples = [(True, email) for email in known] + [(False, email) for email in unknown]
+    random.Random(seed).shuffle(samples)
+    known_timings, unknown_timings = [], []
+    for exists, email in samples:
+        (known_timings if exists else unknown_timings).extend(measure(client, [email]))
+        background.join()
+    return known_timings, unknown_timings
+
+
+def summary(timings):
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return statistics.median(timings), cuts[94], cuts[98]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--tolerance-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    flask_app = build_app(args.users)
+    client = flask_app.test_client(use_cookies=False)
+    known = [f'user{random.randrange(args.users)}@example.com' for _ in range(args.requests)]
+    unknown = [f'nobody{i}@example.com' for i in range(args.requests)]
+    measure(client, known[:20] + unknown[:20])  # warm up
+    flask_app.extensions['background'].join()
+
+    known_timings, unknown_timings = compare(flask_app, client, known, unknown)
+
+    print(f'{"account":<10} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    known_stats, unknown_stats = summary(known_timings), summary(unknown_timings)
+    for name, stats in (('exists', known_stats), ('missing', unknown_stats)):
+        print(f'{name:<10} ' + ' '.join(f'{value:>8.3f}' for value in stats))
+
+    flask_app.extensions['background'].shutdown(wait=True)
+    gaps = [abs(a - b) for a, b in zip(known_stats[:2], unknown_stats[:2])]
+    if max(gaps) > args.tolerance_ms:
+        print(f'FAIL: p50/p95 gap {max(gaps):.3f} ms exceeds {args.tolerance_ms} ms')
+        sys.exit(1)
+    print(f'OK: p50/p95 gap {max(gaps):.3f} ms within {args.tolerance_ms} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/hashing_throughput.py
+# Compares password-hash verification throughput inline vs through the bounded hashing pool.
+#
+#   python -m benchmarks.hashing_throughput --threads 16 --requests 200 --workers 4
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from utils.hash_executor import HashExecutor, HashingBusy
+
+
+def drive(executor, pwhash, threads, requests):
+    """Fires `requests` verifications from `threads` request threads; returns (seconds, rejected)."""
+    rejected = 0
+
+    def one(_):
+        try:
+            executor.run(check_password_hash, pwhash, 'correct horse battery staple')
+            return 0
+        except HashingBusy:
+            return 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as clients:
+        rejected = sum(clients.map(one, range(requests)))
+    return time.perf_counter() - started, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16, help='concurrent request threads')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes in the hashing pool')
+    parser.add_argument('--max-concurrent', type=int, default=None)
+    parser.add_argument('--queue-timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    pwhash = generate_password_hash('correct horse battery staple', 'pbkdf2:sha256', 16)
+    max_concurrent = args.max_concurrent or args.threads
+
+    print(f'{"mode":>8} {"hashes/s":>10} {"rejected":>9}')
+    for mode, workers in (('inline', 0), ('pooled', args.workers)):
+        executor = HashExecutor()
+        executor.configure(workers=workers, max_concurrent=max_concurrent, queue_timeout=args.queue_timeout)
+        if workers:
+            executor.run(check_password_hash, pwhash, 'warm up the pool')
+        seconds, rejected = drive(executor, pwhash, args.threads, args.requests)
+        executor.shutdown()
+        print(f'{mode:>8} {(args.requests - rejected) / seconds:>10.1f} {rejected:>9}')
+
+
+if __name__ == '__main__':
+    main()
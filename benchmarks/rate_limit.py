@@ -0,0 +1,42 @@
+# benchmarks/rate_limit.py
+# Per-check overhead of the rate limiter backends, for allowed and rejected checks.
+#
+#   python -m benchmarks.rate_limit --checks 100000
+import argparse
+import os
+import tempfile
+import time
+
+from utils.rate_limit import LocalBackend, SQLiteBackend
+
+
+def per_check_us(backend, checks, keys, limit):
+    started = time.perf_counter()
+    for i in range(checks):
+        backend.hit(f'login:ip:10.0.{i % keys // 256}.{i % 256}', limit, 60)
+    return (time.perf_counter() - started) / checks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--keys', type=int, default=10000, help='distinct client IPs')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            'local': LocalBackend(),
+            'sqlite': SQLiteBackend(os.path.join(tmp, 'ratelimit.db')),
+        }
+        print(f'{"backend":<8} {"allowed (us/check)":>20} {"rejected (us/check)":>20}')
+        for name, backend in backends.items():
+            checks = args.checks if name == 'local' else max(1, args.checks // 10)
+            allowed = per_check_us(backend, checks, args.keys, limit=10 ** 9)
+            backend.reset()
+            per_check_us(backend, args.keys, args.keys, limit=1)  # use up every key's allowance
+            rejected = per_check_us(backend, checks, args.keys, limit=1)
+            print(f'{name:<8} {allowed:>20.2f} {rejected:>20.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/replica_routing.py
+# Primary/replica routing with two SQLite files: where each auth query goes, read-your-writes after a
+# commit, and login throughput with and without a replica.
+#
+#   python -m benchmarks.replica_routing --users 2000 --logins 300
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import event, insert
+
+from app import create_app
+from models import db
+from models.user import User, normalize_name
+from utils.db_routing import read_replica
+from utils.password_hashing import generate_hash
+
+BENCH_PASSWORD = 'correct horse battery staple'
+
+
+def build(tmp, users, with_replica):
+    primary = os.path.join(tmp, 'primary.db')
+    replica = os.path.join(tmp, 'replica.db')
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_REPLICA_URIS': (f'sqlite:///{replica}',) if with_replica else (),
+        'OUTBOX_WORKER_ENABLED': False,
+        'AUDIT_ENABLED': False,  # its exit flush would find the temporary databases gone
+        'WTF_CSRF_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    }
+    app = create_app(config)
+    with app.app_context():
+        if not os.path.exists(primary):
+            db.create_all()
+            pwhash = generate_hash(BENCH_PASSWORD, 'pbkdf2:sha256:1000')
+            db.session.execute(insert(User), [
+                {'email': f'user{i}@example.com', 'email_normalized': f'user{i}@example.com', 'first_name': 'Bench',
+                 'last_name': str(i), 'name_normalized': normalize_name('Bench', str(i)), 'password': pwhash,
+                 'role': 'Admin' if i == 0 else 'User'}
+                for i in range(users)
+            ])
+            db.session.commit()
+            db.engine.dispose()
+            shutil.copyfile(primary, replica)  # "replication"
+    return app
+
+
+def count_statements(app):
+    # Counts statements per engine: 'primary' or 'replica'
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = 'primary' if key is None else 'replica'
+            event.listen(engine, 'before_cursor_execute', lambda *args, name=name: counts.update([name]))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--logins', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build(tmp, args.users, with_replica=False)
+        app = build(tmp, args.users, with_replica=True)
+        counts = count_statements(app)
+        client = app.test_client()
+
+        client.post('/login', data={'email': 'user1@example.com', 'password': BENCH_PASSWORD})
+        client.get('/login')  # load_user
+        print(f'login + load_user:            {dict(counts)}')
+
+        # A write on the primary the replica has not "replicated"; the same client must still see it
+        counts.clear()
+        with app.test_request_context():
+            user = db.session.get(User, 2)
+            user.first_name = 'Renamed'
+            db.session.commit()
+            with read_replica():
+                seen = db.session.execute(db.select(User.first_name).where(User.id == 2)).scalar()
+        print(f'read after own commit:        {seen!r} via {dict(counts)}')
+
+        counts.clear()
+        with app.test_request_context():
+            with read_replica():
+                stale = db.session.execute(db.select(User.first_name).where(User.id == 2)).scalar()
+        print(f'fresh session, other client:  {stale!r} via {dict(counts)} (replica lag)')
+
+        print(f'\n{"setup":<16} {"logins/s":>9}')
+        for name, with_replica in (('primary only', False), ('with replica', True)):
+            app = build(tmp, args.users, with_replica)
+            client = app.test_client()
+            started = time.perf_counter()
+            for i in range(args.logins):
+                client.post('/login', data={'email': f'user{i % args.users}@example.com', 'password': BENCH_PASSWORD})
+                client.get('/logout')
+            print(f'{name:<16} {args.logins / (time.perf_counter() - started):>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/sessions.py
+# Signed-cookie sessions vs server-side sessions: cookie size and per-request cost of an authenticated
+# request, plus the cost of "log out everywhere" as a user's session count grows.
+#
+#   python -m benchmarks.sessions --requests 2000
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app
+from models import db
+from utils.registration import registration_state
+
+EXTENSIONS = {'cookie': ('bootstrap',), 'server': ('bootstrap', 'sessions')}
+
+
+def build(tmp, kind):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, kind + ".db")}',
+        'EXTENSIONS': EXTENSIONS[kind],
+        'WTF_CSRF_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'OUTBOX_WORKER_ENABLED': False,
+        'AUDIT_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    with app.app_context():
+        db.create_all()
+    registration_state.reset()  # each run starts from an empty database in this process
+    client = app.test_client()
+    client.post('/register', data={'first_name': 'Bench', 'last_name': 'User', 'email': 'bench@example.com',
+                                   'password': 'benchmark-password', 'confirm_password': 'benchmark-password'})
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'benchmark-password', 'remember_me': 'y'})
+    return app, client
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{"backend":<8} {"cookie bytes":>13} {"us/request":>11}')
+        for kind in EXTENSIONS:
+            app, client = build(tmp, kind)
+            cookie = client.get_cookie('session') if hasattr(client, 'get_cookie') else None
+            size = len(cookie.value) if cookie else len(next(
+                c.value for c in client.cookie_jar if c.name == app.config['SESSION_COOKIE_NAME']))
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                # Authenticated and read-only: loads the session and the user, leaves the session unchanged
+                assert client.get('/admin/api/users?limit=1').status_code == 200
+            per_request = (time.perf_counter() - started) / args.requests * 1e6
+            print(f'{kind:<8} {size:>13} {per_request:>11.0f}')
+
+        print(f'\n{"sessions":>8} {"log out everywhere (ms)":>24}')
+        for count in (1, 100, 1000):
+            app, _ = build(tmp, 'server')
+            clients = [app.test_client() for _ in range(count)]
+            for client in clients:
+                client.post('/login', data={'email': 'bench@example.com', 'password': 'benchmark-password'})
+            started = time.perf_counter()
+            clients[0].post('/logout-everywhere')
+            elapsed = (time.perf_counter() - started) * 1000
+            assert b'Already logged in' not in clients[-1].get('/login').data or count == 1
+            print(f'{count:>8} {elapsed:>24.2f}')
+            os.remove(os.path.join(tmp, 'server.db'))
+
+
+if __name__ == '__main__':
+    main()
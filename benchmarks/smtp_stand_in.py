@@ -0,0 +1,111 @@
+# benchmarks/smtp_stand_in.py
+# Minimal local SMTP server for exercising the outbox without a real relay (no TLS, no AUTH).
+# Recipients whose local part starts with "reject" are refused with a 550, so per-recipient error
+# reporting can be checked; --connect-delay stands in for the STARTTLS + AUTH round trips of a real relay.
+#
+#   python -m benchmarks.smtp_stand_in --port 2525 --connect-delay 0.05
+#   SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_USE_TLS=false ...
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        if self.server.command_delay:
+            time.sleep(self.server.command_delay)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        if server.connect_delay:
+            time.sleep(server.connect_delay)
+        self.reply('220 stand-in ready')
+        sender, recipients = None, []
+        for raw in self.rfile:
+            command = raw.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stand-in')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip('<> '), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command[8:].strip('<> ')
+                if recipient.lower().startswith('reject'):
+                    with server.lock:
+                        server.refused += 1
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for line in self.rfile:
+                    if line == b'.\r\n':
+                        break
+                    size += len(line)
+                with server.lock:
+                    server.messages.append((sender, tuple(recipients), size))
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                sender, recipients = (None, []) if verb == 'RSET' else (sender, recipients)
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Threaded stand-in relay; records (sender, recipients, size) per accepted message."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, connect_delay=0.0, command_delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.connect_delay = connect_delay
+        self.command_delay = command_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.refused = 0
+        self.messages = []
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='smtp-stand-in', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--connect-delay', type=float, default=0.0, help='seconds before the greeting')
+    parser.add_argument('--command-delay', type=float, default=0.0, help='seconds before every reply')
+    args = parser.parse_args()
+    server = SMTPStandIn(args.host, args.port, args.connect_delay, args.command_delay)
+    print(f'SMTP stand-in listening on {args.host}:{server.port}, Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f'{server.connections} connection(s), {len(server.messages)} message(s), {server.refused} refused')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/template_render.py
+# Render time per auth page and per email body, and template compile time with and without the bytecode cache.
+#
+#   python -m benchmarks.template_render --renders 2000
+import argparse
+import os
+import tempfile
+import time
+
+from flask import render_template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app import create_app
+from forms.auth import LoginForm, RegisterForm
+from utils.templating import render_email
+
+PAGES = {
+    'auth/login.html': lambda: {'form': LoginForm(), 'hide_registration': True},
+    'auth/register.html': lambda: {'form': RegisterForm()},
+    'auth/forgot-password.html': lambda: {},
+    'auth/reset-password.html': lambda: {'token': 'x' * 120},
+}
+
+
+def per_render_us(fn, renders):
+    fn()
+    started = time.perf_counter()
+    for _ in range(renders):
+        fn()
+    return (time.perf_counter() - started) / renders * 1e6
+
+
+def compile_ms(template_dir, cache_dir):
+    # Fresh environment each time, like a new worker: only the on-disk cache survives
+    env = Environment(
+        loader=FileSystemLoader(template_dir),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else None,
+    )
+    started = time.perf_counter()
+    for name in env.list_templates(filter_func=lambda name: name.endswith('.html')):
+        env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renders', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'OUTBOX_WORKER_ENABLED': False,
+            'AUDIT_ENABLED': False,
+            'TEMPLATE_CACHE_DIR': os.path.join(tmp, 'jinja_cache'),
+        })
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        cache_dir = os.path.join(tmp, 'compile_cache')
+        os.makedirs(cache_dir)
+        compile_ms(template_dir, cache_dir)  # populate
+        print(f'compile all templates: {compile_ms(template_dir, None):.1f} ms from source, '
+              f'{compile_ms(template_dir, cache_dir):.1f} ms from bytecode cache\n')
+
+        with app.test_request_context():
+            print(f'{"page":<28} {"us/render":>10}')
+            for name, context in PAGES.items():
+                print(f'{name:<28} {per_render_us(lambda: render_template(name, **context()), args.renders):>10.1f}')
+
+            print(f'\n{"email":<44} {"render_template":>16} {"render_email":>13}')
+            emails = {
+                'email/password_reset_email.html': {'reset_url': 'https://example.com/reset-password/' + 'x' * 120},
+                'email/user_aknowledgement_email.html': {'name': 'Ada <Lovelace>'},
+            }
+            for name, values in emails.items():
+                full = per_render_us(lambda: render_template(name, **values), args.renders)
+                fragments = per_render_us(lambda: render_email(name, values), args.renders)
+                print(f'{name:<44} {full:>16.1f} {fragments:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/user_io.py
+# Rows per second of `flask users import` (inline vs pooled hashing) and `flask users export`.
+#
+#   python -m benchmarks.user_io --rows 20000 --workers 4 --hash-method pbkdf2:sha256:10000
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from app import create_app
+from models import db
+from utils.user_io import import_users, export_users
+
+
+def records(count, offset=0):
+    for i in range(offset, offset + count):
+        yield {'email': f'user{i}@example.com', 'first_name': 'Bench', 'last_name': str(i),
+               'password': f'password-{i}'}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='hashing processes for the pooled run')
+    parser.add_argument('--hash-method', default=None, help='defaults to PASSWORD_HASH_METHOD')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'OUTBOX_WORKER_ENABLED': False,
+            'AUDIT_ENABLED': False,
+        })
+        with app.app_context():
+            db.create_all()
+            print(f'{"run":<16} {"rows":>8} {"rows/s":>10}')
+            for name, workers, offset in (('import inline', 0, 0), ('import pooled', args.workers, args.rows)):
+                started = time.perf_counter()
+                stats = import_users(records(args.rows, offset), args.batch_size, workers, method=args.hash_method)
+                seconds = time.perf_counter() - started
+                print(f'{name:<16} {stats.inserted:>8} {stats.inserted / seconds:>10.0f}')
+
+            started = time.perf_counter()
+            stats = import_users(records(args.rows), args.batch_size, 0, method=args.hash_method)
+            seconds = time.perf_counter() - started
+            print(f'{"import dupes":<16} {stats.duplicates:>8} {stats.read / seconds:>10.0f}')
+
+            for fmt in ('csv', 'jsonl'):
+                started = time.perf_counter()
+                written = export_users(io.StringIO(), fmt, args.batch_size)
+                seconds = time.perf_counter() - started
+                print(f'{"export " + fmt:<16} {written:>8} {written / seconds:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/user_listing.py
+# Page latency of the admin user listing at increasing depth: keyset (what the API does) vs OFFSET.
+#
+#   python -m benchmarks.user_listing --users 1000000
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+from app import create_app
+from custom_flask_auth.dashboard.queries import list_users, encode_cursor, LISTING_COLUMNS
+from models.user import User, db
+
+
+def seed(total, batch_size=20000):
+    for offset in range(0, total, batch_size):
+        rows = [
+            {
+                'email': f'user{i}@example.com',
+                'email_normalized': f'user{i}@example.com',
+                'first_name': f'First{i % 5000}',
+                'last_name': f'Last{i}',
+                'name_normalized': f'first{i % 5000} last{i}',
+                'password': 'x',
+                'about': 'x' * 1000,
+                'role': 'User',
+            }
+            for i in range(offset, min(offset + batch_size, total))
+        ]
+        db.session.execute(insert(User), rows)
+        db.session.commit()
+
+
+def time_ms(fn, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'OUTBOX_WORKER_ENABLED': False,
+            'AUDIT_ENABLED': False,
+        })
+        with app.app_context():
+            db.create_all()
+            seed(args.users)
+
+            # Cursor positions at each depth, found once outside the timed section
+            depths = [d for d in (0, 1000, 10000, 100000, 1000000) if d < args.users]
+            print(f'{"depth":>8} {"offset (ms)":>12} {"keyset (ms)":>12} {"name search (ms)":>17}')
+            for depth in depths:
+                last_id = db.session.execute(db.select(User.id).order_by(User.id).offset(depth).limit(1)).scalar()
+                cursor = encode_cursor([last_id - 1]) if depth else None
+
+                offset_ms = time_ms(lambda: db.session.execute(
+                    db.select(*LISTING_COLUMNS).order_by(User.id).offset(depth).limit(args.page_size)).all())
+                keyset_ms = time_ms(lambda: list_users(args.page_size, cursor))
+                search_ms = time_ms(lambda: list_users(args.page_size, None, f'First{depth % 5000}', 'name'))
+                print(f'{depth:>8} {offset_ms:>12.2f} {keyset_ms:>12.2f} {search_ms:>17.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/user_shards.py
+# Hash-sharded user store on local SQLite files: how evenly users spread, how many move when a shard is added
+# (jump hash vs plain modulo), and login-path lookup cost and queries per shard, sharded vs a single database.
+#
+#   python -m benchmarks.user_shards --users 20000 --shards 4
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db
+from models.user import User
+from utils.sharding import shard_for_email, user_shards
+from utils.user_io import import_users
+
+
+def modulo_shard(email, count):
+    return int.from_bytes(hashlib.blake2b(email.encode(), digest_size=8).digest(), 'big') % count
+
+
+def build(tmp, name, shards, users):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, name + ".db")}',
+        'USER_SHARD_URIS': tuple(f'sqlite:///{os.path.join(tmp, f"{name}-{i}.db")}' for i in range(shards)),
+        'EXTENSIONS': ('bootstrap',),
+        'OUTBOX_WORKER_ENABLED': False,
+        'AUDIT_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        user_shards.create_tables()
+        import_users(({'email': f'user{i}@example.com', 'first_name': 'Bench', 'last_name': str(i),
+                       'password_hash': 'x'} for i in range(users)), batch_size=5000, workers=0)
+    return app
+
+
+def time_lookups(app, emails):
+    statements = {}
+    with app.app_context():
+        for key, engine in db.engines.items():
+            event.listen(engine, 'before_cursor_execute',
+                         lambda *args, key=key, **kwargs: statements.__setitem__(key, statements.get(key, 0) + 1))
+        started = time.perf_counter()
+        for email in emails:
+            assert User.get_by_email(email) is not None
+            db.session.remove()
+        per_lookup = (time.perf_counter() - started) / len(emails) * 1e6
+    return per_lookup, statements
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    emails = [f'user{i}@example.com' for i in range(args.users)]
+    sizes = [0] * args.shards
+    for email in emails:
+        sizes[shard_for_email(email, args.shards)] += 1
+    print(f'users per shard ({args.shards} shards): {sizes}')
+    for name, choose in (('jump hash', shard_for_email), ('modulo', modulo_shard)):
+        moved = sum(1 for email in emails if choose(email, args.shards) != choose(email, args.shards + 1))
+        print(f'{name:<10} adding shard {args.shards + 1} moves {moved / len(emails):6.1%} of users')
+
+    sample = random.Random(0).sample(emails, min(args.lookups, len(emails)))
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'\n{"store":<12} {"us/lookup":>10}  statements per database')
+        for name, shards in (('single', 0), ('sharded', args.shards)):
+            per_lookup, statements = time_lookups(build(tmp, name, shards, args.users), sample)
+            print(f'{name:<12} {per_lookup:>10.0f}  {dict(sorted(statements.items(), key=str))}')
+
+
+if __name__ == '__main__':
+    main()
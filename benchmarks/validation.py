@@ -0,0 +1,80 @@
+# benchmarks/validation.py
+# Per-call cost of email and phone validation (WTForms' Email() / direct phonenumbers calls vs the memoized
+# service in utils.validation), and what importing the validators costs a fresh worker.
+#
+#   python -m benchmarks.validation --calls 20000
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import phonenumbers
+from wtforms.validators import Email
+
+from utils.validation import ValidationService
+
+EMAILS = [f'user{i}@example.com' for i in range(50)]
+PHONES = ['+14155552671', '+442079460958', '+33142685300', '+61293744000', '+81312345678']
+
+IMPORT_SAMPLE = r'''
+import json, sys, time
+started = time.perf_counter()
+import utils.validators
+imported = time.perf_counter() - started
+print(json.dumps({'ms': imported * 1000, 'phonenumbers': 'phonenumbers' in sys.modules}))
+'''
+
+
+class Field:
+    def __init__(self, data):
+        self.data = data
+
+    def gettext(self, string):
+        return string
+
+
+def per_call(function, values, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        function(values[i % len(values)])
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def import_cost(runs):
+    samples = [json.loads(subprocess.run([sys.executable, '-c', IMPORT_SAMPLE], capture_output=True, text=True,
+                                         check=True).stdout) for _ in range(runs)]
+    eager = [float(subprocess.run([sys.executable, '-c', 'import time; s = time.perf_counter(); import phonenumbers; '
+                                   'print((time.perf_counter() - s) * 1000)'], capture_output=True, text=True,
+                                  check=True).stdout) for _ in range(runs)]
+    return statistics.median(s['ms'] for s in samples), any(s['phonenumbers'] for s in samples), \
+        statistics.median(eager)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters for the import timing.')
+    args = parser.parse_args()
+
+    wtforms_email = Email()
+    service = ValidationService()
+
+    def direct_phone(value):
+        phonenumbers.is_valid_number(phonenumbers.parse(value, None))
+
+    print(f'{"check":<8} {"uncached us":>12} {"service us":>11}')
+    print(f'{"email":<8} {per_call(lambda v: wtforms_email(None, Field(v)), EMAILS, args.calls):>12.1f} '
+          f'{per_call(service.email, EMAILS, args.calls):>11.2f}')
+    print(f'{"phone":<8} {per_call(direct_phone, PHONES, args.calls):>12.1f} '
+          f'{per_call(service.phone_number, PHONES, args.calls):>11.2f}')
+    print(f'cache: {service.hits} hits, {service.misses} misses')
+
+    validators_ms, loaded, phonenumbers_ms = import_cost(args.runs)
+    print(f'\nimport utils.validators: {validators_ms:.1f} ms '
+          f'(phonenumbers {"loaded" if loaded else "not loaded"}); import phonenumbers alone: {phonenumbers_ms:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,68 @@
 # config.py is a configuration file that contains the configuration settings for the Flask application.
 import os
 
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+INSTANCE_PATH = os.path.join(BASEDIR, 'instance')
+
+
+def _env_flag(name, default='false'):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
 
 class Config:
-    SECRET_KEY = os.environ.get('SECRET_APP_KEY')
+    SECRET_KEY = os.environ.get('SECRET_APP_KEY', 'default_secret_key')
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URI', f"sqlite:///{os.path.join(INSTANCE_PATH, 'User_Auth.db')}"
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    # Comma-separated read replicas; login lookups, load_user and similar reads are routed to them
+    SQLALCHEMY_REPLICA_URIS = tuple(filter(None, os.environ.get('DATABASE_REPLICA_URIS', '').replace(' ', '').split(',')))
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    # Comma-separated shard databases for the user table (a user's shard is a hash of their email); see `flask shards`
+    USER_SHARD_URIS = tuple(filter(None, os.environ.get('USER_SHARD_URIS', '').replace(' ', '').split(',')))
+    # Connection pool per engine (ignored for SQLite)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = _env_flag('DB_POOL_PRE_PING', 'true')
+
+    # Password hash algorithm and cost, pick one for this hardware with `flask hashing calibrate`
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+    # Opt-in request/SQL/hashing/SMTP instrumentation exposed at /metrics (Prometheus text format)
+    METRICS_ENABLED = _env_flag('METRICS_ENABLED')
+
+    # Sorted SHA-1 index of breached passwords, built with `flask breached build`; screening is off without it
+    BREACHED_PASSWORDS_INDEX = os.environ.get('BREACHED_PASSWORDS_INDEX') or None
+
+    # Email checks are syntax-only unless this is turned off (then domains are resolved over DNS)
+    VALIDATION_OFFLINE = _env_flag('VALIDATION_OFFLINE', 'true')
+    PHONE_DEFAULT_REGION = os.environ.get('PHONE_DEFAULT_REGION') or None
+
+    # Authentication audit log, written in batches by a background thread: 'database' (AuditLog table) or 'jsonl'
+    AUDIT_SINK = os.environ.get('AUDIT_SINK', 'database')
+
+    # Per-IP / per-account limits on /login and /forgot-password; 'sqlite' shares counters between workers
+    RATELIMIT_ENABLED = _env_flag('RATELIMIT_ENABLED', 'true')
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'local')
+
+    # Optional extensions initialized by create_app(); drop the ones a deployment does not use.
+    #   csrf      - Flask-WTF CSRF protection
+    #   bootstrap - Bootstrap-Flask (the auth templates import its form macros)
+    #   ckeditor  - Flask-CKEditor, for rich-text fields in the dashboards
+    #   migrate   - Flask-Migrate's `flask db` commands (imports alembic)
+    #   outbox    - background mail delivery thread and `flask outbox` commands
+    #   sessions  - server-side sessions (Sessions table), revocable with "log out everywhere"
+    EXTENSIONS = tuple(
+        os.environ.get('APP_EXTENSIONS', 'csrf,bootstrap,ckeditor,migrate,outbox,sessions').replace(' ', '').split(',')
+    )
+
 
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    BACKGROUND_SYNC = True  # background threads cannot see an in-memory database
+    WTF_CSRF_ENABLED = False
+    RATELIMIT_ENABLED = False
+    EXTENSIONS = ('csrf', 'bootstrap')
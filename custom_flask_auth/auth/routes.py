@@ -1,13 +1,23 @@
 # Route for authentication
 from forms.auth import RegisterForm, LoginForm
-from flask_login import login_user, current_user, logout_user
-from models.user import User, db
+from flask_login import login_user, current_user, logout_user, login_required
+from models.user import User, db, normalize_email
 from flask import Blueprint, render_template, redirect, url_for, flash, current_app, session
-from utils.encryption import hash_and_salt_password, check_password_hash
+from utils.encryption import hash_and_salt_password, check_password_hash, password_needs_rehash
 from utils.email_utils import send_password_reset_email
+from utils.registration import registration_state
+from utils.user_cache import user_cache
+from utils.rate_limit import rate_limit
+from utils.background import background_tasks
+from utils.reset_tokens import reset_tokens
+from utils.breached_passwords import breached_passwords
+from utils.db_routing import read_replica
+from utils.audit import audit_log
+from utils.server_session import end_user_sessions
 
 from . import auth_bp
-from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from itsdangerous import BadSignature, SignatureExpired
+from sqlalchemy.exc import IntegrityError
 from flask import request
 
 
@@ -17,6 +27,7 @@ from flask import request
 # Todo: add /login route
 
 @auth_bp.route('/login', methods=["GET", "POST"])
+@rate_limit('login')
 def login():
     """
     This function handles the login process.
@@ -27,8 +38,8 @@ def login():
     If the credentials are invalid, flash an error message and render the login form again.
     """
 
-    # Check if any users exist in the database to control registration visibility
-    hide_registration = User.query.count() > 0
+    # Registration is hidden once the bootstrap admin exists (cached per process)
+    hide_registration = registration_state.is_closed()
 
     # Redirect authenticated users directly to their profile
     if current_user.is_authenticated:
@@ -42,17 +53,25 @@ def login():
     if form.validate_on_submit():
         email = form.email.data
         password = form.password.data
-        result = db.session.execute(db.select(User).where(User.email == email))
-        user = result.scalar()
+        with read_replica():
+            user = User.get_by_email(email)
 
         if user and check_password_hash(user.password, password):
+            # Transparently upgrade hashes made with an outdated algorithm or cost
+            if password_needs_rehash(user.password):
+                user.password = hash_and_salt_password(password)
+                db.session.commit()
+
             flash('Logged in successfully', 'success')
             login_user(user, remember=form.remember_me.data)
+            audit_log.record('login_success', user.id, email)
 
             # TODO: Consider redirecting to a more appropriate page if needed E.G profile or dashboard
             return f"Login successful! Welcome, {user.first_name} ({user.role})"
 
         else:
+            audit_log.record('login_failure', user.id if user else None, email,
+                             'wrong password' if user else 'unknown email')
             flash('Invalid email or password', 'danger')
 
     # Render login form, passing hide_registration to the template
@@ -67,6 +86,8 @@ def logout():
     This function logs out the dashboard and redirects them to the BLOG page.
     :return:
     """
+    if current_user.is_authenticated:
+        audit_log.record('logout', current_user.id, current_user.email)
     session.clear()
     logout_user()
 
@@ -75,6 +96,27 @@ def logout():
     return "You have been logged out successfully."
 
 
+@auth_bp.route('/logout-everywhere', methods=["POST"])
+@login_required
+def logout_everywhere():
+    """
+    This function ends every session of the current user, on every device, including remember-me cookies.
+    """
+    user = db.session.get(User, current_user.id)
+    user.revoke_sessions()
+    db.session.commit()
+    user_cache.invalidate(user.id)
+    # Other workers may still hold the old epoch in their principal cache: with server-side sessions the
+    # Sessions rows are the authority, and remember-me cookies are checked against the primary (see load_user)
+    end_user_sessions(user.id)
+    audit_log.record('logout_everywhere', user.id, user.email)
+    session.clear()
+    logout_user()
+
+    flash('You have been logged out on every device.', 'success')
+    return "You have been logged out on every device."
+
+
 
 
 
@@ -84,9 +126,8 @@ def register():
 
     form = RegisterForm()
 
-    # Check if any users exist in the database.
-    user_count = User.query.count()
-    if user_count == 0:
+    # Only the first user may register, and becomes the Admin; asked of the primary, never a replica
+    if not registration_state.is_closed(primary=True):
         role = 'Admin'  # First dashboard becomes Admin
     else:
 
@@ -94,14 +135,17 @@ def register():
         return "Registration is closed."
 
     if form.validate_on_submit() and form.data:
-        result = db.session.execute(db.select(User).where(User.email == form.email.data))
-        user = result.scalar()
+        user = User.get_by_email(form.email.data)
         if user:
             flash('Email already exists, Login instead', 'danger')
             return "Email already exists. Please login instead."
 
         # Hash the password with salt
         hashed_password = hash_and_salt_password(form.password.data)
+        # Hashing is slow: check again that no one else registered the Admin meanwhile
+        if registration_state.is_closed(primary=True):
+            flash('Registration is closed. ', 'info')
+            return "Registration is closed."
         # Create new dashboard
         new_user = User(
             email=form.email.data,
@@ -115,6 +159,7 @@ def register():
         db.session.add(new_user)
         flash('Registered successfully', 'success')
         db.session.commit()
+        audit_log.record('register', new_user.id, new_user.email, new_user.role)
         # Log in the dashboard
         login_user(new_user)
         if new_user.role == "Admin":
@@ -131,25 +176,36 @@ def register():
 
     return render_template("/auth/register.html", form=form)
 
+def _send_reset_if_registered(email):
+    """
+    Background half of forgot_password(): the lookup, token generation and email happen here, off the
+    request path, so the response time does not reveal whether the account exists.
+    """
+    user = User.get_by_email(email)
+    if user:
+        send_password_reset_email(user.email, password_epoch=user.password_epoch)
+
+
 @auth_bp.route('/forgot-password', methods=["GET", "POST"])
+@rate_limit('forgot_password')
 def forgot_password():
     if request.method == 'POST':
-        email = request.form.get('email')
-        user = User.query.filter_by(email=email).first()
-        if user:
-            send_password_reset_email(user.email)
-            flash('If the email is registered, a password reset link has been sent', 'info')
-            return redirect(url_for('auth_bp.login'))
-        else:
-            flash('Email address not found.', 'danger')
+        email = normalize_email(request.form.get('email'))
+        if not email or '@' not in email or len(email) > 320:
+            flash('Please enter a valid email address.', 'danger')
             return redirect(url_for('auth_bp.forgot_password'))
+
+        # Uniform response whether or not the email is registered: the lookup and send start after it is sent
+        background_tasks.submit_after_response(_send_reset_if_registered, email, base_url=request.host_url)
+        audit_log.record('password_reset_requested', email=email)
+        flash('If the email is registered, a password reset link has been sent', 'info')
+        return redirect(url_for('auth_bp.login'))
     return render_template("/auth/forgot-password.html")
 
 @auth_bp.route('/reset-password/<token>', methods=['GET', 'POST'])
 def reset_password(token):
-    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     try:
-        email = s.loads(token, salt='password-reset-salt', max_age=3600)  # Token expires after 1 hour
+        claim = reset_tokens.verify(token)  # Token expires after RESET_TOKEN_MAX_AGE (1 hour)
     except SignatureExpired:
         flash('The password reset link has expired.', 'danger')
         return redirect(url_for('auth_bp.forgot_password'))
@@ -157,6 +213,13 @@ def reset_password(token):
         flash('Invalid password reset link.', 'danger')
         return redirect(url_for('auth_bp.forgot_password'))
 
+    # Single use: the link dies once redeemed, and with any password change since it was issued
+    user = User.get_by_email(claim.email)
+    if user is None or user.password_epoch != claim.password_epoch or reset_tokens.is_redeemed(claim.jti):
+        audit_log.record('password_reset_rejected', user.id if user else None, claim.email, 'link already used')
+        flash('This password reset link has already been used.', 'danger')
+        return redirect(url_for('auth_bp.forgot_password'))
+
     if request.method == 'POST':
         password = request.form.get('password')
         confirm_password = request.form.get('confirm_password')
@@ -166,14 +229,24 @@ def reset_password(token):
         if len(password) < 8:
             flash('Password must be at least 8 characters long.', 'danger')
             return redirect(url_for('auth_bp.reset_password', token=token))
-        # Update the dashboard's password
-        user = User.query.filter_by(email=email).first()
-        if user:
-            user.password = hash_and_salt_password(password)
+        if breached_passwords.is_breached(password):
+            flash('This password has appeared in a data breach. Please choose a different one.', 'danger')
+            return redirect(url_for('auth_bp.reset_password', token=token))
+        # Update the dashboard's password and redeem the token in the same transaction
+        user.set_password_hash(hash_and_salt_password(password))
+        reset_tokens.redeem(claim)
+        try:
             db.session.commit()
-            flash('Your password has been updated!', 'success')
-            return redirect(url_for('auth_bp.login'))
-        else:
-            flash('User not found.', 'danger')
-            return redirect(url_for('auth_bp.register'))
+        except IntegrityError:
+            # Another request redeemed the same link first
+            db.session.rollback()
+            audit_log.record('password_reset_rejected', user.id, claim.email, 'link already used')
+            flash('This password reset link has already been used.', 'danger')
+            return redirect(url_for('auth_bp.forgot_password'))
+        user_cache.invalidate(user.id)
+        end_user_sessions(user.id)  # as in logout_everywhere(): the new password ends every session
+        reset_tokens.maybe_sweep()
+        audit_log.record('password_reset', user.id, user.email)
+        flash('Your password has been updated!', 'success')
+        return redirect(url_for('auth_bp.login'))
     return render_template('/auth/reset-password.html', token=token)
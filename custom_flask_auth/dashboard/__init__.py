@@ -0,0 +1,9 @@
+from flask import Blueprint
+
+dashboard_bp = Blueprint(
+    'dashboard_bp',
+    __name__,
+    url_prefix='/admin',
+)
+
+from . import routes  # Import routes after creating the blueprint
@@ -0,0 +1,140 @@
+# custom_flask_auth/dashboard/queries.py
+# Keyset-paginated user listing for the admin dashboard.
+import base64
+import json
+import sys
+
+from sqlalchemy import tuple_
+
+from models.user import User, db, normalize_email, normalize_name
+
+
+# Only what the listing displays; the String(2000) free-text columns never leave the database
+LISTING_COLUMNS = (User.id, User.email, User.first_name, User.last_name, User.role)
+
+SEARCH_FIELDS = ('email', 'name')
+
+MAX_QUERY_LENGTH = 320  # longest email_normalized / name_normalized value
+
+# What a cursor holds in each listing mode: the id, the email, or the (name, id) pair
+CURSOR_TYPES = {None: (int,), 'email': (str,), 'name': (str, int)}
+
+
+def encode_cursor(values):
+    """Returns an opaque, URL-safe cursor for the last row's sort key (str)."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types=None):
+    """This function reverses encode_cursor().
+    param types: Expected type of each value, e.g. (str, int) (tuple)
+    Returns: The sort key values, or None for no cursor (list)
+    Raises: ValueError for a malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    if types is not None and (len(values) != len(types) or not all(
+            isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(values, types))):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def search_prefix(query, field):
+    """This function normalizes a search query the way the searched column is normalized.
+    param query: The prefix as entered (str)
+    param field: 'email' or 'name' (str)
+    Returns: The prefix, or None if there is nothing to search for (str)
+    Raises: ValueError for a query no user can match
+    """
+    if not query:
+        return None
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValueError(f"'q' must be at most {MAX_QUERY_LENGTH} characters")
+    if '\x00' in query:
+        raise ValueError("'q' must not contain NUL characters")
+    prefix = normalize_email(query) if field == 'email' else normalize_name(query, '')
+    return prefix or None
+
+
+def prefix_upper_bound(prefix):
+    """Returns the smallest string greater than every string starting with `prefix`, or None if there is
+    no such string (it only holds U+10FFFF) (str)."""
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    following = ord(stripped[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000  # surrogates cannot be encoded for the database
+    return stripped[:-1] + chr(following)
+
+
+def _prefix_range(column, prefix):
+    upper = prefix_upper_bound(prefix)
+    return (column >= prefix,) if upper is None else (column >= prefix, column < upper)
+
+
+def list_users(limit=50, cursor=None, query=None, field='email'):
+    """
+    This function returns one page of users.
+    param limit: Page size (int)
+    param cursor: Cursor returned with the previous page (str)
+    param query: Optional prefix to search for (str)
+    param field: 'email' or 'name', which prefix `query` matches (str)
+    Returns: (rows as dicts, cursor for the next page or None) (tuple)
+
+    Every page is a seek on an index, never an OFFSET, so page N costs the same as page 1:
+      - no query: `id > :last_id ORDER BY id` on the primary key
+      - email:    a range on the unique `email_normalized` index, seeking on the email itself
+      - name:     a range on the (`name_normalized`, `id`) index, seeking on the (name, id) pair
+    A prefix is searched as `col >= :prefix AND col < :next_prefix` rather than LIKE, which not every
+    database can serve from an index. A query that normalizes to nothing lists every user.
+    Raises: ValueError for an invalid query (see search_prefix) or cursor
+    """
+    query = search_prefix(query, field)
+    after = decode_cursor(cursor, CURSOR_TYPES[field if query else None])
+    statement = db.select(*LISTING_COLUMNS)
+
+    if query and field == 'email':
+        column = User.email_normalized
+        statement = statement.add_columns(column).where(*_prefix_range(column, query))
+        if after:
+            statement = statement.where(column > after[0])
+        statement = statement.order_by(column)
+    elif query and field == 'name':
+        column = User.name_normalized
+        statement = statement.add_columns(column).where(*_prefix_range(column, query))
+        if after:
+            statement = statement.where(tuple_(column, User.id) > tuple_(after[0], after[1]))
+        statement = statement.order_by(column, User.id)
+    else:
+        if after:
+            statement = statement.where(User.id > after[0])
+        statement = statement.order_by(User.id)
+
+    # One extra row tells whether there is a next page without a COUNT(*)
+    rows = db.session.execute(statement.limit(limit + 1)).all()
+    if query:
+        # With a sharded user store each shard returns its own sorted page; merge them (a no-op otherwise)
+        rows.sort(key=(lambda row: row[-1]) if field == 'email' else (lambda row: (row[-1], row.id)))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if query and field == 'email':
+            next_cursor = encode_cursor([last[-1]])
+        elif query and field == 'name':
+            next_cursor = encode_cursor([last[-1], last.id])
+        else:
+            next_cursor = encode_cursor([last.id])
+
+    users = [
+        {'id': row.id, 'email': row.email, 'first_name': row.first_name, 'last_name': row.last_name, 'role': row.role}
+        for row in rows
+    ]
+    return users, next_cursor
@@ -0,0 +1,42 @@
+# Routes for the admin dashboard
+from flask import request, jsonify
+
+from utils.db_routing import read_replica
+from utils.decorators import admin_required
+from .queries import list_users, search_prefix, SEARCH_FIELDS
+
+from . import dashboard_bp
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dashboard_bp.route('/api/users')
+@admin_required
+def users_api():
+    """
+    This function lists users for the admin dashboard, one keyset page at a time.
+
+    Query parameters:
+      q      - optional prefix to search for
+      by     - 'email' (default) or 'name', the field `q` is matched against
+      limit  - page size, 1 to 200 (default 50)
+      cursor - `next_cursor` from the previous page
+    """
+    query = (request.args.get('q') or '').strip()
+    field = request.args.get('by', 'email')
+    if field not in SEARCH_FIELDS:
+        return jsonify(error=f"'by' must be one of: {', '.join(SEARCH_FIELDS)}"), 400
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    try:
+        search_prefix(query, field)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    try:
+        with read_replica():
+            users, next_cursor = list_users(limit, request.args.get('cursor'), query or None, field)
+    except ValueError:
+        return jsonify(error='Invalid cursor'), 400
+    return jsonify(users=users, next_cursor=next_cursor)
@@ -1,17 +1,20 @@
 
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField
-from wtforms.validators import DataRequired, Email, Length, EqualTo
+from wtforms.validators import DataRequired, Length, EqualTo
+
+from utils.validators import EmailValidator, BreachedPasswordValidator
 
 
 
 class RegisterForm(FlaskForm):
     first_name = StringField("First Name", validators=[DataRequired()])
     last_name = StringField("Last Name", validators=[DataRequired()])
-    email = StringField("Email", validators=[DataRequired(), Email()])
+    email = StringField("Email", validators=[DataRequired(), EmailValidator])
     password = PasswordField("Password", validators=[
         DataRequired(),
-        Length(min=8, message="Password must be at least 8 characters long")
+        Length(min=8, message="Password must be at least 8 characters long"),
+        BreachedPasswordValidator,
     ])
     confirm_password = PasswordField("Repeat Password", validators=[
         DataRequired(),
@@ -20,7 +23,7 @@ class RegisterForm(FlaskForm):
     submit = SubmitField("Register")
 
 class LoginForm(FlaskForm):
-    email = StringField('Email', validators=[DataRequired(), Email()])
+    email = StringField('Email', validators=[DataRequired(), EmailValidator])
     password = PasswordField('Password', validators=[DataRequired()])
     remember_me = BooleanField('Remember Me')  # Make sure this field is included
     submit = SubmitField('Login')
\ No newline at end of file
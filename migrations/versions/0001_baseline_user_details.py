@@ -0,0 +1,38 @@
+"""Baseline UserDetails table
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by `db.create_all()` before migrations existed already have the table
+    if sa.inspect(op.get_bind()).has_table('UserDetails'):
+        return
+    op.create_table(
+        'UserDetails',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=2000), nullable=True),
+        sa.Column('password', sa.String(length=2000), nullable=False),
+        sa.Column('first_name', sa.String(length=2000), nullable=False),
+        sa.Column('last_name', sa.String(length=2000), nullable=False),
+        sa.Column('phone_number', sa.String(length=2000), nullable=True),
+        sa.Column('about', sa.String(length=2000), nullable=True),
+        sa.Column('role', sa.String(length=1000), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('UserDetails')
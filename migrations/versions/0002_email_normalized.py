@@ -0,0 +1,41 @@
+"""Add indexed, normalized email column to UserDetails
+
+Revision ID: 0002_email_normalized
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_email_normalized'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('UserDetails')}
+    if 'email_normalized' not in columns:
+        with op.batch_alter_table('UserDetails') as batch_op:
+            batch_op.add_column(sa.Column('email_normalized', sa.String(length=320), nullable=True))
+
+    # Backfill existing rows. Fails on the unique index below if two accounts differ only by case,
+    # which has to be resolved by hand before upgrading.
+    op.execute(
+        'UPDATE "UserDetails" SET email_normalized = lower(trim(email)) '
+        'WHERE email IS NOT NULL AND email_normalized IS NULL'
+    )
+
+    indexes = {index['name'] for index in inspector.get_indexes('UserDetails')}
+    if 'ix_UserDetails_email_normalized' not in indexes:
+        op.create_index('ix_UserDetails_email_normalized', 'UserDetails', ['email_normalized'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_UserDetails_email_normalized', table_name='UserDetails')
+    with op.batch_alter_table('UserDetails') as batch_op:
+        batch_op.drop_column('email_normalized')
@@ -0,0 +1,45 @@
+"""Add EmailOutbox table for queued outgoing mail
+
+Revision ID: 0003_email_outbox
+Revises: 0002_email_normalized
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_email_outbox'
+down_revision = '0002_email_normalized'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('EmailOutbox'):
+        return
+    op.create_table(
+        'EmailOutbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('service', sa.String(length=50), nullable=False),
+        sa.Column('sender', sa.String(length=320), nullable=True),
+        sa.Column('recipient', sa.String(length=320), nullable=True),
+        sa.Column('reply_to', sa.String(length=320), nullable=True),
+        sa.Column('subject', sa.String(length=998), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('subtype', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_EmailOutbox_status_next_attempt_at', 'EmailOutbox', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_EmailOutbox_status_next_attempt_at', table_name='EmailOutbox')
+    op.drop_table('EmailOutbox')
@@ -0,0 +1,29 @@
+"""Add password_epoch to UserDetails
+
+Revision ID: 0004_password_epoch
+Revises: 0003_email_outbox
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_password_epoch'
+down_revision = '0003_email_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('UserDetails')}
+    if 'password_epoch' in columns:
+        return
+    with op.batch_alter_table('UserDetails') as batch_op:
+        batch_op.add_column(sa.Column('password_epoch', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('UserDetails') as batch_op:
+        batch_op.drop_column('password_epoch')
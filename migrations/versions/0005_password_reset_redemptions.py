@@ -0,0 +1,33 @@
+"""Add PasswordResetRedemptions table for single-use reset tokens
+
+Revision ID: 0005_reset_redemptions
+Revises: 0004_password_epoch
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_reset_redemptions'
+down_revision = '0004_password_epoch'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('PasswordResetRedemptions'):
+        return
+    op.create_table(
+        'PasswordResetRedemptions',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('jti')
+    )
+    op.create_index('ix_PasswordResetRedemptions_expires_at', 'PasswordResetRedemptions', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_PasswordResetRedemptions_expires_at', table_name='PasswordResetRedemptions')
+    op.drop_table('PasswordResetRedemptions')
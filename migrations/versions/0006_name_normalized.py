@@ -0,0 +1,41 @@
+"""Add indexed, normalized name column to UserDetails for prefix search
+
+Revision ID: 0006_name_normalized
+Revises: 0005_reset_redemptions
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_name_normalized'
+down_revision = '0005_reset_redemptions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('UserDetails')}
+    if 'name_normalized' not in columns:
+        with op.batch_alter_table('UserDetails') as batch_op:
+            batch_op.add_column(sa.Column('name_normalized', sa.String(length=320), nullable=True))
+
+    # Backfill existing rows; same format as models.user.normalize_name for ASCII names
+    op.execute(
+        'UPDATE "UserDetails" SET name_normalized = '
+        "substr(lower(trim(trim(first_name) || ' ' || trim(last_name))), 1, 320) "
+        'WHERE name_normalized IS NULL'
+    )
+
+    indexes = {index['name'] for index in inspector.get_indexes('UserDetails')}
+    if 'ix_UserDetails_name_normalized_id' not in indexes:
+        op.create_index('ix_UserDetails_name_normalized_id', 'UserDetails', ['name_normalized', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_UserDetails_name_normalized_id', table_name='UserDetails')
+    with op.batch_alter_table('UserDetails') as batch_op:
+        batch_op.drop_column('name_normalized')
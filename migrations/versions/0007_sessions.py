@@ -0,0 +1,39 @@
+"""Add Sessions table for server-side sessions
+
+Revision ID: 0007_sessions
+Revises: 0006_name_normalized
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_sessions'
+down_revision = '0006_name_normalized'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('Sessions'):
+        return
+    op.create_table(
+        'Sessions',
+        sa.Column('id', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_seen', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_Sessions_user_id', 'Sessions', ['user_id'])
+    op.create_index('ix_Sessions_expires_at', 'Sessions', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_Sessions_expires_at', table_name='Sessions')
+    op.drop_index('ix_Sessions_user_id', table_name='Sessions')
+    op.drop_table('Sessions')
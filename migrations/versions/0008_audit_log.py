@@ -0,0 +1,43 @@
+"""Add AuditLog table for authentication events
+
+Revision ID: 0008_audit_log
+Revises: 0007_sessions
+Create Date: 2026-10-18 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_audit_log'
+down_revision = '0007_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('AuditLog'):
+        return
+    op.create_table(
+        'AuditLog',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('partition_key', sa.Integer(), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('event', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('email', sa.String(length=320), nullable=True),
+        sa.Column('ip', sa.String(length=45), nullable=True),
+        sa.Column('detail', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_AuditLog_partition_key_occurred_at', 'AuditLog', ['partition_key', 'occurred_at'])
+    op.create_index('ix_AuditLog_user_id_occurred_at', 'AuditLog', ['user_id', 'occurred_at'])
+    op.create_index('ix_AuditLog_email_occurred_at', 'AuditLog', ['email', 'occurred_at'])
+
+
+def downgrade():
+    op.drop_index('ix_AuditLog_email_occurred_at', table_name='AuditLog')
+    op.drop_index('ix_AuditLog_user_id_occurred_at', table_name='AuditLog')
+    op.drop_index('ix_AuditLog_partition_key_occurred_at', table_name='AuditLog')
+    op.drop_table('AuditLog')
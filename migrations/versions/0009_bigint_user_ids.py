@@ -0,0 +1,48 @@
+"""Widen user ids to 64 bits (sharded ids start at 2**40 + 1)
+
+Revision ID: 0009_bigint_user_ids
+Revises: 0008_audit_log
+Create Date: 2026-10-18 19:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_bigint_user_ids'
+down_revision = '0008_audit_log'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (('UserDetails', 'id'), ('Sessions', 'user_id'), ('AuditLog', 'user_id'))
+
+
+def upgrade():
+    bind = op.get_bind()
+    # SQLite stores every INTEGER as up to 8 bytes already, and rebuilding UserDetails there would gain nothing
+    if bind.dialect.name == 'sqlite':
+        return
+    inspector = sa.inspect(bind)
+    for table, column in COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        current = next(c['type'] for c in inspector.get_columns(table) if c['name'] == column)
+        if isinstance(current, sa.BigInteger):
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, type_=sa.BigInteger(), existing_type=sa.Integer())
+    if bind.dialect.name == 'postgresql':
+        # A SERIAL's sequence is itself typed integer and would stop at 2**31 - 1
+        op.execute('''ALTER SEQUENCE IF EXISTS "UserDetails_id_seq" AS bigint''')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        return
+    if bind.dialect.name == 'postgresql':
+        op.execute('''ALTER SEQUENCE IF EXISTS "UserDetails_id_seq" AS integer''')
+    for table, column in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, type_=sa.Integer(), existing_type=sa.BigInteger())
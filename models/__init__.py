@@ -5,9 +5,16 @@
 
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from utils.db_routing import RoutingSession
+
+# RoutingSession can send reads to replicas (see utils/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 
 # TODO: # Add all the models here
-from .user import User
\ No newline at end of file
+from .user import User
+from .outbox import OutboxMessage
+from .password_reset import PasswordResetRedemption
+from .session import UserSession
+from .audit import AuditEvent
\ No newline at end of file
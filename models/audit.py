@@ -0,0 +1,40 @@
+# models/audit.py
+
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, BigInteger, DateTime, Index
+
+from . import db
+
+
+def partition_key(moment):
+    """Returns the month an event belongs to as YYYYMM, e.g. 202610 (int)."""
+    return moment.year * 100 + moment.month
+
+
+class AuditEvent(db.Model):
+    """
+    Append-only record of an authentication event (login, logout, registration, password reset).
+
+    Rows are never updated. `partition_key` (the event's month) leads the time index, so a time-range query
+    only walks the months it covers and `flask audit prune` removes whole months at a time.
+    """
+    __tablename__ = "AuditLog"
+    __table_args__ = (
+        Index('ix_AuditLog_partition_key_occurred_at', 'partition_key', 'occurred_at'),
+        Index('ix_AuditLog_user_id_occurred_at', 'user_id', 'occurred_at'),
+        Index('ix_AuditLog_email_occurred_at', 'email', 'occurred_at'),
+    )
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    partition_key : Mapped[int] = mapped_column(Integer, nullable=False)
+    occurred_at : Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    event : Mapped[str] = mapped_column(String(32), nullable=False)  # e.g. 'login_success', 'password_reset'
+    user_id : Mapped[int] = mapped_column(BigInteger, nullable=True)
+    email : Mapped[str] = mapped_column(String(320), nullable=True)  # normalized; set even when no user matched
+    ip : Mapped[str] = mapped_column(String(45), nullable=True)
+    detail : Mapped[str] = mapped_column(String(255), nullable=True)
+
+    def __repr__(self):
+        return f'<AuditEvent {self.id} {self.event} user={self.user_id} at={self.occurred_at}>'
@@ -0,0 +1,35 @@
+# models/outbox.py
+
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, Text, DateTime, Index
+
+from . import db
+
+
+class OutboxMessage(db.Model):
+    """A rendered email waiting to be (or already) delivered by the outbox worker."""
+    __tablename__ = "EmailOutbox"
+    __table_args__ = (
+        # The worker only ever asks for "due messages in this status", oldest first
+        Index('ix_EmailOutbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    service : Mapped[str] = mapped_column(String(50), nullable=False, default='gmail')
+    sender : Mapped[str] = mapped_column(String(320), nullable=True)
+    recipient : Mapped[str] = mapped_column(String(320), nullable=True)
+    reply_to : Mapped[str] = mapped_column(String(320), nullable=True)
+    subject : Mapped[str] = mapped_column(String(998), nullable=False)
+    body : Mapped[str] = mapped_column(Text, nullable=False)
+    subtype : Mapped[str] = mapped_column(String(20), nullable=False, default='html')
+    status : Mapped[str] = mapped_column(String(20), nullable=False, default='pending') # 'pending','sending','sent','failed'
+    attempts : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at : Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error : Mapped[str] = mapped_column(Text, nullable=True)
+    created_at : Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at : Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status} to={self.recipient}>'
@@ -0,0 +1,19 @@
+# models/password_reset.py
+
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime
+
+from . import db
+
+
+class PasswordResetRedemption(db.Model):
+    """One row per redeemed password reset token; rows are swept once the token would have expired anyway."""
+    __tablename__ = "PasswordResetRedemptions"
+
+    jti : Mapped[str] = mapped_column(String(32), primary_key=True)  # token id, the primary key makes redemption atomic
+    expires_at : Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<PasswordResetRedemption {self.jti}>'
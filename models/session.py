@@ -0,0 +1,24 @@
+# models/session.py
+
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, BigInteger, Text, DateTime
+
+from . import db
+
+
+class UserSession(db.Model):
+    """Server-side Flask session; the browser cookie only carries `id`."""
+    __tablename__ = "Sessions"
+
+    id : Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id : Mapped[int] = mapped_column(BigInteger, nullable=True, index=True)  # Flask-Login user, if logged in
+    data : Mapped[str] = mapped_column(Text, nullable=False)  # Flask's tagged JSON
+    created_at : Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_seen : Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    # Sliding: moved forward with last_seen; the sweep deletes by this index
+    expires_at : Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UserSession {self.id[:8]} user={self.user_id}>'
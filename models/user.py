@@ -2,21 +2,50 @@
 
 from flask_login import UserMixin
 from sqlalchemy.orm import relationship
-from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Integer, Boolean
+from sqlalchemy.orm import Mapped, mapped_column, validates
+from sqlalchemy import String, Integer, BigInteger, Boolean, Index
 
 from . import db
+from utils.permissions import role_mask
+
+
+def normalize_email(email):
+    """This function returns the canonical form of an email address used for lookups.
+    param email: The email address as entered by the user (str)
+    Returns: The trimmed, lowercased email address, or None if no email was given (str)
+    """
+    if email is None:
+        return None
+    return email.strip().lower()
+
+
+def normalize_name(first_name, last_name):
+    """This function returns the lowercased "first last" form used for name prefix search.
+    param first_name: First name (str)
+    param last_name: Last name (str)
+    Returns: The search key, capped at 320 characters (str)
+    """
+    return f"{(first_name or '').strip()} {(last_name or '').strip()}".strip().lower()[:320]
 
 
 class User(db.Model, UserMixin):
     __tablename__ = "UserDetails"
-    id : Mapped[int] = mapped_column(primary_key=True)
+    # (name, id) so a name prefix range can be paged with a keyset on the same index
+    __table_args__ = (Index('ix_UserDetails_name_normalized_id', 'name_normalized', 'id'),)
+    # 64-bit: sharded ids go past 2**31 (utils.sharding.SHARD_ID_SPAN); SQLite's rowid already is 64-bit and only
+    # autoincrements when the column is declared INTEGER
+    id : Mapped[int] = mapped_column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)
     email : Mapped[str] = mapped_column(String(2000), nullable=True)
+    # Canonical lowercased email, kept in sync with `email` and used for every lookup
+    email_normalized : Mapped[str] = mapped_column(String(320), nullable=True, unique=True, index=True)
     password : Mapped[str] = mapped_column(String(2000), nullable=False)
     first_name: Mapped[str] = mapped_column(String(2000), nullable=False)
     last_name : Mapped[str] = mapped_column(String(2000), nullable=False)
+    # Lowercased "first last", kept in sync with the name columns and used for prefix search
+    name_normalized : Mapped[str] = mapped_column(String(320), nullable=True)
     phone_number : Mapped[str] = mapped_column(String(2000), nullable=True)
-    about : Mapped[str] = mapped_column(String(2000), nullable=True)
+    # Free text nobody lists; only loaded when accessed
+    about : Mapped[str] = mapped_column(String(2000), nullable=True, deferred=True)
     # github_url: Mapped[str] = mapped_column(String(2000), nullable=True)
     # linkedin_url: Mapped[str] = mapped_column(String(2000), nullable=True)
     # facebook_url: Mapped[str] = mapped_column(String(2000), nullable=True)
@@ -24,7 +53,55 @@ class User(db.Model, UserMixin):
     # hackerrank_url: Mapped[str] = mapped_column(String(2000), nullable=True)
     # profile_picture: Mapped[str] = mapped_column(String(2000), nullable=True, default='default_profile.png')
     role : Mapped[str] = mapped_column(String(1000), nullable=False, default='User') # Roles: 'Admin','Contributor','User'
+    # Bumped on every password change and on revoke_sessions(); sessions created before stop resolving to a user
+    password_epoch : Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+
+    @validates('email')
+    def _sync_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+
+    @validates('first_name', 'last_name')
+    def _sync_name_normalized(self, key, value):
+        first_name = value if key == 'first_name' else self.first_name
+        last_name = value if key == 'last_name' else self.last_name
+        self.name_normalized = normalize_name(first_name, last_name)
+        return value
+
+    @property
+    def role_mask(self):
+        return role_mask(self.role)
+
+    def get_id(self):
+        # Same '<id>:<password epoch>' format as utils.user_cache.UserPrincipal
+        return f'{self.id}:{self.password_epoch or 0}'
+
+    def set_password_hash(self, hashed_password):
+        """This function stores a new password hash and invalidates sessions created with the old password.
+        param hashed_password: The new hash (str)
+        """
+        self.password = hashed_password
+        self.password_epoch = (self.password_epoch or 0) + 1
+
+    def revoke_sessions(self):
+        """This function logs the user out everywhere: every session and remember cookie carries the old
+        epoch in its id, so one UPDATE invalidates all of them.
+        """
+        self.password_epoch = (self.password_epoch or 0) + 1
 
+    @classmethod
+    def get_by_email(cls, email):
+        """This function looks up a user by email through the unique index on `email_normalized`.
+        param email: The email address to look up, in any case (str)
+        Returns: The matching user or None (User)
+        """
+        normalized = normalize_email(email)
+        if not normalized:
+            return None
+        return db.session.execute(
+            db.select(cls).where(cls.email_normalized == normalized)
+        ).scalar_one_or_none()
 
     def __repr__(self):
         return f'<User {self.email}>'
\ No newline at end of file
@@ -0,0 +1,67 @@
+# tests/conftest.py
+# Shared fixtures: a fresh app on a file-backed SQLite database per test (background threads need their own
+# connections, which in-memory SQLite cannot share), and a local SMTP relay.
+import pytest
+
+from app import create_app
+from benchmarks.smtp_stand_in import SMTPStandIn
+from models import db
+from utils.registration import registration_state
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Returns a factory building the test app with config overrides; every app is torn down afterwards."""
+    apps = []
+
+    def factory(**config):
+        registration_state.reset()
+        flask_app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+            'WTF_CSRF_ENABLED': False,
+            'RATELIMIT_ENABLED': False,
+            'OUTBOX_WORKER_ENABLED': False,
+            'AUDIT_ENABLED': False,
+            'TEMPLATE_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+            **config,
+        })
+        with flask_app.app_context():
+            # Only the primary: `db` keeps a (table-less) metadata for every replica or shard bind an earlier
+            # test's app registered, and this app has no engine for those
+            db.create_all(bind_key=None)
+        apps.append(flask_app)
+        return flask_app
+
+    yield factory
+    for flask_app in apps:
+        flask_app.extensions['background'].shutdown(wait=True)
+        outbox = flask_app.extensions.get('outbox')
+        if outbox is not None:
+            outbox.stop()
+        with flask_app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def smtp_config(smtp_server):
+    """Config sending the outbox's mail to `smtp_server`."""
+    return {
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': smtp_server.port,
+        'SMTP_USE_TLS': False,
+        'SMTP_USERNAME': None,  # the stand-in has no AUTH
+        'SMTP_PASSWORD': None,
+    }
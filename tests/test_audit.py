@@ -0,0 +1,58 @@
+# tests/test_audit.py
+# Buffered audit events are written through the app that recorded them, never through another app.
+import gc
+
+from models import db
+from models.audit import AuditEvent
+from utils.audit import audit_log
+
+
+def audited_app(make_app, tmp_path, name):
+    return make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / name}.db', AUDIT_ENABLED=True,
+                    AUDIT_WORKER_ENABLED=False)
+
+
+def events(app):
+    with app.app_context():
+        return db.session.execute(db.select(AuditEvent.event)).scalars().all()
+
+
+def test_initializing_another_app_flushes_the_previous_one(make_app, tmp_path):
+    first = audited_app(make_app, tmp_path, 'first')
+    with first.test_request_context():
+        audit_log.record('login_success', 1, 'a@example.com')
+
+    second = audited_app(make_app, tmp_path, 'second')
+
+    assert events(first) == ['login_success']
+    assert events(second) == []
+
+
+def test_events_go_to_the_app_that_recorded_them(make_app, tmp_path):
+    first = audited_app(make_app, tmp_path, 'first')
+    second = audited_app(make_app, tmp_path, 'second')
+    with first.test_request_context():
+        audit_log.record('login_failure', None, 'a@example.com', 'unknown email')
+    with second.test_request_context():
+        audit_log.record('logout', 2, 'b@example.com')
+
+    assert audit_log.flush() == 2
+    assert events(first) == ['login_failure']
+    assert events(second) == ['logout']
+
+
+def test_events_of_a_discarded_app_are_dropped(make_app, tmp_path):
+    from app import create_app
+
+    discarded = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "gone"}.db',
+                            'OUTBOX_WORKER_ENABLED': False, 'AUDIT_WORKER_ENABLED': False})
+    current = audited_app(make_app, tmp_path, 'current')
+    with discarded.test_request_context():
+        audit_log.record('login_success', 1, 'a@example.com')
+    del discarded
+    gc.collect()
+    dropped = audit_log.dropped
+
+    assert audit_log.flush() == 0
+    assert audit_log.dropped == dropped + 1
+    assert events(current) == []
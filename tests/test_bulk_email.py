@@ -0,0 +1,111 @@
+# tests/test_bulk_email.py
+# send_bulk() / send_bulk_email(): chunking and per-recipient results, against the local SMTP stand-in.
+import socket
+import time
+from datetime import timedelta
+
+import pytest
+
+from models import db
+from models.outbox import OutboxMessage
+from utils import email_utils
+from utils.email_utils import send_bulk_email
+from utils.outbox import send_bulk
+
+
+@pytest.fixture
+def bulk_app(make_app, smtp_config, monkeypatch):
+    monkeypatch.setattr(email_utils, 'ADMIN_EMAIL_ADDRESS', 'admin@example.com')
+    return make_app(**smtp_config, OUTBOX_BULK_CHUNK_SIZE=4)
+
+
+@pytest.fixture
+def chunks(bulk_app, monkeypatch):
+    """Sizes of the chunks handed to the SMTP session, in order."""
+    worker = bulk_app.extensions['outbox']
+    send_session = worker.send_session
+    seen = []
+
+    def recording_send_session(service, messages):
+        seen.append(len(messages))
+        return send_session(service, messages)
+
+    monkeypatch.setattr(worker, 'send_session', recording_send_session)
+    return seen
+
+
+def statuses():
+    return dict(db.session.execute(db.select(OutboxMessage.recipient, OutboxMessage.status)).all())
+
+
+def test_messages_are_sent_in_chunks_of_the_configured_size(bulk_app, chunks, smtp_server):
+    def messages():
+        for i in range(10):
+            yield {'recipient': f'user{i}@example.com', 'subject': 'Hi', 'body': 'Hello', 'sender': 'a@example.com'}
+
+    with bulk_app.app_context():
+        results = send_bulk(messages())
+
+    assert chunks == [4, 4, 2]
+    assert len(results) == 10 and all(result.error is None for result in results)
+    assert len(smtp_server.messages) == 10 and smtp_server.connections == 1
+
+
+def test_chunk_size_argument_overrides_the_config(bulk_app, chunks):
+    recipients = [{'email': f'user{i}@example.com', 'name': f'User {i}'} for i in range(7)]
+    with bulk_app.app_context():
+        send_bulk_email('email/user_aknowledgement_email.html', 'Welcome {name}', recipients, chunk_size=3)
+
+    assert chunks == [3, 3, 1]
+
+
+def test_each_chunk_is_leased_when_it_is_claimed(bulk_app, monkeypatch):
+    worker = bulk_app.extensions['outbox']
+    send_session = worker.send_session
+    leases = []
+
+    def slow_send_session(service, messages):
+        leases.append({message.next_attempt_at for message in messages})
+        time.sleep(0.2)
+        return send_session(service, messages)
+
+    monkeypatch.setattr(worker, 'send_session', slow_send_session)
+    messages = [{'recipient': f'user{i}@example.com', 'subject': 'Hi', 'body': 'Hello', 'sender': 'a@example.com'}
+                for i in range(8)]
+    with bulk_app.app_context():
+        send_bulk(messages)
+
+    assert all(len(lease) == 1 for lease in leases)
+    first, second = (lease.pop() for lease in leases)
+    assert second - first >= timedelta(seconds=0.2)
+
+
+def test_each_recipient_gets_its_own_result(bulk_app, smtp_server):
+    recipients = [{'email': email, 'name': email.split('@')[0]}
+                  for email in ('ann@example.com', 'reject-bob@example.com', 'cy@example.com')]
+    with bulk_app.app_context():
+        results = send_bulk_email('email/user_aknowledgement_email.html', 'Welcome {name}', recipients)
+        stored = statuses()
+
+    assert [result.recipient for result in results] == [r['email'] for r in recipients]
+    assert results[0].error is None and results[2].error is None
+    assert '550' in results[1].error
+    # The refusal is permanent, so the worker will not retry it; the others are done
+    assert stored == {'ann@example.com': 'sent', 'reject-bob@example.com': 'failed', 'cy@example.com': 'sent'}
+    assert [sender for sender, _, _ in smtp_server.messages] == ['admin@example.com'] * 2
+    assert smtp_server.connections == 1
+
+
+def test_unreachable_relay_leaves_messages_for_the_worker(make_app, smtp_config, monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        closed_port = probe.getsockname()[1]
+    monkeypatch.setattr(email_utils, 'ADMIN_EMAIL_ADDRESS', 'admin@example.com')
+    app = make_app(**{**smtp_config, 'SMTP_PORT': closed_port})
+    recipients = [{'email': f'user{i}@example.com', 'name': str(i)} for i in range(3)]
+    with app.app_context():
+        results = send_bulk_email('email/user_aknowledgement_email.html', 'Hi {name}', recipients)
+        stored = statuses()
+
+    assert all(result.error for result in results)
+    assert set(stored.values()) == {'pending'}
@@ -0,0 +1,84 @@
+# tests/test_db_routing.py
+# Primary/replica routing: SELECTs inside read_replica() go to the replica, and a client's reads after its
+# commit stay on the primary, within the request and across requests.
+import shutil
+from collections import Counter
+
+import pytest
+from sqlalchemy import event, select
+
+from models import db
+from models.user import User
+from utils.db_routing import STICKY_SESSION_KEY, read_primary, read_replica
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    flask_app = make_app(SQLALCHEMY_REPLICA_URIS=(f'sqlite:///{tmp_path / "replica.db"}',))
+    shutil.copyfile(tmp_path / 'test.db', tmp_path / 'replica.db')  # "replication" of the empty schema
+    return flask_app
+
+
+@pytest.fixture
+def statements(app):
+    """Counts statements per engine: 'primary' or 'replica'."""
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = 'primary' if key is None else 'replica'
+            event.listen(engine, 'before_cursor_execute', lambda *args, name=name: counts.update([name]))
+    return counts
+
+
+def add_user(email):
+    db.session.add(User(email=email, password='x', first_name='Read', last_name='Routing', role='User'))
+    db.session.commit()
+
+
+def find_user(email):
+    return db.session.scalar(select(User).where(User.email == email))
+
+
+def test_reads_go_to_primary_by_default(app, statements):
+    with app.test_request_context():
+        find_user('nobody@example.com')
+    assert statements == {'primary': 1}
+
+
+def test_reads_inside_read_replica_go_to_replica(app, statements):
+    with app.test_request_context():
+        with read_replica():
+            find_user('nobody@example.com')
+            with read_primary():
+                find_user('nobody@example.com')
+    assert statements == {'replica': 1, 'primary': 1}
+
+
+def test_reads_after_a_commit_stay_on_primary(app, statements):
+    with app.test_request_context():
+        add_user('written@example.com')
+        statements.clear()
+        with read_replica():
+            # The replica has not "replicated" the row; only the primary can return it
+            assert find_user('written@example.com') is not None
+    assert statements['replica'] == 0
+
+
+def test_client_that_wrote_sticks_to_primary_across_requests(app, statements):
+    with app.test_request_context() as ctx:
+        add_user('written@example.com')
+        sticky_until = ctx.session[STICKY_SESSION_KEY]
+
+    with app.test_request_context() as ctx:
+        ctx.session[STICKY_SESSION_KEY] = sticky_until
+        statements.clear()
+        with read_replica():
+            assert find_user('written@example.com') is not None
+        assert statements['replica'] == 0
+
+    # Another client, without the timestamp, reads from the replica
+    with app.test_request_context():
+        statements.clear()
+        with read_replica():
+            assert find_user('written@example.com') is None
+        assert statements == {'replica': 1}
@@ -0,0 +1,73 @@
+# tests/test_forgot_password.py
+# POST /forgot-password must not reveal whether an account exists: same response, and the lookup and send
+# happen after it is sent.
+import pytest
+from sqlalchemy import event, insert
+
+from models import db
+from models.outbox import OutboxMessage
+from models.user import User
+
+USERS = 50
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'email': f'user{i}@example.com', 'email_normalized': f'user{i}@example.com', 'password': 'x',
+             'first_name': 'Test', 'last_name': str(i), 'role': 'User'}
+            for i in range(USERS)
+        ])
+        db.session.commit()
+    return app.test_client(use_cookies=False)
+
+
+def forgot(client, email):
+    response = client.post('/forgot-password', data={'email': email})
+    response.close()  # as a server does once the response is written; starts the background send
+    return response
+
+
+def queued(app):
+    with app.app_context():
+        return db.session.execute(db.select(OutboxMessage.recipient)).scalars().all()
+
+
+def test_same_response_and_reset_email_only_for_existing_account(app, client):
+    known, unknown = forgot(client, 'user1@example.com'), forgot(client, 'nobody@example.com')
+    app.extensions['background'].join()
+
+    assert known.status_code == unknown.status_code == 302
+    assert known.location == unknown.location
+    assert queued(app) == ['user1@example.com']
+
+
+@pytest.mark.parametrize('email, sent', [('user1@example.com', ['user1@example.com']), ('nobody@example.com', [])])
+def test_lookup_and_send_start_after_the_response(app, client, email, sent):
+    # Whatever the request itself does is the same for every address, so its timing cannot tell them apart
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    response = client.post('/forgot-password', data={'email': email})
+    app.extensions['background'].join()
+    assert not any('UserDetails' in statement or 'EmailOutbox' in statement for statement in statements)
+    assert queued(app) == []
+
+    response.close()
+    app.extensions['background'].join()
+    assert any('UserDetails' in statement for statement in statements)
+    assert queued(app) == sent
+
+
+def test_send_starts_once_the_body_is_sent_without_close(app, client):
+    # uvicorn's WSGIMiddleware reads the whole body but never calls close()
+    response = client.post('/forgot-password', data={'email': 'user1@example.com'})
+    response.get_data()
+    app.extensions['background'].join()
+    assert queued(app) == ['user1@example.com']
+
+    response.close()  # does not send it twice
+    app.extensions['background'].join()
+    assert queued(app) == ['user1@example.com']
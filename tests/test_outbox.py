@@ -0,0 +1,114 @@
+# tests/test_outbox.py
+# Outbox delivery against the local SMTP stand-in: claiming, backoff, giving up, and connection reuse.
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db
+from models.outbox import OutboxMessage
+from utils.outbox import enqueue_email
+
+SENDER = 'noreply@example.com'
+
+
+def queue(*recipients):
+    return [enqueue_email(recipient, 'Hello', '<p>Hi</p>', sender=SENDER).id for recipient in recipients]
+
+
+def load(message_id):
+    db.session.expire_all()
+    return db.session.get(OutboxMessage, message_id)
+
+
+def make_due(message_id):
+    db.session.execute(db.update(OutboxMessage).where(OutboxMessage.id == message_id)
+                       .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def test_claim_is_exclusive_until_the_lease_expires(make_app, smtp_config):
+    app = make_app(**smtp_config, OUTBOX_LEASE_SECONDS=120)
+    worker = app.extensions['outbox']
+    with app.app_context():
+        message_id, = queue('user@example.com')
+        now = datetime.utcnow()
+
+        assert worker._claim(message_id, now)
+        assert not worker._claim(message_id, now)  # a second worker finds it leased
+        assert load(message_id).status == 'sending'
+        assert worker._claim(message_id, now + timedelta(seconds=121))  # its worker died: claimable again
+
+
+def test_claimed_message_is_not_drained_again(make_app, smtp_config, smtp_server):
+    app = make_app(**smtp_config)
+    worker = app.extensions['outbox']
+    with app.app_context():
+        message_id, = queue('user@example.com')
+        worker._claim(message_id, datetime.utcnow())
+
+        assert worker.drain() == 0
+        assert smtp_server.messages == []
+
+
+def test_failed_attempts_back_off_exponentially(make_app, smtp_config, closed_port):
+    app = make_app(**{**smtp_config, 'SMTP_PORT': closed_port}, OUTBOX_BACKOFF_BASE=30.0)
+    worker = app.extensions['outbox']
+    with app.app_context():
+        message_id, = queue('user@example.com')
+        delays = []
+        for _ in range(2):
+            started = datetime.utcnow()
+            assert worker.drain() == 1
+            message = load(message_id)
+            delays.append((message.next_attempt_at - started).total_seconds())
+            make_due(message_id)
+
+        assert message.status == 'pending' and message.attempts == 2 and message.last_error
+        assert 30 * 0.8 - 1 <= delays[0] <= 30 * 1.2 + 1
+        assert 60 * 0.8 - 1 <= delays[1] <= 60 * 1.2 + 1
+
+
+def test_gives_up_after_max_attempts(make_app, smtp_config, closed_port):
+    app = make_app(**{**smtp_config, 'SMTP_PORT': closed_port}, OUTBOX_MAX_ATTEMPTS=3)
+    worker = app.extensions['outbox']
+    with app.app_context():
+        message_id, = queue('user@example.com')
+        for attempt in range(1, 4):
+            worker.drain()
+            assert load(message_id).attempts == attempt
+            make_due(message_id)
+
+        assert load(message_id).status == 'failed'
+        assert worker.drain() == 0
+
+
+def test_permanent_refusal_fails_without_retrying(make_app, smtp_config, smtp_server):
+    app = make_app(**smtp_config, OUTBOX_MAX_ATTEMPTS=8)
+    worker = app.extensions['outbox']
+    with app.app_context():
+        refused, accepted = queue('reject@example.com', 'user@example.com')
+
+        assert worker.drain_all() == 2
+        message = load(refused)
+        assert (message.status, message.attempts) == ('failed', 1)
+        assert '550' in message.last_error
+        assert load(accepted).status == 'sent'
+
+
+def test_one_pooled_connection_serves_every_message(make_app, smtp_config, smtp_server):
+    app = make_app(**smtp_config, SMTP_POOL_SIZE=2)
+    worker = app.extensions['outbox']
+    with app.app_context():
+        queue(*[f'reject{i}@example.com' if i % 3 == 0 else f'user{i}@example.com' for i in range(10)])
+
+        assert worker.drain_all() == 10
+        assert smtp_server.connections == 1  # refusals do not cost the connection
+        assert len(smtp_server.messages) == 6 and smtp_server.refused == 4
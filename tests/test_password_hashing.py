@@ -0,0 +1,33 @@
+# tests/test_password_hashing.py
+# needs_rehash(): short and spelled-out forms of the same method match; changed parameters do not.
+import pytest
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+
+from utils.password_hashing import canonical_method, generate_hash, needs_rehash, verify_hash
+
+
+PBKDF2_DEFAULT = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+
+@pytest.mark.parametrize('method', ['pbkdf2:sha256', PBKDF2_DEFAULT, 'scrypt', 'scrypt:32768:8:1'])
+def test_hash_made_with_the_configured_method_is_kept(method):
+    pwhash = generate_hash('correct horse', method)
+    assert verify_hash(pwhash, 'correct horse')
+    assert not needs_rehash(pwhash, method)
+
+
+@pytest.mark.parametrize('short, full', [('pbkdf2:sha256', PBKDF2_DEFAULT), ('scrypt', 'scrypt:32768:8:1')])
+def test_short_and_full_forms_are_interchangeable(short, full):
+    assert canonical_method(short) == full
+    assert not needs_rehash(generate_hash('correct horse', short), full)
+    assert not needs_rehash(generate_hash('correct horse', full), short)
+
+
+@pytest.mark.parametrize('stored, wanted', [
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256'),
+    ('pbkdf2:sha256', 'pbkdf2:sha256:600000'),
+    ('scrypt:16384:8:1', 'scrypt'),
+    ('pbkdf2:sha256', 'scrypt'),
+])
+def test_different_parameters_need_a_rehash(stored, wanted):
+    assert needs_rehash(generate_hash('correct horse', stored), wanted)
@@ -0,0 +1,47 @@
+# tests/test_rate_limit.py
+# LocalBackend: the sliding-window limit holds when many threads hit the same key at once.
+import sys
+import threading
+
+import pytest
+
+from utils.rate_limit import LocalBackend
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    # Switch threads every few bytecodes so a read-modify-write race has every chance to show
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_hits_on_one_key_respect_the_limit(frequent_thread_switches):
+    backend = LocalBackend()
+    start = threading.Barrier(20)
+    allowed = []
+
+    def client():
+        start.wait()
+        for _ in range(50):
+            ok, _ = backend.hit('login:203.0.113.7', limit=10, period=60, now=1000.0)
+            allowed.append(ok)
+
+    threads = [threading.Thread(target=client) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert allowed.count(True) == 10
+
+
+def test_least_recently_hit_keys_are_evicted():
+    backend = LocalBackend(max_keys=2)
+    for key in ('a', 'b', 'a', 'c'):
+        backend.hit(key, limit=1, period=60, now=1000.0)
+
+    # 'b' was evicted, so it starts over; 'a' and 'c' are still at their limit
+    assert backend.hit('b', limit=1, period=60, now=1000.0) == (True, 0)
+    assert not backend.hit('c', limit=1, period=60, now=1000.0)[0]
@@ -0,0 +1,108 @@
+# tests/test_server_session.py
+# Server-side sessions: an opaque cookie, id rotation on login, lazy expiry, and every session of a user ending
+# on "log out everywhere" and on a password reset.
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db
+from models.session import UserSession
+from models.user import User
+from utils.email_utils import generate_reset_token
+from utils.encryption import hash_and_salt_password
+
+PASSWORD = 'correct horse 1'
+
+
+@pytest.fixture
+def app(make_app):
+    flask_app = make_app(EXTENSIONS=('csrf', 'bootstrap', 'sessions'), PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    with flask_app.app_context():
+        db.session.add(User(email='ada@example.com', password=hash_and_salt_password(PASSWORD),
+                            first_name='Ada', last_name='Lovelace', role='User'))
+        db.session.commit()
+    return flask_app
+
+
+def session_cookie(client):
+    return next((cookie.value for cookie in client.cookie_jar if cookie.name == 'session'), None)
+
+
+def logged_in_client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'email': 'ada@example.com', 'password': PASSWORD})
+    assert response.data.startswith(b'Login successful')
+    return client
+
+
+def is_logged_in(client):
+    return client.get('/login').data.startswith(b'Already logged in')
+
+
+def stored_sessions(app):
+    with app.app_context():
+        return db.session.execute(db.select(UserSession.id, UserSession.user_id)).all()
+
+
+def test_cookie_carries_only_the_session_id(app):
+    client = logged_in_client(app)
+    sid = session_cookie(client)
+
+    assert [tuple(row) for row in stored_sessions(app)] == [(sid, 1)]
+    assert is_logged_in(client)
+
+
+def test_login_rotates_the_session_id(app):
+    client = app.test_client()
+    client.get('/forgot-password')  # its form's CSRF token starts an anonymous session
+    before = session_cookie(client)
+    client.post('/login', data={'email': 'ada@example.com', 'password': PASSWORD})
+
+    assert before is not None and session_cookie(client) != before
+    assert before not in {sid for sid, _ in stored_sessions(app)}
+
+
+def test_request_without_cookie_does_not_read_sessions(app):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    app.test_client().get('/forgot-password')
+
+    assert not any('FROM "Sessions"' in statement for statement in statements)
+
+
+def test_expired_session_reads_as_missing_and_is_swept(app):
+    client = logged_in_client(app)
+    sessions = app.extensions['server_sessions']
+    with app.app_context():
+        db.session.execute(db.update(UserSession).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        sessions.store.discard(session_cookie(client))
+
+    assert not is_logged_in(client)
+    with app.app_context():
+        assert sessions.store.sweep() >= 1
+    assert all(user_id is None for _, user_id in stored_sessions(app))
+
+
+def test_logout_everywhere_ends_every_session_of_the_user(app):
+    laptop, phone = logged_in_client(app), logged_in_client(app)
+    laptop.post('/logout-everywhere')
+
+    assert not is_logged_in(phone)
+    assert not is_logged_in(laptop)
+    assert all(user_id is None for _, user_id in stored_sessions(app))
+
+
+def test_password_reset_ends_every_session_of_the_user(app):
+    laptop, phone = logged_in_client(app), logged_in_client(app)
+    with app.test_request_context():
+        token = generate_reset_token('ada@example.com')
+
+    response = app.test_client().post(f'/reset-password/{token}',
+                                      data={'password': 'new password 2', 'confirm_password': 'new password 2'})
+    assert response.location.endswith('/login')
+    assert all(user_id is None for _, user_id in stored_sessions(app))
+    assert not is_logged_in(laptop)
+    assert not is_logged_in(phone)
@@ -0,0 +1,153 @@
+# tests/test_sharding.py
+# Hash-sharded user store on SQLite files: lookups that touch one shard, ids that carry their shard, the merged
+# admin listing, multi-user flushes, imports, and rebalancing after a shard is added.
+from collections import Counter
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import load_user
+from models import db
+from models.user import User
+from utils.sharding import bind_key, id_range, shard_for_email, shard_for_id, user_shards
+from utils.user_cache import user_cache
+from utils.user_io import import_users
+
+
+@pytest.fixture
+def sharded_app(make_app, tmp_path):
+    def factory(shards):
+        app = make_app(USER_SHARD_URIS=tuple(f'sqlite:///{tmp_path / f"users-{i}.db"}' for i in range(shards)))
+        with app.app_context():
+            user_shards.create_tables()
+        return app
+    return factory
+
+
+@pytest.fixture
+def app(sharded_app):
+    return sharded_app(2)
+
+
+@pytest.fixture
+def statements(app):
+    """Counts statements per bind key (None is the main database)."""
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            event.listen(engine, 'before_cursor_execute', lambda *args, key=key: counts.update([key]))
+    return counts
+
+
+def new_user(email):
+    return User(email=email, password='x', first_name='Shard', last_name='Test', role='User')
+
+
+def emails_on(shard, count, shards=2):
+    """The first `count` test emails that hash to `shard`."""
+    emails = (f'user{i}@example.com' for i in range(10_000))
+    return [email for email in emails if shard_for_email(email, shards) == shard][:count]
+
+
+def test_users_flushed_together_get_distinct_ids_on_their_shard(app):
+    emails = emails_on(0, 3) + emails_on(1, 3)
+    with app.app_context():
+        db.session.add_all(new_user(email) for email in emails)
+        db.session.commit()  # one flush, several users per shard
+        db.session.add_all(new_user(email) for email in emails_on(1, 5)[3:])
+        db.session.commit()
+        users = {email: User.get_by_email(email) for email in emails + emails_on(1, 5)[3:]}
+
+    assert len({user.id for user in users.values()}) == 8
+    for email, user in users.items():
+        low, high = id_range(shard_for_email(email, 2))
+        assert low <= user.id <= high
+
+
+def test_lookup_by_email_or_id_runs_on_one_shard(app, statements):
+    email = emails_on(1, 1)[0]
+    with app.app_context():
+        db.session.add(new_user(email))
+        db.session.commit()
+        statements.clear()
+        user = User.get_by_email(email)
+        assert db.session.get(User, user.id) is user
+        db.session.expire_all()
+        assert db.session.get(User, user.id).email == email
+    assert set(statements) == {bind_key(1)}
+
+
+def test_load_user_finds_the_shard_from_the_id(app, statements):
+    email = emails_on(1, 1)[0]
+    with app.app_context():
+        db.session.add(new_user(email))
+        db.session.commit()
+        user_id = db.session.scalar(db.select(User.id).where(User.email == email))
+    assert shard_for_id(user_id) == 1
+
+    with app.test_request_context():
+        user_cache.invalidate(user_id)
+        statements.clear()
+        principal = load_user(f'{user_id}:0')
+    assert principal.email == email
+    assert set(statements) == {bind_key(1)}
+
+
+def test_admin_listing_merges_every_shard(app):
+    client = app.test_client()
+    client.post('/register', data={'first_name': 'Ada', 'last_name': 'Admin', 'email': 'admin@example.com',
+                                   'password': 'correct horse 1', 'confirm_password': 'correct horse 1'})
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'email': f'user{i:02}@example.com', 'email_normalized': f'user{i:02}@example.com', 'password': 'x',
+             'first_name': 'Test', 'last_name': f'{i:02}', 'name_normalized': f'test {i:02}', 'role': 'User'}
+            for i in range(12)
+        ])
+        db.session.commit()
+
+    listed, cursor = [], None
+    while True:
+        body = client.get('/admin/api/users', query_string={'limit': 5, 'cursor': cursor or ''}).json
+        listed += body['users']
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    ids = [user['id'] for user in listed]
+    assert len(ids) == len(set(ids)) == 13
+    assert ids == sorted(ids)
+    assert {shard_for_id(user_id) for user_id in ids} == {0, 1}
+
+
+def test_import_puts_each_user_on_its_shard(app):
+    records = [{'email': f'user{i}@example.com', 'first_name': 'Import', 'last_name': str(i), 'password_hash': 'x'}
+               for i in range(40)]
+    with app.app_context():
+        stats = import_users(records, batch_size=15, workers=0)
+        counts = user_shards.counts()
+        users = [User.get_by_email(record['email']) for record in records]
+
+    assert stats.inserted == 40
+    assert sum(total for total, _ in counts.values()) == 40
+    assert all(misplaced == 0 for _, misplaced in counts.values())
+    assert all(shard_for_id(user.id) == shard_for_email(user.email, 2) for user in users)
+
+
+def test_rebalance_after_adding_a_shard(sharded_app):
+    emails = [f'user{i}@example.com' for i in range(60)]
+    with sharded_app(2).app_context():
+        import_users(({'email': email, 'first_name': 'Move', 'last_name': 'Me', 'password_hash': 'x'}
+                      for email in emails), workers=0)
+
+    app = sharded_app(3)
+    with app.app_context():
+        to_move = sum(misplaced for _, misplaced in user_shards.counts().values())
+        moved = user_shards.rebalance(batch_size=7)
+        counts = user_shards.counts()
+        users = [User.get_by_email(email) for email in emails]
+
+    assert moved == to_move == sum(1 for email in emails if shard_for_email(email, 2) != shard_for_email(email, 3))
+    assert sum(total for total, _ in counts.values()) == 60
+    assert all(misplaced == 0 for _, misplaced in counts.values())
+    assert all(shard_for_id(user.id) == shard_for_email(user.email, 3) for user in users)
+    with app.app_context():
+        assert user_shards.rebalance() == 0  # nothing left to move
@@ -0,0 +1,50 @@
+# tests/test_user_cache.py
+# UserCache.load(): a session older than the cached password epoch is rejected without a query; a newer one
+# means the cached copy is stale and the primary is asked.
+import pytest
+from sqlalchemy import event
+
+from models import db
+from models.user import User
+from utils.user_cache import user_cache
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(email='ada@example.com', password='x', first_name='Ada', last_name='Lovelace', role='User')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def statements(app):
+    queries = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+    return queries
+
+
+def test_session_older_than_the_cache_is_rejected_without_a_query(app, user_id, statements):
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == user_id).values(password_epoch=2))
+        db.session.commit()
+        assert user_cache.load(f'{user_id}:2').password_epoch == 2  # cached
+        statements.clear()
+
+        assert user_cache.load(f'{user_id}:1') is None
+    assert statements == []
+
+
+def test_session_newer_than_the_cache_rechecks_the_database(app, user_id, statements):
+    with app.app_context():
+        assert user_cache.load(f'{user_id}:0') is not None  # cached at epoch 0
+        # A password change another worker committed: this process's cache did not see it
+        with db.engine.begin() as connection:
+            connection.execute(db.update(User).where(User.id == user_id).values(password_epoch=1))
+        statements.clear()
+
+        assert user_cache.load(f'{user_id}:1').password_epoch == 1
+        assert user_cache.load(f'{user_id}:0') is None
+    assert len(statements) == 1
@@ -0,0 +1,83 @@
+# tests/test_user_listing.py
+# Admin user listing: keyset pages, and 400s (never 500s) for malformed cursors and queries.
+import pytest
+from sqlalchemy import insert
+
+from custom_flask_auth.dashboard.queries import encode_cursor, prefix_upper_bound
+from models import db
+from models.user import User
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    client.post('/register', data={'first_name': 'Ada', 'last_name': 'Admin', 'email': 'admin@example.com',
+                                   'password': 'correct horse 1', 'confirm_password': 'correct horse 1'})
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'email': f'user{i:02}@example.com', 'email_normalized': f'user{i:02}@example.com', 'password': 'x',
+             'first_name': 'Test', 'last_name': f'{i:02}', 'name_normalized': f'test {i:02}', 'role': 'User'}
+            for i in range(12)
+        ])
+        db.session.commit()
+    return client
+
+
+def pages(client, **params):
+    emails, cursor = [], None
+    while True:
+        body = client.get('/admin/api/users', query_string={**params, 'limit': 5, 'cursor': cursor or ''}).json
+        emails += [user['email'] for user in body['users']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return emails
+
+
+@pytest.mark.parametrize('params, count', [({}, 13), ({'q': 'user'}, 12), ({'q': 'test', 'by': 'name'}, 12)])
+def test_pages_cover_every_match_once(admin, params, count):
+    emails = pages(admin, **params)
+    assert len(emails) == len(set(emails)) == count
+
+
+@pytest.mark.parametrize('params, cursor', [
+    ({}, [{'a': 1}]),
+    ({}, ['1']),
+    ({}, [True]),
+    ({}, []),
+    ({'q': 'user'}, [1]),
+    ({'q': 'test', 'by': 'name'}, ['test 01']),
+    ({'q': 'test', 'by': 'name'}, [1, 'test 01']),
+])
+def test_malformed_cursor_is_rejected(admin, params, cursor):
+    response = admin.get('/admin/api/users', query_string={**params, 'cursor': encode_cursor(cursor)})
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('query', ['\U0010ffff', 'user\U0010ffff', '퟿', '.'])
+def test_unusual_queries_search_instead_of_failing(admin, query):
+    response = admin.get('/admin/api/users', query_string={'q': query})
+    assert response.status_code == 200
+
+
+def test_query_that_normalizes_to_nothing_lists_everyone(app, admin):
+    from custom_flask_auth.dashboard.queries import list_users
+
+    with app.test_request_context():
+        users, _ = list_users(limit=50, query='   ', field='name')
+    assert len(users) == 13
+
+
+@pytest.mark.parametrize('query, error', [('x' * 321, "'q' must be at most 320 characters"),
+                                          ('a\x00b', "'q' must not contain NUL characters")])
+def test_invalid_query_has_its_own_error(admin, query, error):
+    response = admin.get('/admin/api/users', query_string={'q': query})
+    assert response.status_code == 400
+    assert response.json == {'error': error}
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound('abc') == 'abd'
+    assert prefix_upper_bound('a\U0010ffff') == 'b'
+    assert prefix_upper_bound('\U0010ffff') is None
+    assert prefix_upper_bound('퟿') == ''
@@ -0,0 +1,367 @@
+# utils/audit.py
+# Write-behind audit log of authentication events: routes append to a bounded in-memory buffer, a background
+# thread writes batches to the AuditLog table (or to daily JSONL files).
+import atexit
+import json
+import os
+import threading
+import weakref
+from collections import deque
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, has_app_context, has_request_context, request
+from flask.cli import AppGroup, with_appcontext
+
+from models import db
+from models.audit import AuditEvent, partition_key
+from models.user import normalize_email
+
+
+AUDIT_DEFAULTS = {
+    'AUDIT_ENABLED': True,
+    'AUDIT_SINK': 'database',          # 'database' (AuditLog table) or 'jsonl' (one file per day in AUDIT_DIR)
+    'AUDIT_DIR': None,                 # defaults to <instance>/audit
+    'AUDIT_WORKER_ENABLED': None,      # None: run the flusher thread unless the app is in testing mode
+    'AUDIT_BUFFER_SIZE': 10000,        # events held in memory per process
+    'AUDIT_BATCH_SIZE': 500,           # events per multi-row INSERT (or file append)
+    'AUDIT_FLUSH_INTERVAL': 1.0,       # seconds an event may wait for a batch to fill
+    'AUDIT_BLOCK_TIMEOUT': 0.05,       # seconds record() waits for room in a full buffer before dropping
+}
+
+FIELDS = ('partition_key', 'occurred_at', 'event', 'user_id', 'email', 'ip', 'detail')
+
+
+class AuditLog:
+    """
+    Buffers audit events in memory and writes them in batches off the request path.
+
+    record() is an append to a bounded deque. The flusher thread wakes when a batch is full or
+    AUDIT_FLUSH_INTERVAL has passed and writes up to AUDIT_BATCH_SIZE events per statement, so a burst of
+    logins costs one INSERT per batch instead of one INSERT and commit per request. When the buffer is full
+    (the sink is down or slower than the traffic), record() waits up to AUDIT_BLOCK_TIMEOUT for the flusher
+    to make room, then drops the event and counts it, so memory stays bounded and requests never hang.
+
+    Each event is written through the app that recorded it, inside that app's context, even after another
+    app was initialized (tests, benchmarks, app factories); events of an app that no longer exists are
+    dropped and counted instead of going to another app's database. The buffer is flushed when the app
+    changes and at interpreter exit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+        self._exit_hook = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in AUDIT_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        if self.app is not None and self.app is not app:
+            # Stops the previous app's flusher and writes its events through it, before anything is switched
+            self.stop()
+        self.app = app
+        app.extensions['audit'] = self
+        self._stop.clear()
+        if not self._exit_hook:
+            atexit.register(self.stop, timeout=5)
+            self._exit_hook = True
+
+    @property
+    def config(self):
+        return self.app.config
+
+    def _check_fork(self):
+        # A forked worker inherits the buffer and lock but not the thread: start over with its own
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._buffer = deque()
+            self._cond = threading.Condition()
+            self._thread = None
+
+    def _worker_enabled(self):
+        enabled = self.config['AUDIT_WORKER_ENABLED']
+        return not self.app.testing if enabled is None else enabled
+
+    # Producers
+
+    def record(self, event, user_id=None, email=None, detail=None):
+        """
+        This function queues one audit event; it never touches the database itself.
+        param event: Event name, e.g. 'login_failure' (str)
+        param user_id: The user concerned, if known (int)
+        param email: The email address concerned, normalized before storing (str)
+        param detail: Short free text, e.g. why a login failed (str)
+        Returns: False if the event was dropped because the buffer stayed full (bool)
+        """
+        app = current_app._get_current_object() if has_app_context() else self.app
+        if app is None or app.extensions.get('audit') is not self or not app.config['AUDIT_ENABLED']:
+            return True
+        now = datetime.utcnow()
+        row = {
+            'partition_key': partition_key(now),
+            'occurred_at': now,
+            'event': event,
+            'user_id': user_id,
+            'email': normalize_email(email) if email else None,
+            'ip': request.remote_addr if has_request_context() else None,
+            'detail': detail[:255] if detail else None,
+        }
+        self._check_fork()
+        size = self.config['AUDIT_BUFFER_SIZE']
+        with self._cond:
+            if len(self._buffer) >= size:
+                self._cond.notify_all()
+                if not self._cond.wait_for(lambda: len(self._buffer) < size, self.config['AUDIT_BLOCK_TIMEOUT']):
+                    self.dropped += 1
+                    return False
+            self._buffer.append((weakref.ref(app), row))
+            if len(self._buffer) >= self.config['AUDIT_BATCH_SIZE']:
+                self._cond.notify_all()
+        if self._thread is None and self._worker_enabled():
+            self.start()
+        return True
+
+    # Writing
+
+    def _take(self, limit):
+        with self._cond:
+            batch = [self._buffer.popleft() for _ in range(min(limit, len(self._buffer)))]
+            if batch:
+                self._cond.notify_all()  # producers waiting for room
+        return batch
+
+    def flush(self):
+        """This function writes every buffered event now, in batches.
+        Returns: Number of events written (int)
+        """
+        self._check_fork()
+        written = 0
+        while batch := self._take(self.config['AUDIT_BATCH_SIZE']):
+            for app, rows in _by_app(batch):
+                if app is None:
+                    self.dropped += len(rows)
+                    self.app.logger.warning(f'Dropped {len(rows)} audit event(s) of an app that no longer exists')
+                    continue
+                try:
+                    self._write(app, rows)
+                except Exception as e:
+                    self.failed += len(rows)
+                    app.logger.error(f'Could not write {len(rows)} audit event(s): {e}')
+                    continue
+                written += len(rows)
+        self.written += written
+        return written
+
+    @staticmethod
+    def _write(app, batch):
+        if app.config['AUDIT_SINK'] == 'jsonl':
+            by_day = {}
+            for row in batch:
+                by_day.setdefault(row['occurred_at'].date(), []).append(row)
+            directory = audit_dir(app)
+            os.makedirs(directory, exist_ok=True)
+            for day, rows in by_day.items():
+                # One append per day and batch; O_APPEND keeps concurrent workers' lines whole
+                with open(os.path.join(directory, f'audit-{day:%Y%m%d}.jsonl'), 'a', encoding='utf-8') as f:
+                    f.write(''.join(_to_json(row) + '\n' for row in rows))
+        else:
+            with app.app_context(), db.engine.begin() as connection:
+                # executemany of an INSERT is sent as multi-row INSERT ... VALUES statements (insertmanyvalues)
+                connection.execute(AuditEvent.__table__.insert(), batch)
+
+    # Background thread
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops the flusher thread and writes whatever is still buffered."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        if self.app is not None and self._buffer:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stop.is_set() or len(self._buffer) >= self.config['AUDIT_BATCH_SIZE'],
+                    self.config['AUDIT_FLUSH_INTERVAL'],
+                )
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.error(f'Audit flusher error: {e}')
+
+    def collect(self):
+        """Metrics collector (see utils.metrics.MetricsRegistry.add_collector)."""
+        return [
+            ('audit_buffer_size', 'gauge', 'Audit events waiting to be written.', {(): len(self._buffer)}),
+            ('audit_events_total', 'counter', 'Audit events by outcome.', {
+                (('result', 'written'),): self.written,
+                (('result', 'dropped'),): self.dropped,
+                (('result', 'failed'),): self.failed,
+            }),
+        ]
+
+
+audit_log = AuditLog()
+
+
+def _by_app(batch):
+    # Consecutive (app reference, row) entries grouped per app, in order; the app is None once collected
+    groups = []
+    for ref, row in batch:
+        if groups and groups[-1][0] == ref:
+            groups[-1][1].append(row)
+        else:
+            groups.append((ref, [row]))
+    return [(ref(), rows) for ref, rows in groups]
+
+
+def audit_dir(app):
+    return app.config['AUDIT_DIR'] or os.path.join(app.instance_path, 'audit')
+
+
+def _to_json(row):
+    return json.dumps({**row, 'occurred_at': row['occurred_at'].isoformat(sep=' ')})
+
+
+def _months(since, until):
+    key, last = partition_key(since), partition_key(until)
+    keys = []
+    while key <= last:
+        keys.append(key)
+        key = key + 89 if key % 100 == 12 else key + 1  # 202612 -> 202701
+    return keys
+
+
+def query_events(user_id=None, email=None, since=None, until=None, event=None, limit=100):
+    """
+    This function returns audit events, oldest first.
+    param user_id: Only events of this user (int)
+    param email: Only events for this email address, including failed logins for unknown accounts (str)
+    param since: Inclusive lower bound (datetime)
+    param until: Exclusive upper bound, defaults to now (datetime)
+    param event: Only this event name (str)
+    param limit: Maximum number of events (int)
+    Returns: One dict per event with the AuditLog columns (list)
+
+    With the database sink, the user or email index answers the query; the time range is also turned into
+    the partition keys it covers. With the JSONL sink only the files of the days in range are read.
+    """
+    until = until or datetime.utcnow() + timedelta(seconds=1)
+    email = normalize_email(email) if email else None
+    app = current_app
+    if app.config['AUDIT_SINK'] == 'jsonl':
+        return _query_files(app, user_id, email, since, until, event, limit)
+
+    query = db.select(*(getattr(AuditEvent, field) for field in FIELDS))
+    if user_id is not None:
+        query = query.where(AuditEvent.user_id == user_id)
+    if email is not None:
+        query = query.where(AuditEvent.email == email)
+    if since is not None:
+        query = query.where(AuditEvent.partition_key.in_(_months(since, until)), AuditEvent.occurred_at >= since)
+    if event is not None:
+        query = query.where(AuditEvent.event == event)
+    query = query.where(AuditEvent.occurred_at < until).order_by(AuditEvent.occurred_at, AuditEvent.id).limit(limit)
+    return [dict(zip(FIELDS, row)) for row in db.session.execute(query)]
+
+
+def _query_files(app, user_id, email, since, until, event, limit):
+    directory = audit_dir(app)
+    names = sorted(name for name in os.listdir(directory) if name.startswith('audit-')) \
+        if os.path.isdir(directory) else []
+    low = f'audit-{since:%Y%m%d}.jsonl' if since else ''
+    high = f'audit-{until:%Y%m%d}.jsonl'
+    events = []
+    for name in names:
+        if not low <= name <= high:
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                row['occurred_at'] = datetime.fromisoformat(row['occurred_at'])
+                if ((user_id is None or row['user_id'] == user_id) and (email is None or row['email'] == email)
+                        and (event is None or row['event'] == event)
+                        and (since is None or row['occurred_at'] >= since) and row['occurred_at'] < until):
+                    events.append(row)
+    events.sort(key=lambda row: row['occurred_at'])
+    return events[:limit]
+
+
+def prune_events(before, batch_size=5000):
+    """
+    This function deletes whole partitions older than `before`: months for the database sink, days for JSONL.
+    Returns: Number of events (database) or files (JSONL) removed (int)
+    """
+    app = current_app
+    if app.config['AUDIT_SINK'] == 'jsonl':
+        directory = audit_dir(app)
+        cutoff = f'audit-{before:%Y%m%d}.jsonl'
+        removed = 0
+        for name in os.listdir(directory) if os.path.isdir(directory) else ():
+            if name.startswith('audit-') and name < cutoff:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+        return removed
+
+    table = AuditEvent.__table__
+    cutoff = partition_key(before)
+    deleted = 0
+    while True:
+        # Batched so no single transaction holds the table for long
+        batch = db.select(table.c.id).where(table.c.partition_key < cutoff).limit(batch_size).scalar_subquery()
+        with db.engine.begin() as connection:
+            count = connection.execute(table.delete().where(table.c.id.in_(batch))).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+audit_cli = AppGroup('audit', help='Query and prune the authentication audit log.')
+
+
+@audit_cli.command('query')
+@click.option('--user', 'who', help='User id or email address.')
+@click.option('--since', type=click.DateTime(), help='Inclusive start (UTC).')
+@click.option('--until', type=click.DateTime(), help='Exclusive end (UTC) [default: now].')
+@click.option('--event', help="Event name, e.g. 'login_failure'.")
+@click.option('--limit', type=click.IntRange(1), default=100, show_default=True)
+@with_appcontext
+def query_command(who, since, until, event, limit):
+    """Print matching events as JSON lines, oldest first."""
+    user_id = int(who) if who and who.isdigit() else None
+    email = who if who and user_id is None else None
+    for row in query_events(user_id, email, since, until, event, limit):
+        click.echo(_to_json(row))
+
+
+@audit_cli.command('prune')
+@click.option('--before', type=click.DateTime(), required=True,
+              help='Remove partitions (months, or days for JSONL) that end before this date.')
+@with_appcontext
+def prune_command(before):
+    """Delete old audit partitions."""
+    removed = prune_events(before)
+    unit = 'file(s)' if current_app.config['AUDIT_SINK'] == 'jsonl' else 'event(s)'
+    click.echo(f'Removed {removed} {unit}.')
@@ -0,0 +1,122 @@
+# utils/background.py
+# Small bounded thread pool for work a request should not wait on (e.g. the forgot-password lookup and send).
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import after_this_request
+
+
+BACKGROUND_DEFAULTS = {
+    'BACKGROUND_WORKERS': 2,
+    'BACKGROUND_MAX_PENDING': 1000,   # submissions beyond this are dropped (and logged) instead of queueing forever
+    'BACKGROUND_SYNC': False,         # run tasks inline, e.g. for debugging
+}
+
+
+class BackgroundTasks:
+    """
+    Runs callables in worker threads inside an app context of their own.
+
+    Tasks that need `url_for(..., _external=True)` or templates get a request context built from the
+    originating request's base URL, since the real request is gone by the time they run.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._slots = None
+        self._pending = 0
+        self._idle = threading.Condition()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in BACKGROUND_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.shutdown()
+        self.app = app
+        self._slots = threading.BoundedSemaphore(app.config['BACKGROUND_MAX_PENDING'])
+        app.extensions['background'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.app.config['BACKGROUND_WORKERS'], thread_name_prefix='background'
+            )
+        return self._executor
+
+    def submit(self, fn, *args, base_url=None, **kwargs):
+        """This function schedules `fn(*args, **kwargs)` and returns immediately.
+        param base_url: Base URL for the task's request context, usually `request.host_url` (str)
+        Returns: True if the task was accepted, False if the queue is full (bool)
+        """
+        if self.app.config['BACKGROUND_SYNC']:
+            self._run(fn, args, kwargs, base_url, release=False)
+            return True
+        if not self._slots.acquire(blocking=False):
+            self.app.logger.warning(f'Background queue full, dropping {getattr(fn, "__name__", fn)}')
+            return False
+        with self._idle:
+            self._pending += 1
+        self._get_executor().submit(self._run, fn, args, kwargs, base_url, True)
+        return True
+
+    def submit_after_response(self, fn, *args, base_url=None, **kwargs):
+        """This function schedules `fn(*args, **kwargs)` once the current response has been sent.
+
+        Unlike submit(), the task cannot compete with its own request for the CPU (and the GIL), so work that
+        only happens for some requests (e.g. an existing account) does not show up in their response time.
+        The task is submitted once the server has taken the last chunk of the body, or when it closes the
+        response, whichever comes first: not every server calls close() (uvicorn's WSGIMiddleware does not).
+        """
+        once = threading.Lock()  # never released: whichever of the two hooks runs first submits
+
+        def submit_once():
+            if once.acquire(blocking=False):
+                self.submit(fn, *args, base_url=base_url, **kwargs)
+
+        @after_this_request
+        def _submit_after_body(response):
+            body = response.response
+
+            def body_then_submit():
+                yield from body
+                submit_once()
+
+            # Content-Length, if any, is already set from the original body
+            response.response = body_then_submit()
+            response.call_on_close(submit_once)
+            return response
+
+    def _run(self, fn, args, kwargs, base_url, release):
+        try:
+            if base_url:
+                with self.app.test_request_context(base_url=base_url):
+                    fn(*args, **kwargs)
+            else:
+                with self.app.app_context():
+                    fn(*args, **kwargs)
+        except Exception as e:
+            self.app.logger.error(f'Background task {getattr(fn, "__name__", fn)} failed: {e}')
+        finally:
+            if release:
+                self._slots.release()
+                with self._idle:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._idle.notify_all()
+
+    def join(self, timeout=None):
+        """This function waits until every submitted task has finished, e.g. between timed requests.
+        Returns: True if idle, False if `timeout` seconds passed first (bool)
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def shutdown(self, wait=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+background_tasks = BackgroundTasks()
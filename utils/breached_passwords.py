@@ -0,0 +1,222 @@
+# utils/breached_passwords.py
+# Offline screening against known-breached passwords: a sorted SHA-1 index file, memory-mapped and
+# binary-searched, built from a local corpus with `flask breached build`.
+import hashlib
+import heapq
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+
+BREACHED_PASSWORD_DEFAULTS = {
+    'BREACHED_PASSWORDS_INDEX': None,     # defaults to <instance>/breached_passwords.idx; no file, no screening
+}
+
+# Layout: magic, record count, then a table of 2**16 + 1 offsets (records whose digest starts with the 2-byte
+# prefix p are records[bucket[p]:bucket[p + 1]]), then the sorted, de-duplicated 20-byte SHA-1 digests.
+MAGIC = b'PWSHA1\x00\x01'
+DIGEST_SIZE = 20
+BUCKETS = 1 << 16
+_HEADER = struct.Struct('<8sQ')
+_BUCKET_TABLE = struct.Struct(f'<{BUCKETS + 1}Q')
+RECORDS_OFFSET = _HEADER.size + _BUCKET_TABLE.size
+
+# HIBP-style lines: 40 hex digits, optionally followed by ':<count>'
+_SHA1_LINE = re.compile(r'([0-9A-Fa-f]{40})(?::\d*)?')
+
+
+def password_digest(password):
+    """Returns the SHA-1 digest the index stores for `password` (bytes)."""
+    return hashlib.sha1(password.encode('utf-8')).digest()
+
+
+def _corpus_digests(stream, plaintext):
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        if plaintext:
+            yield password_digest(line)
+        else:
+            match = _SHA1_LINE.fullmatch(line.strip())
+            if match:
+                yield bytes.fromhex(match.group(1))
+
+
+def _read_run(path):
+    with open(path, 'rb') as run:
+        while record := run.read(DIGEST_SIZE):
+            yield record
+
+
+def build_index(stream, output, plaintext=False, chunk_size=5_000_000):
+    """
+    This function builds an index file from a corpus, using at most `chunk_size` digests of memory.
+    param stream: Corpus, one password (plaintext=True) or one SHA-1 hex digest per line (text stream)
+    param output: Index file to write; replaced atomically, so running workers keep their old mapping (str)
+    param plaintext: The corpus holds passwords rather than SHA-1 digests (bool)
+    param chunk_size: Digests sorted in memory at once; larger corpora are merged from sorted runs (int)
+    Returns: Number of distinct digests written (int)
+    """
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    digests = _corpus_digests(stream, plaintext)
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        runs = []
+        while chunk := sorted(islice(digests, chunk_size)):
+            path = os.path.join(scratch, f'run{len(runs)}')
+            with open(path, 'wb') as run:
+                run.write(b''.join(chunk))
+            runs.append(path)
+            del chunk
+
+        counts = [0] * BUCKETS
+        written = 0
+        previous = None
+        partial = os.path.join(scratch, 'index')
+        with open(partial, 'wb') as index:
+            index.seek(RECORDS_OFFSET)
+            for digest in heapq.merge(*(_read_run(path) for path in runs)):
+                if digest == previous:
+                    continue
+                index.write(digest)
+                counts[int.from_bytes(digest[:2], 'big')] += 1
+                previous = digest
+                written += 1
+            offsets = [0] * (BUCKETS + 1)
+            for prefix, count in enumerate(counts):
+                offsets[prefix + 1] = offsets[prefix] + count
+            index.seek(0)
+            index.write(_HEADER.pack(MAGIC, written))
+            index.write(_BUCKET_TABLE.pack(*offsets))
+        os.replace(partial, output)
+    return written
+
+
+class BreachedIndex:
+    """
+    A read-only, memory-mapped index file.
+
+    Nothing is read into the heap: a lookup reads two bucket offsets and binary-searches the digests of one
+    2-byte prefix (about count / 65536 records), all through the page cache, which every worker process
+    mapping the same file shares.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != RECORDS_OFFSET + self.count * DIGEST_SIZE:
+            self._map.close()
+            raise ValueError(f'{path} is not a breached password index')
+        self.path = path
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, digest):
+        buffer = self._map
+        prefix = int.from_bytes(digest[:2], 'big')
+        lo, hi = struct.unpack_from('<2Q', buffer, _HEADER.size + prefix * 8)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = RECORDS_OFFSET + mid * DIGEST_SIZE
+            record = buffer[start:start + DIGEST_SIZE]
+            if record < digest:
+                lo = mid + 1
+            elif record > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def close(self):
+        self._map.close()
+
+
+class BreachedPasswords:
+    """Flask extension: opens BREACHED_PASSWORDS_INDEX on first use in each process."""
+
+    def __init__(self, app=None):
+        self._index = None
+        self._path = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in BREACHED_PASSWORD_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.close()
+        app.extensions['breached_passwords'] = self
+
+    @staticmethod
+    def index_path(app):
+        return app.config['BREACHED_PASSWORDS_INDEX'] or os.path.join(app.instance_path, 'breached_passwords.idx')
+
+    def _open(self):
+        path = self.index_path(current_app)
+        if self._path == path:
+            return self._index
+        with self._lock:
+            if self._path != path:
+                index = None
+                if os.path.exists(path):
+                    try:
+                        index = BreachedIndex(path)
+                    except (OSError, ValueError) as e:
+                        current_app.logger.error(f'Breached password screening disabled: {e}')
+                self._index, self._path = index, path
+        return self._index
+
+    def is_breached(self, password):
+        """This function checks a password against the index.
+        param password: The candidate password (str)
+        Returns: True if it is a known-breached password; False if not, or if no index is installed (bool)
+        """
+        index = self._open()
+        return index is not None and password_digest(password) in index
+
+    def close(self):
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+            self._index = self._path = None
+
+
+breached_passwords = BreachedPasswords()
+
+
+breached_cli = AppGroup('breached', help='Manage the offline breached-password index.')
+
+
+@breached_cli.command('build')
+@click.argument('corpus', type=click.File('r', encoding='utf-8', errors='replace'))
+@click.option('--output', type=click.Path(dir_okay=False), help='Defaults to BREACHED_PASSWORDS_INDEX.')
+@click.option('--plaintext', is_flag=True, help='The corpus lists passwords instead of SHA-1 hex digests.')
+@click.option('--chunk-size', type=click.IntRange(1), default=5_000_000, show_default=True,
+              help='Digests sorted in memory at once.')
+@with_appcontext
+def build_command(corpus, output, plaintext, chunk_size):
+    """Build the index from CORPUS ('-' for stdin), e.g. a Pwned Passwords SHA-1 download."""
+    output = output or BreachedPasswords.index_path(current_app)
+    written = build_index(corpus, output, plaintext, chunk_size)
+    click.echo(f'Wrote {written} digest(s) to {output}. Restart workers to pick up the new index.')
+
+
+@breached_cli.command('check')
+@click.password_option(confirmation_prompt=False)
+@with_appcontext
+def check_command(password):
+    """Look up one password in the installed index."""
+    if breached_passwords._open() is None:
+        raise click.ClickException(f'No index at {BreachedPasswords.index_path(current_app)}.')
+    click.echo('Breached.' if breached_passwords.is_breached(password) else 'Not found.')
@@ -0,0 +1,152 @@
+# utils/db_routing.py
+# Primary/replica routing for db.session and connection-pool settings for every engine.
+import itertools
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+
+
+DB_ROUTING_DEFAULTS = {
+    'SQLALCHEMY_REPLICA_URIS': (),   # read replicas of SQLALCHEMY_DATABASE_URI, e.g. ('postgresql://replica1/auth',)
+    'REPLICA_STICKY_SECONDS': 5,     # after a client's write, its next requests read from the primary this long
+    # Pool settings for server databases; SQLite URIs keep Flask-SQLAlchemy's SQLite defaults
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,         # seconds; below the server's idle timeout
+    'DB_POOL_PRE_PING': True,
+}
+
+REPLICA_BIND_PREFIX = '__replica_'
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def engine_options(app, uri):
+    """This function builds the engine (pool) options for one database URI from the app config.
+    Returns: Keyword arguments for create_engine() (dict)
+    """
+    config = app.config
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if not str(uri).startswith('sqlite'):
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+        )
+    return options
+
+
+class RoutingSession(Session):
+    """
+    db.session class that can send reads to a replica.
+
+    Only SELECTs issued inside `read_replica()` are candidates, and only while this session has not
+    written anything: the first flush or DML pins the session to the primary for the rest of its life
+    (one request), so a commit is always followed by reads that can see it. Across requests, a client
+    that wrote is kept on the primary for REPLICA_STICKY_SECONDS via a timestamp in its Flask session.
+
+    With a sharded user store (utils.sharding), `shard=` picks a shard's bind and flushes of User rows go to
+    their shard through connection_callable.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard=None, **kwargs):
+        if bind is None and shard is not None:
+            # Bind key of a user shard picked by utils.sharding
+            return self._db.engines[shard]
+        if bind is None:
+            if isinstance(clause, Select):
+                if self.info.get('read_replica') and not self.info.get('wrote_primary'):
+                    engine = _pick_replica(self._db)
+                    if engine is not None:
+                        return engine
+            else:
+                # Flushes, DML and raw connection requests all go to the primary and pin the session to it
+                self.info['wrote_primary'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    @property
+    def connection_callable(self):
+        # Consulted by every flush: with a sharded user store, each row is written on its own shard
+        sharding = current_app.extensions.get('user_shards') if has_app_context() else None
+        return self._connection_for_instance if sharding else None
+
+    def _connection_for_instance(self, mapper, instance):
+        shard = current_app.extensions['user_shards']['flush_shard'](mapper, instance)
+        return self.get_transaction().connection(mapper, shard=shard)
+
+
+def _pick_replica(db):
+    routing = current_app.extensions.get('db_routing')
+    if not routing or not routing['replicas']:
+        return None
+    if has_request_context() and flask_session.get(STICKY_SESSION_KEY, 0) > time.time():
+        return None
+    return db.engines[routing['replicas'][next(routing['counter']) % len(routing['replicas'])]]
+
+
+@contextmanager
+def read_replica():
+    """Lets the SELECTs in this block read from a replica (see RoutingSession)."""
+    from models import db
+    previous = db.session.info.get('read_replica', False)
+    db.session.info['read_replica'] = True
+    try:
+        yield
+    finally:
+        db.session.info['read_replica'] = previous
+
+
+@contextmanager
+def read_primary():
+    """Sends the SELECTs in this block to the primary, even inside `read_replica()`."""
+    from models import db
+    previous = db.session.info.get('read_replica', False)
+    db.session.info['read_replica'] = False
+    try:
+        yield
+    finally:
+        db.session.info['read_replica'] = previous
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_client_to_primary(session):
+    routing = current_app.extensions.get('db_routing') if has_app_context() else None
+    if not routing or not routing['replicas'] or not session.info.get('wrote_primary'):
+        return
+    if has_request_context() and routing['sticky_seconds']:
+        flask_session[STICKY_SESSION_KEY] = time.time() + routing['sticky_seconds']
+
+
+class DatabaseRouting:
+    """Flask extension: registers replica binds and pool options. Must be initialized before `db`."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in DB_ROUTING_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        primary_uri = app.config['SQLALCHEMY_DATABASE_URI']
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **engine_options(app, primary_uri), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        replicas = []
+        for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            key = f'{REPLICA_BIND_PREFIX}{index}'
+            binds[key] = {'url': uri, **engine_options(app, uri)}
+            replicas.append(key)
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.extensions['db_routing'] = {
+            'replicas': replicas,
+            'counter': itertools.count(),
+            'sticky_seconds': app.config['REPLICA_STICKY_SECONDS'],
+        }
+
+
+db_routing = DatabaseRouting()
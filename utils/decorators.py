@@ -1,35 +1,47 @@
 # decorators.py
-from flask import g, request, redirect, url_for, abort
+from flask import g, request, redirect, url_for, abort, current_app
 from functools import wraps
-from flask_login import login_required, current_user
+from flask_login import current_user
 from flask import flash, redirect, url_for,make_response
 
+from utils.permissions import required_mask
+
+
 def admin_required(f):
+    """
+    Decorator that limits a view to Admins; anonymous users are sent to the login page.
+    """
+    mask = required_mask('Admin')
+
     @wraps(f)
-    @login_required
     def decorated_function(*args, **kwargs):
-        if current_user.role != 'Admin':
+        if not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        if not current_user.role_mask & mask:
             flash('You do not have permission to access this page.', 'danger')
-            #TODO CHANGE THE REDIRECT URL
-            return redirect(url_for('main_bp.index'))
+            return abort(403)
         return f(*args, **kwargs)
+    decorated_function.required_mask = mask
     return decorated_function
 
 
 def roles_required(*roles):
     """"
-    Decorator to check if the dashboard has the required roles"
+    Decorator to check if the dashboard has one of the required roles (or a role above it in the hierarchy)"
     param roles: The roles required by the dashboard (str)
     """
+    mask = required_mask(*roles)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             # Check if the dashboard is authenticated and has the required role
             if not current_user.is_authenticated:
                 return abort(403)
-            if current_user.role not in roles:
+            if not current_user.role_mask & mask:
                 return abort(403)
             return f(*args, **kwargs)
+        decorated_function.required_mask = mask
         return decorated_function
     return decorator
 
@@ -43,4 +55,3 @@ def nocache(view):
         response.headers['Expires'] = '0'
         return response
     return no_cache
-
@@ -1,14 +1,19 @@
 # utils/email_utils.py
-from flask import render_template, flash,url_for, current_app
-from itsdangerous import URLSafeTimedSerializer
-import smtplib
-from email.mime.text import MIMEText
+# Emails are rendered in the request and queued in the outbox; utils/outbox.py delivers them in the background.
+# Bodies go through utils.templating.render_email, which renders each template once and then only fills in
+# the per-recipient values.
+from flask import flash,url_for, current_app
+from sqlalchemy.exc import SQLAlchemyError
 import os
 from datetime import datetime
 
+from models.user import User, normalize_email
+from utils.outbox import enqueue_email, send_bulk
+from utils.reset_tokens import reset_tokens
+from utils.templating import render_email
+
 
 ADMIN_EMAIL_ADDRESS = os.environ.get("EMAIL_KEY")
-ADMIN_EMAIL_PW = os.environ.get("PASSWORD_KEY")
 
 
 
@@ -17,28 +22,18 @@ def send_user_response_email(name, email, subject, service='gmail'):
     Sends a confirmation email to the dashboard.
     """
     current_year = datetime.now().year
-    email_content = render_template('email/user_aknowledgement_email.html', name=name)
-
-    msg = MIMEText(email_content, 'html')
-    msg['From'] = ADMIN_EMAIL_ADDRESS
-    msg['To'] = email
-    msg['Subject'] = f"Confirmation: {subject}"
-    msg['Reply-To'] = ADMIN_EMAIL_ADDRESS
-
-    smtp_settings = {
-        'gmail': ('smtp.gmail.com', 587),
-        'yahoo': ('smtp.mail.yahoo.com', 587),
-        'outlook': ('smtp.office365.com', 587)
-    }
-
-    smtp_server, smtp_port = smtp_settings.get(service, smtp_settings['gmail'])
+    email_content = render_email('email/user_aknowledgement_email.html', {'name': name})
 
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as connection:
-            connection.starttls()
-            connection.login(ADMIN_EMAIL_ADDRESS, ADMIN_EMAIL_PW)
-            connection.sendmail(ADMIN_EMAIL_ADDRESS, email, msg.as_string())
-    except Exception as e:
+        enqueue_email(
+            recipient=email,
+            subject=f"Confirmation: {subject}",
+            body=email_content,
+            sender=ADMIN_EMAIL_ADDRESS,
+            reply_to=ADMIN_EMAIL_ADDRESS,
+            service=service,
+        )
+    except SQLAlchemyError as e:
         flash('Error sending confirmation email. Please try again later.', 'danger')
 
 
@@ -48,77 +43,60 @@ def send_admin_email(name, subject, email, message, service='gmail'):
     Sends an email to the dashboard with the contact form details.
     """
     current_year = datetime.now().year
-    email_content = render_template('email/admin_email.html', name=name, subject=subject, email=email,current_year=current_year, message=message)
-
-    msg = MIMEText(email_content, 'html')
-    msg['From'] = email
-    msg['To'] = ADMIN_EMAIL_ADDRESS
-    msg['Subject'] = f"New message from {name}: {subject}"
-    msg['Reply-To'] = email
-
-    smtp_settings = {
-        'gmail': ('smtp.gmail.com', 587),
-        'yahoo': ('smtp.mail.yahoo.com', 587),
-        'outlook': ('smtp.office365.com', 587)
-    }
-
-    smtp_server, smtp_port = smtp_settings.get(service, smtp_settings['gmail'])
+    email_content = render_email('email/admin_email.html', {'name': name, 'subject': subject, 'email': email, 'message': message}, current_year=current_year)
 
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as connection:
-            connection.starttls()
-            connection.login(ADMIN_EMAIL_ADDRESS, ADMIN_EMAIL_PW)
-            connection.sendmail(from_addr=email, to_addrs=ADMIN_EMAIL_ADDRESS, msg=msg.as_string())
-    except Exception as e:
+        enqueue_email(
+            recipient=ADMIN_EMAIL_ADDRESS,
+            subject=f"New message from {name}: {subject}",
+            body=email_content,
+            sender=email,
+            reply_to=email,
+            service=service,
+        )
+    except SQLAlchemyError as e:
         flash('Error sending dashboard notification. Please try again later.', 'danger')
 
 
-def generate_reset_token(email):
+def generate_reset_token(email, password_epoch=None):
     """
-    This function generates a password reset token using SECRET_KEY.
+    This function generates a single-use password reset token bound to the user's password epoch.
     :param email:
+    :param password_epoch: The user's current password epoch; looked up by email when omitted
     :return:
     """
-    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
-    return s.dumps(email, salt='password-reset-salt')
+    if password_epoch is None:
+        user = User.get_by_email(email)
+        password_epoch = user.password_epoch if user else 0
+    return reset_tokens.generate(normalize_email(email), password_epoch)
 
 
 
-def send_password_reset_email(email, service='gmail'):
+def send_password_reset_email(email, service='gmail', password_epoch=None):
     """
     Sends a password reset email to the dashboard.
     """
     # Generate token
-    token = generate_reset_token(email)
+    token = generate_reset_token(email, password_epoch)
 
     # Construct reset URL
     reset_url = url_for('auth_bp.reset_password', token=token, _external=True)
 
     # Render email content
-    email_content = render_template('email/password_reset_email.html', reset_url=reset_url)
-
-    msg = MIMEText(email_content, 'html')
-    msg['From'] = ADMIN_EMAIL_ADDRESS
-    msg['To'] = email
-    msg['Subject'] = "Password Reset Request"
-    msg['Reply-To'] = ADMIN_EMAIL_ADDRESS
-
-    smtp_settings = {
-        'gmail': ('smtp.gmail.com', 587),
-        'yahoo': ('smtp.mail.yahoo.com', 587),
-        'outlook': ('smtp.office365.com', 587)
-    }
-
-    smtp_server, smtp_port = smtp_settings.get(service, smtp_settings['gmail'])
+    email_content = render_email('email/password_reset_email.html', {'reset_url': reset_url})
 
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as connection:
-            connection.starttls()
-            connection.login(ADMIN_EMAIL_ADDRESS, ADMIN_EMAIL_PW)
-            connection.sendmail(ADMIN_EMAIL_ADDRESS, email, msg.as_string())
-    except Exception as e:
+        enqueue_email(
+            recipient=email,
+            subject="Password Reset Request",
+            body=email_content,
+            sender=ADMIN_EMAIL_ADDRESS,
+            reply_to=ADMIN_EMAIL_ADDRESS,
+            service=service,
+        )
+    except SQLAlchemyError as e:
         flash('Error sending password reset email. Please try again later.', 'danger')
-        current_app.logger.error(f'Error sending password reset email: {e}')
+        current_app.logger.error(f'Error queueing password reset email: {e}')
 
 
 
@@ -127,28 +105,18 @@ def send_approval_message(name, email, subject, service='gmail'):
     Sends a confirmation email to the dashboard.
     """
     current_year = datetime.now().year
-    email_content = render_template('email/contributor_approval_email.html',current_year=current_year, name=name)
-
-    msg = MIMEText(email_content, 'html')
-    msg['From'] = ADMIN_EMAIL_ADDRESS
-    msg['To'] = email
-    msg['Subject'] = f"{subject} {name}"
-    msg['Reply-To'] = ADMIN_EMAIL_ADDRESS
-
-    smtp_settings = {
-        'gmail': ('smtp.gmail.com', 587),
-        'yahoo': ('smtp.mail.yahoo.com', 587),
-        'outlook': ('smtp.office365.com', 587)
-    }
-
-    smtp_server, smtp_port = smtp_settings.get(service, smtp_settings['gmail'])
+    email_content = render_email('email/contributor_approval_email.html', {'name': name}, current_year=current_year)
 
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as connection:
-            connection.starttls()
-            connection.login(ADMIN_EMAIL_ADDRESS, ADMIN_EMAIL_PW)
-            connection.sendmail(ADMIN_EMAIL_ADDRESS, email, msg.as_string())
-    except Exception as e:
+        enqueue_email(
+            recipient=email,
+            subject=f"{subject} {name}",
+            body=email_content,
+            sender=ADMIN_EMAIL_ADDRESS,
+            reply_to=ADMIN_EMAIL_ADDRESS,
+            service=service,
+        )
+    except SQLAlchemyError as e:
         flash('Error sending confirmation email. Please try again later.', 'danger')
 
 
@@ -158,26 +126,41 @@ def send_demotion_message(name, email, subject, service='gmail'):
     """
     current_year = datetime.now().year
 
-    email_content = render_template('email/letter_of_regret_email.html',current_year=current_year, name=name)
+    email_content = render_email('email/letter_of_regret_email.html', {'name': name}, current_year=current_year)
 
-    msg = MIMEText(email_content, 'html')
-    msg['From'] = ADMIN_EMAIL_ADDRESS
-    msg['To'] = email
-    msg['Subject'] = f"{subject}"
-    msg['Reply-To'] = ADMIN_EMAIL_ADDRESS
-
-    smtp_settings = {
-        'gmail': ('smtp.gmail.com', 587),
-        'yahoo': ('smtp.mail.yahoo.com', 587),
-        'outlook': ('smtp.office365.com', 587)
-    }
+    try:
+        enqueue_email(
+            recipient=email,
+            subject=f"{subject}",
+            body=email_content,
+            sender=ADMIN_EMAIL_ADDRESS,
+            reply_to=ADMIN_EMAIL_ADDRESS,
+            service=service,
+        )
+    except SQLAlchemyError as e:
+        flash('Error sending confirmation email. Please try again later.', 'danger')
 
-    smtp_server, smtp_port = smtp_settings.get(service, smtp_settings['gmail'])
 
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as connection:
-            connection.starttls()
-            connection.login(ADMIN_EMAIL_ADDRESS, ADMIN_EMAIL_PW)
-            connection.sendmail(ADMIN_EMAIL_ADDRESS, email, msg.as_string())
-    except Exception as e:
-        flash('Error sending confirmation email. Please try again later.', 'danger')
\ No newline at end of file
+def send_bulk_email(template_name, subject, recipients, service='gmail', chunk_size=None, **shared):
+    """
+    Sends one template to many recipients, e.g. approval notices for a cohort of contributors.
+    :param template_name: Email template, rendered once (see utils.templating.render_email)
+    :param subject: Subject line; may use the recipient's variables, e.g. "Welcome {name}"
+    :param recipients: Iterable of dicts with 'email' plus the template's per-recipient variables
+    :param shared: Variables that are the same for every recipient, e.g. current_year
+    :return: One utils.outbox.DeliveryResult per recipient, in order
+
+    All messages go over one SMTP session, in chunks of OUTBOX_BULK_CHUNK_SIZE.
+    """
+    def messages():
+        for recipient in recipients:
+            values = {key: value for key, value in recipient.items() if key != 'email'}
+            yield {
+                'recipient': recipient['email'],
+                'subject': subject.format(**values),
+                'body': render_email(template_name, values, **shared),
+                'sender': ADMIN_EMAIL_ADDRESS,
+                'reply_to': ADMIN_EMAIL_ADDRESS,
+            }
+
+    return send_bulk(messages(), service=service, chunk_size=chunk_size)
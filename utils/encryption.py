@@ -1,17 +1,26 @@
 # Description: This file contains functions to hash and salt passwords and check if a password matches a hashed password.
-from werkzeug.security import generate_password_hash, check_password_hash
+# Hashing runs through utils.hash_executor, which bounds how many hashes run at once; the algorithm and cost
+# come from PASSWORD_HASH_METHOD (see utils.password_hashing and `flask hashing calibrate`).
+from utils.hash_executor import run_hashing
+from utils.metrics import metrics
+from utils.password_hashing import generate_hash, verify_hash, configured_method, needs_rehash, SALT_LENGTH
 
 def hash_and_salt_password(password):
-    """This function hashes and salts the password using the werkzeug library and returns the hashed password.
+    """This function hashes and salts the password with the configured method and returns the hashed password.
     param password: The password to be hashed and salted (str)
     Returns: The hashed password (str)
         """
-    return generate_password_hash(
-        password,
-        method='pbkdf2:sha256',
-        salt_length=16
-    )
-    return password
+    with metrics.timer('password_hash_duration_seconds', operation='hash'):
+        return run_hashing(generate_hash, password, configured_method(), SALT_LENGTH)
+
+def check_password_hash(hashed_password, password):
+    """This function verifies a password against a hash, with werkzeug's argument order.
+    param hashed_password: The stored hash (str)
+    param password: The password to be checked (str)
+    Returns: True if the password matches the hashed password, False otherwise (bool)
+    """
+    with metrics.timer('password_hash_duration_seconds', operation='verify'):
+        return run_hashing(verify_hash, hashed_password, password)
 
 def check_password(password, hashed_password):
     """This function checks if the password matches the hashed password.
@@ -20,4 +29,10 @@ def check_password(password, hashed_password):
     Returns: True if the password matches the hashed password, False otherwise (bool)
     """
     return check_password_hash(hashed_password, password)
-    return password
\ No newline at end of file
+
+def password_needs_rehash(hashed_password):
+    """This function tells whether a hash was made with outdated parameters and should be replaced.
+    param hashed_password: The stored hash (str)
+    Returns: True if the hash differs from PASSWORD_HASH_METHOD (bool)
+    """
+    return needs_rehash(hashed_password)
@@ -0,0 +1,110 @@
+# utils/hash_executor.py
+# Runs password hashing and verification in a bounded pool so a login burst cannot starve every worker.
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app, has_app_context
+
+
+HASHING_DEFAULTS = {
+    'HASH_POOL_WORKERS': 0,         # processes in the hashing pool, 0 hashes inline in the request thread
+    'HASH_MAX_CONCURRENT': 4,       # hashes in flight at once (per gunicorn worker); the rest queue
+    'HASH_QUEUE_TIMEOUT': 0.5,      # seconds a request waits for a free slot before getting a 503
+    'HASH_TIMEOUT': 5.0,            # seconds a single hash may take in the pool
+    'HASH_RETRY_AFTER': 1,          # Retry-After header (seconds) sent with the 503
+}
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated; turned into a 503 by the app error handler."""
+
+
+class HashExecutor:
+    """
+    Bounded executor for CPU-heavy password hashing.
+
+    A semaphore caps the number of hashes in flight; callers wait at most HASH_QUEUE_TIMEOUT for a slot and
+    then fail fast with HashingBusy. With HASH_POOL_WORKERS > 0 the work runs in a process pool (created
+    lazily, so it is forked after gunicorn forks its workers), otherwise inline in the calling thread.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.queue_timeout = HASHING_DEFAULTS['HASH_QUEUE_TIMEOUT']
+        self.timeout = HASHING_DEFAULTS['HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(HASHING_DEFAULTS['HASH_MAX_CONCURRENT'])
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in HASHING_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.configure(
+            workers=app.config['HASH_POOL_WORKERS'],
+            max_concurrent=app.config['HASH_MAX_CONCURRENT'],
+            queue_timeout=app.config['HASH_QUEUE_TIMEOUT'],
+            timeout=app.config['HASH_TIMEOUT'],
+        )
+        app.extensions['hash_executor'] = self
+
+        retry_after = app.config['HASH_RETRY_AFTER']
+
+        @app.errorhandler(HashingBusy)
+        def hashing_busy(e):
+            return "Server busy, please try again shortly.", 503, {'Retry-After': str(retry_after)}
+
+    def configure(self, workers=0, max_concurrent=4, queue_timeout=0.5, timeout=5.0):
+        self.shutdown()
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def run(self, fn, *args):
+        """This function runs `fn(*args)` under the concurrency limit.
+        param fn: A picklable, module-level function (e.g. werkzeug's generate_password_hash)
+        Returns: Whatever `fn` returns
+        Raises: HashingBusy if no slot frees up in time or the pooled call times out
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            try:
+                return self._get_pool().submit(fn, *args).result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise HashingBusy()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        if self._pool is not None:
+            if sys.version_info >= (3, 9):
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                # No cancel_futures before 3.9: hashes already queued still run, then the pool exits
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+hash_executor = HashExecutor()
+
+
+def run_hashing(fn, *args):
+    """Runs `fn` through the app's hash executor, or inline when there is no app context (CLI, scripts)."""
+    if has_app_context():
+        executor = current_app.extensions.get('hash_executor')
+        if executor is not None:
+            return executor.run(fn, *args)
+    return fn(*args)
@@ -0,0 +1,257 @@
+# utils/metrics.py
+# Low-overhead request instrumentation with an opt-in Prometheus text endpoint and a slow-request log.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+METRICS_DEFAULTS = {
+    'METRICS_ENABLED': False,
+    'METRICS_ENDPOINT': '/metrics',
+    'METRICS_SLOW_REQUEST_MS': 500,     # requests slower than this are logged with their query breakdown
+    'METRICS_SLOW_REQUEST_QUERIES': 5,  # how many of the slowest queries the slow log shows
+}
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions under a lock."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (
+        key + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Histograms and counters keyed by (name, labels), rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def histogram(self, name, buckets, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        """Registers a callable returning [(name, type, help, {labels tuple: value})] evaluated at scrape time."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        lines = []
+        by_name = {}
+        for (name, labels), histogram in list(self._histograms.items()):
+            by_name.setdefault(name, []).append((labels, histogram))
+        for name in sorted(by_name):
+            lines.append(f'# HELP {name} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in by_name[name]:
+                counts, total, count = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", _format_number(bound)))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        counters = {}
+        for (name, labels), value in list(self._counters.items()):
+            counters.setdefault(name, []).append((labels, value))
+        for name in sorted(counters):
+            lines.append(f'# HELP {name} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in counters[name]:
+                lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples.items():
+                    lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """
+    Flask extension wiring the registry to request hooks and SQLAlchemy engine events.
+
+    Everything is per process: with several gunicorn workers each one exposes its own series, which
+    Prometheus aggregates when scraping every worker (or via a per-worker port).
+    """
+
+    def __init__(self, app=None):
+        self.registry = MetricsRegistry()
+        self.enabled = False
+        self.app = None
+        self._engine_hooks_installed = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in METRICS_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        app.extensions['metrics'] = self
+        self.enabled = bool(app.config['METRICS_ENABLED'])
+        if not self.enabled:
+            return
+
+        self.slow_request_seconds = app.config['METRICS_SLOW_REQUEST_MS'] / 1000
+        self.slow_request_queries = app.config['METRICS_SLOW_REQUEST_QUERIES']
+        self._describe()
+        self._install_engine_hooks()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule(app.config['METRICS_ENDPOINT'], 'metrics', self.metrics_view)
+
+    def _describe(self):
+        describe = self.registry.describe
+        describe('http_request_duration_seconds', 'Request latency by endpoint, method and status.')
+        describe('http_request_sql_queries', 'SQL statements executed per request.')
+        describe('sql_query_duration_seconds', 'Latency of individual SQL statements.')
+        describe('password_hash_duration_seconds', 'Time spent hashing or verifying passwords.')
+        describe('smtp_send_duration_seconds', 'Time spent delivering one email over SMTP.')
+        describe('slow_requests_total', 'Requests slower than METRICS_SLOW_REQUEST_MS.')
+
+    # Timers used by the hashing and email code
+
+    def observe(self, name, seconds, buckets=LATENCY_BUCKETS, **labels):
+        if self.enabled:
+            self.registry.histogram(name, buckets, **labels).observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Times the block into histogram `name`; costs one perf_counter pair when metrics are disabled."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    # SQLAlchemy
+
+    def _install_engine_hooks(self):
+        if self._engine_hooks_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        self._engine_hooks_installed = True
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        self.observe('sql_query_duration_seconds', duration)
+        if has_request_context():
+            queries = g.get('metrics_queries')
+            if queries is not None:
+                queries.append((duration, statement))
+
+    # Request hooks
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = []
+
+    @staticmethod
+    def _after_request(response):
+        # The teardown hook only sees exceptions, so remember the status here
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        queries = g.pop('metrics_queries', [])
+        endpoint = request.endpoint or 'unmatched'
+        status = 500 if exc is not None else getattr(g, 'metrics_status', 0)
+
+        self.observe('http_request_duration_seconds', duration, endpoint=endpoint, method=request.method, status=status)
+        self.observe('http_request_sql_queries', len(queries), buckets=QUERY_COUNT_BUCKETS, endpoint=endpoint)
+
+        if duration >= self.slow_request_seconds:
+            self.registry.inc('slow_requests_total', endpoint=endpoint)
+            query_seconds = sum(duration for duration, _ in queries)
+            slowest = sorted(queries, key=lambda query: query[0], reverse=True)[:self.slow_request_queries]
+            breakdown = ''.join(
+                f'\n    {query_duration * 1000:8.2f} ms  {" ".join(statement.split())[:200]}'
+                for query_duration, statement in slowest
+            )
+            self.app.logger.warning(
+                f'Slow request {request.method} {request.path} ({endpoint}): {duration * 1000:.1f} ms, '
+                f'{len(queries)} queries taking {query_seconds * 1000:.1f} ms{breakdown}'
+            )
+
+    def metrics_view(self):
+        return Response(self.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
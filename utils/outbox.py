@@ -0,0 +1,488 @@
+# utils/outbox.py
+# Durable outbox for outgoing mail: requests enqueue rendered messages, a background worker delivers them.
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from models import db
+from models.outbox import OutboxMessage
+from utils.metrics import metrics
+
+
+SMTP_SETTINGS = {
+    'gmail': ('smtp.gmail.com', 587),
+    'yahoo': ('smtp.mail.yahoo.com', 587),
+    'outlook': ('smtp.office365.com', 587)
+}
+
+OUTBOX_DEFAULTS = {
+    'OUTBOX_WORKER_ENABLED': None,      # None: run the worker thread unless the app is in testing mode
+    'OUTBOX_POLL_INTERVAL': 5.0,        # seconds between polls when nothing wakes the worker
+    'OUTBOX_BATCH_SIZE': 50,
+    'OUTBOX_MAX_ATTEMPTS': 8,
+    'OUTBOX_BACKOFF_BASE': 30.0,        # seconds, doubled per failed attempt
+    'OUTBOX_BACKOFF_MAX': 3600.0,
+    'OUTBOX_LEASE_SECONDS': 120,        # a claimed message is retried if its worker dies mid-send
+    'OUTBOX_BULK_CHUNK_SIZE': 100,      # send_bulk(): messages rendered, stored and sent per chunk
+    'SMTP_HOST': None,                  # overrides SMTP_SETTINGS, e.g. a local relay or test server
+    'SMTP_PORT': None,
+    'SMTP_USE_TLS': True,
+    'SMTP_USERNAME': os.environ.get("EMAIL_KEY"),
+    'SMTP_PASSWORD': os.environ.get("PASSWORD_KEY"),
+    'SMTP_TIMEOUT': 30,
+    'SMTP_POOL_SIZE': 2,
+    'SMTP_MAX_IDLE': 60,                # seconds before a pooled connection is health-checked with NOOP
+}
+
+
+def enqueue_email(recipient, subject, body, sender=None, reply_to=None, service='gmail', subtype='html'):
+    """This function persists a rendered email in the outbox and wakes the worker.
+    param recipient: The address the email is delivered to (str)
+    param subject: The subject line (str)
+    param body: The rendered email body (str)
+    param sender: The From address, defaults to the configured SMTP user (str)
+    param reply_to: The Reply-To address, defaults to the sender (str)
+    param service: Key into SMTP_SETTINGS used to pick the relay (str)
+    Returns: The queued message (OutboxMessage)
+    """
+    sender = sender or current_app.config.get('SMTP_USERNAME')
+    message = OutboxMessage(
+        service=service,
+        sender=sender,
+        recipient=recipient,
+        reply_to=reply_to or sender,
+        subject=subject,
+        body=body,
+        subtype=subtype,
+    )
+    db.session.add(message)
+    db.session.commit()
+    worker = current_app.extensions.get('outbox')
+    if worker is not None:
+        worker.wake()
+    return message
+
+
+DeliveryResult = namedtuple('DeliveryResult', 'recipient message_id error')
+
+
+def send_bulk(messages, service='gmail', chunk_size=None):
+    """
+    This function sends many rendered emails now, over one pooled SMTP session, and reports per recipient.
+    param messages: Dicts with recipient, subject, body and optionally sender, reply_to, subtype (iterable)
+    param service: Key into SMTP_SETTINGS used to pick the relay (str)
+    param chunk_size: Messages stored and sent per chunk, defaults to OUTBOX_BULK_CHUNK_SIZE (int)
+    Returns: One result per message, `error` is None if the relay accepted it (list of DeliveryResult)
+
+    Messages are still written to the outbox (already claimed, so the worker leaves them alone) and
+    updated per chunk; a message the relay did not take stays in the outbox and is retried by the worker,
+    unless it was refused permanently (5xx), in which case it is marked 'failed'.
+    Requires the 'outbox' extension.
+    """
+    worker = current_app.extensions.get('outbox')
+    if worker is None:
+        raise RuntimeError("send_bulk() needs the 'outbox' extension (see EXTENSIONS)")
+    chunk_size = chunk_size or current_app.config['OUTBOX_BULK_CHUNK_SIZE']
+    default_sender = current_app.config.get('SMTP_USERNAME')
+    results = []
+    iterator = iter(messages)
+    while True:
+        chunk = []
+        for fields in iterator:
+            sender = fields.get('sender') or default_sender
+            chunk.append(OutboxMessage(
+                service=service,
+                sender=sender,
+                recipient=fields['recipient'],
+                reply_to=fields.get('reply_to') or sender,
+                subject=fields['subject'],
+                body=fields['body'],
+                subtype=fields.get('subtype', 'html'),
+                status='sending',
+            ))
+            if len(chunk) == chunk_size:
+                break
+        if not chunk:
+            return results
+        # Each chunk gets a full lease from the moment it is claimed, however long the earlier ones took
+        lease_until = datetime.utcnow() + timedelta(seconds=current_app.config['OUTBOX_LEASE_SECONDS'])
+        for message in chunk:
+            message.next_attempt_at = lease_until
+        db.session.add_all(chunk)
+        db.session.commit()
+        errors = worker.send_session(service, chunk)
+        for message in chunk:
+            error, permanent = errors.get(message.id, (None, False))
+            worker.record_attempt(message, error, permanent)
+            results.append(DeliveryResult(message.recipient, message.id, error))
+        db.session.commit()
+
+
+# Refusals of one message; smtplib resets the transaction, so the connection stays usable
+REFUSALS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def is_permanent(error):
+    """This function tells whether a refusal will not go away on retry (a 5xx reply).
+    param error: One of REFUSALS (SMTPException)
+    Returns: (bool)
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    else:
+        codes = [error.smtp_code]
+    return bool(codes) and all(500 <= code < 600 for code in codes)
+
+
+def build_mime_message(message):
+    msg = MIMEText(message.body, message.subtype)
+    msg['From'] = message.sender
+    msg['To'] = message.recipient
+    msg['Subject'] = message.subject
+    msg['Reply-To'] = message.reply_to or message.sender
+    return msg
+
+
+class SMTPConnectionPool:
+    """
+    A small pool of authenticated SMTP connections to one relay.
+
+    Connections are opened lazily, reused across messages and batches, and health-checked with NOOP after
+    sitting idle, so STARTTLS and AUTH are paid once per connection instead of once per email.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, size=2, timeout=30, max_idle=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        return connection
+
+    def _is_alive(self, connection, last_used):
+        if time.monotonic() - last_used < self.max_idle:
+            return True
+        try:
+            return connection.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        """Yields a live, authenticated connection; a connection that errors is discarded, not returned."""
+        self._slots.acquire()
+        connection = None
+        try:
+            try:
+                connection, last_used = self._idle.get_nowait()
+                if not self._is_alive(connection, last_used):
+                    self._close(connection)
+                    connection = None
+            except queue.Empty:
+                pass
+            if connection is None:
+                connection = self._open()
+            yield connection
+        except BaseException:
+            if connection is not None:
+                self._close(connection)
+            raise
+        else:
+            self._idle.put_nowait((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
+
+class OutboxWorker:
+    """
+    Drains the EmailOutbox table over pooled SMTP connections.
+
+    Messages are claimed with a conditional UPDATE, so several gunicorn workers (or a separate
+    `flask outbox work` process) can drain the same table without sending anything twice. Failures are
+    retried with exponential backoff and jitter until OUTBOX_MAX_ATTEMPTS, then marked 'failed'; a
+    permanent (5xx) refusal is marked 'failed' straight away.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in OUTBOX_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.app = app
+        # Pools belong to the previous app's SMTP settings
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+        app.extensions['outbox'] = self
+        app.cli.add_command(outbox_cli)
+
+        enabled = app.config['OUTBOX_WORKER_ENABLED']
+        if enabled is None:
+            enabled = not app.testing
+        if enabled:
+            self.start()
+
+    # Connection pools
+
+    def pool_for(self, service):
+        with self._pools_lock:
+            pool = self._pools.get(service)
+            if pool is None:
+                config = self.app.config
+                host, port = SMTP_SETTINGS.get(service, SMTP_SETTINGS['gmail'])
+                pool = SMTPConnectionPool(
+                    host=config['SMTP_HOST'] or host,
+                    port=config['SMTP_PORT'] or port,
+                    username=config['SMTP_USERNAME'],
+                    password=config['SMTP_PASSWORD'],
+                    use_tls=config['SMTP_USE_TLS'],
+                    size=config['SMTP_POOL_SIZE'],
+                    timeout=config['SMTP_TIMEOUT'],
+                    max_idle=config['SMTP_MAX_IDLE'],
+                )
+                self._pools[service] = pool
+            return pool
+
+    # Draining
+
+    def _backoff(self, attempts):
+        config = self.app.config
+        delay = min(config['OUTBOX_BACKOFF_BASE'] * (2 ** (attempts - 1)), config['OUTBOX_BACKOFF_MAX'])
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _claim(self, message_id, now):
+        lease_until = now + timedelta(seconds=self.app.config['OUTBOX_LEASE_SECONDS'])
+        result = db.session.execute(
+            db.update(OutboxMessage)
+            .where(OutboxMessage.id == message_id)
+            .where(OutboxMessage.status.in_(('pending', 'sending')))
+            .where(OutboxMessage.next_attempt_at <= now)
+            .values(status='sending', next_attempt_at=lease_until)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def drain(self):
+        """Sends one batch of due messages. Must run inside an app context.
+        Returns: The number of messages processed (int)
+        """
+        now = datetime.utcnow()
+        due_ids = db.session.execute(
+            db.select(OutboxMessage.id)
+            .where(OutboxMessage.status.in_(('pending', 'sending')))
+            .where(OutboxMessage.next_attempt_at <= now)
+            .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+            .limit(self.app.config['OUTBOX_BATCH_SIZE'])
+        ).scalars().all()
+
+        processed = 0
+        for message_id in due_ids:
+            if not self._claim(message_id, now):
+                continue  # another worker got there first
+            message = db.session.get(OutboxMessage, message_id)
+            started = time.perf_counter()
+            try:
+                # A refusal is caught inside the block, so it does not cost the pooled connection
+                with self.pool_for(message.service).connection() as connection:
+                    error, permanent = self._send_one(connection, message)
+            except (smtplib.SMTPException, OSError) as e:
+                error, permanent = str(e), False
+            metrics.observe('smtp_send_duration_seconds', time.perf_counter() - started,
+                            service=message.service, outcome='error' if error else 'sent')
+            self.record_attempt(message, error, permanent)
+            db.session.commit()
+            processed += 1
+        return processed
+
+    @staticmethod
+    def _send_one(connection, message):
+        """This function sends one message on an open connection.
+        Returns: (error text, permanent), error text None if the relay accepted it (tuple)
+        """
+        try:
+            connection.sendmail(message.sender, [message.recipient], build_mime_message(message).as_string())
+        except REFUSALS as e:
+            return str(e), is_permanent(e)
+        return None, False
+
+    def record_attempt(self, message, error, permanent=False):
+        """This function updates a message after one delivery attempt; the caller commits.
+        param message: The message that was attempted (OutboxMessage)
+        param error: None if the relay accepted it, else the error text (str)
+        param permanent: The relay refused it with a 5xx reply, so it is not retried (bool)
+        """
+        message.attempts += 1
+        if error is None:
+            message.status = 'sent'
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+        elif permanent or message.attempts >= self.app.config['OUTBOX_MAX_ATTEMPTS']:
+            message.last_error = error
+            message.status = 'failed'
+            self.app.logger.error(f'Giving up on outbox message {message.id} to {message.recipient}: {error}')
+        else:
+            message.last_error = error
+            message.status = 'pending'
+            message.next_attempt_at = datetime.utcnow() + self._backoff(message.attempts)
+            self.app.logger.warning(f'Outbox message {message.id} failed (attempt {message.attempts}): {error}')
+
+    def send_session(self, service, messages):
+        """
+        This function sends `messages` back to back over one pooled connection.
+        Returns: {message id: (error text, permanent)} for the messages that were not accepted (dict)
+
+        A refused recipient or message leaves the session usable and only fails that message; if the
+        session itself breaks, the message in flight fails and the rest continue on a new connection.
+        """
+        pool = self.pool_for(service)
+        errors = {}
+        position = 0
+        while position < len(messages):
+            sent_in_session = 0
+            started = time.perf_counter()
+            try:
+                with pool.connection() as connection:
+                    while position < len(messages):
+                        message = messages[position]
+                        started = time.perf_counter()
+                        error, permanent = self._send_one(connection, message)
+                        if error:
+                            errors[message.id] = (error, permanent)
+                        metrics.observe('smtp_send_duration_seconds', time.perf_counter() - started,
+                                        service=service, outcome='error' if error else 'sent')
+                        position += 1
+                        sent_in_session += 1
+            except (smtplib.SMTPException, OSError) as e:
+                metrics.observe('smtp_send_duration_seconds', time.perf_counter() - started,
+                                service=service, outcome='error')
+                if sent_in_session == 0:
+                    # Could not even open a session: fail the rest instead of reconnecting once per message
+                    for message in messages[position:]:
+                        errors[message.id] = (str(e), False)
+                    return errors
+                errors[messages[position].id] = (str(e), False)
+                position += 1
+        return errors
+
+    def drain_all(self):
+        """Drains until no due messages remain. Returns the number of messages processed (int)."""
+        total = 0
+        while True:
+            processed = self.drain()
+            total += processed
+            if processed == 0:
+                return total
+
+    # Background thread
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for pool in self._pools.values():
+            pool.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.drain_all()
+            except Exception as e:
+                self.app.logger.error(f'Outbox worker error: {e}')
+            self._wake.wait(self.app.config['OUTBOX_POLL_INTERVAL'])
+            self._wake.clear()
+
+
+outbox_worker = OutboxWorker()
+
+outbox_cli = AppGroup('outbox', help='Inspect and drain the outgoing mail outbox.')
+
+
+@outbox_cli.command('drain')
+@with_appcontext
+def drain_command():
+    """Send every due message once and exit."""
+    processed = current_app.extensions['outbox'].drain_all()
+    click.echo(f'Processed {processed} message(s).')
+
+
+@outbox_cli.command('work')
+@with_appcontext
+def work_command():
+    """Run the outbox worker in the foreground (for a dedicated mail process)."""
+    worker = current_app.extensions['outbox']
+    worker.start()
+    click.echo('Outbox worker running, press Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop(timeout=10)
+
+
+@outbox_cli.command('status')
+@with_appcontext
+def status_command():
+    """Show message counts per status."""
+    counts = db.session.execute(
+        db.select(OutboxMessage.status, db.func.count()).group_by(OutboxMessage.status)
+    ).all()
+    for status, count in counts:
+        click.echo(f'{status:>8}: {count}')
@@ -0,0 +1,162 @@
+# utils/password_hashing.py
+# Pluggable password-hash algorithms, stale-hash detection and host calibration of the hash cost.
+import hashlib
+import hmac
+import statistics
+import time
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS as WERKZEUG_PBKDF2_ITERATIONS
+from werkzeug.security import gen_salt, generate_password_hash
+from werkzeug.security import check_password_hash as _werkzeug_check_password_hash
+
+
+DEFAULT_PBKDF2_ITERATIONS = 260000  # werkzeug 2.2's default
+DEFAULT_HASH_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+SALT_LENGTH = 16
+
+
+def configured_method():
+    """Returns the hash method new hashes should use, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1' (str)."""
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_HASH_METHOD
+    return DEFAULT_HASH_METHOD
+
+
+def _scrypt(password, salt, n, r, p):
+    # Same construction and maxmem as werkzeug>=3, so hashes stay readable after a werkzeug upgrade
+    return hashlib.scrypt(
+        password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p, maxmem=132 * n * r * p
+    ).hex()
+
+
+def _parse_scrypt(method):
+    parts = method.split(':')
+    n, r, p = (int(part) for part in parts[1:4]) if len(parts) == 4 else (2 ** 15, 8, 1)
+    return n, r, p
+
+
+def generate_hash(password, method=DEFAULT_HASH_METHOD, salt_length=SALT_LENGTH):
+    """This function hashes a password with the given method string.
+    param password: The password to hash (str)
+    param method: 'pbkdf2:<digest>:<iterations>' or 'scrypt:<n>:<r>:<p>' (str)
+    Returns: '<method>$<salt>$<hash>' (str)
+    """
+    if method.startswith('scrypt'):
+        n, r, p = _parse_scrypt(method)
+        salt = gen_salt(salt_length)
+        return f'scrypt:{n}:{r}:{p}${salt}${_scrypt(password, salt, n, r, p)}'
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def verify_hash(pwhash, password):
+    """This function checks a password against a hash produced by any supported method.
+    param pwhash: The stored hash (str)
+    param password: The password to check (str)
+    Returns: True if they match (bool)
+    """
+    if pwhash.startswith('scrypt'):
+        try:
+            method, salt, hashval = pwhash.split('$', 2)
+        except ValueError:
+            return False
+        n, r, p = _parse_scrypt(method)
+        return hmac.compare_digest(_scrypt(password, salt, n, r, p), hashval)
+    return _werkzeug_check_password_hash(pwhash, password)
+
+
+def canonical_method(method):
+    """This function spells out the defaults a short method string leaves to the hashing code.
+    param method: e.g. 'pbkdf2:sha256' or 'scrypt' (str)
+    Returns: The method as stored in hashes, e.g. 'pbkdf2:sha256:260000' or 'scrypt:32768:8:1' (str)
+    """
+    if method.startswith('scrypt'):
+        return 'scrypt:{}:{}:{}'.format(*_parse_scrypt(method))
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2' and len(parts) == 2:
+        # generate_password_hash() fills in werkzeug's own default, whatever the installed version's is
+        return f'{method}:{WERKZEUG_PBKDF2_ITERATIONS}'
+    return method
+
+
+def needs_rehash(pwhash, method=None):
+    """This function tells whether a stored hash was made with different parameters than the configured ones.
+    param pwhash: The stored hash (str)
+    param method: The wanted method, defaults to PASSWORD_HASH_METHOD (str)
+    Returns: True if the hash should be upgraded on the next successful login (bool)
+    """
+    method = canonical_method(method or configured_method())
+    return canonical_method(pwhash.split('$', 1)[0]) != method
+
+
+# Calibration
+
+def _measure(method, samples):
+    pwhash = generate_hash('calibration-password', method)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        verify_hash(pwhash, 'calibration-password')
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _percentile(timings, percentile):
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[percentile - 1]
+
+
+def calibrate(algorithm='pbkdf2', target_ms=50.0, percentile=99, samples=30, digest='sha256'):
+    """This function picks the most expensive hash method whose verify time stays within the target.
+    param algorithm: 'pbkdf2' or 'scrypt' (str)
+    param target_ms: The verify-time budget in milliseconds (float)
+    param percentile: The percentile the budget applies to (int)
+    param samples: Verifications measured per candidate (int)
+    Returns: (method, measured_ms) for the chosen method (tuple)
+    """
+    if algorithm == 'scrypt':
+        best = None
+        n = 2 ** 10
+        while n <= 2 ** 20:
+            method = f'scrypt:{n}:8:1'
+            measured = _percentile(_measure(method, samples), percentile)
+            if measured > target_ms:
+                break
+            best = (method, measured)
+            n *= 2
+        if best is None:
+            method = 'scrypt:1024:8:1'
+            best = (method, _percentile(_measure(method, samples), percentile))
+        return best
+
+    # PBKDF2 cost is linear in the iteration count: extrapolate from a probe, then back off until p-tile fits
+    probe_iterations = 10000
+    probe = statistics.median(_measure(f'pbkdf2:{digest}:{probe_iterations}', 5))
+    iterations = max(1000, int(probe_iterations * target_ms / probe))
+    while True:
+        method = f'pbkdf2:{digest}:{iterations}'
+        measured = _percentile(_measure(method, samples), percentile)
+        if measured <= target_ms or iterations <= 1000:
+            return method, measured
+        iterations = max(1000, int(iterations * target_ms / measured * 0.95))
+
+
+hashing_cli = AppGroup('hashing', help='Tune the password hash cost for this host.')
+
+
+@hashing_cli.command('calibrate')
+@click.option('--algorithm', type=click.Choice(['pbkdf2', 'scrypt']), default='pbkdf2', show_default=True)
+@click.option('--target-ms', type=float, default=50.0, show_default=True, help='Verify-time budget.')
+@click.option('--percentile', type=click.IntRange(1, 99), default=99, show_default=True)
+@click.option('--samples', type=click.IntRange(2), default=30, show_default=True)
+def calibrate_command(algorithm, target_ms, percentile, samples):
+    """Measure this host and print the PASSWORD_HASH_METHOD that meets the target verify time."""
+    method, measured = calibrate(algorithm, target_ms, percentile, samples)
+    click.echo(f'p{percentile} verify time: {measured:.1f} ms (target {target_ms:.1f} ms)')
+    click.echo(f'PASSWORD_HASH_METHOD={method}')
+    current = configured_method()
+    if current != method:
+        click.echo(f'Currently configured: {current}. Existing hashes are upgraded on their next successful login.')
@@ -0,0 +1,97 @@
+# utils/permissions.py
+# Role hierarchy compiled to bitmasks, and the table of which endpoints require which roles.
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+
+# Lowest to highest; every role also holds the permissions of the roles below it
+ROLE_HIERARCHY = ('User', 'Contributor', 'Admin')
+
+
+def compile_role_masks(hierarchy):
+    """This function turns an ordered role hierarchy into per-role bitmasks.
+    param hierarchy: Role names from lowest to highest (tuple)
+    Returns: ({role: own bit}, {role: own bit | bits of all lower roles}) (tuple)
+    """
+    bits = {role: 1 << position for position, role in enumerate(hierarchy)}
+    masks = {}
+    granted = 0
+    for role in hierarchy:
+        granted |= bits[role]
+        masks[role] = granted
+    return bits, masks
+
+
+ROLE_BITS, ROLE_MASKS = compile_role_masks(ROLE_HIERARCHY)
+
+
+def role_mask(role):
+    """Returns the permission mask held by a role name, 0 for unknown roles (int)."""
+    return ROLE_MASKS.get(role, 0)
+
+
+def required_mask(*roles):
+    """This function builds the mask an endpoint requires: holding any one of `roles` (or a higher role) passes.
+    param roles: Role names (str)
+    Returns: The OR of the roles' own bits (int)
+    """
+    unknown = [role for role in roles if role not in ROLE_BITS]
+    if unknown:
+        raise ValueError(f'Unknown role(s): {", ".join(unknown)}')
+    mask = 0
+    for role in roles:
+        mask |= ROLE_BITS[role]
+    return mask
+
+
+class PermissionTable:
+    """
+    Endpoint -> required mask, compiled once the blueprints are registered.
+
+    The access-control decorators tag each view with its mask; `init_app` collects those tags from
+    `app.view_functions` so the effective permission matrix can be inspected without running requests.
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def init_app(self, app):
+        self.endpoints = {
+            endpoint: view.required_mask
+            for endpoint, view in app.view_functions.items()
+            if hasattr(view, 'required_mask')
+        }
+        app.extensions['permissions'] = self
+        app.cli.add_command(permissions_cli)
+
+    def allowed_roles(self, endpoint):
+        """Returns the roles that may call `endpoint`, or None if it is not protected (list)."""
+        if endpoint not in self.endpoints:
+            return None
+        required = self.endpoints[endpoint]
+        return [role for role in ROLE_HIERARCHY if ROLE_MASKS[role] & required]
+
+
+permission_table = PermissionTable()
+
+permissions_cli = AppGroup('permissions', help='Inspect role-based access control.')
+
+
+@permissions_cli.command('matrix')
+@click.option('--protected-only', is_flag=True, help='Hide endpoints that need no role.')
+@with_appcontext
+def matrix_command(protected_only):
+    """Print which roles can reach each endpoint."""
+    table = current_app.extensions['permissions']
+    width = max(len(endpoint) for endpoint in current_app.view_functions)
+    click.echo(f'{"endpoint":<{width}}  ' + '  '.join(f'{role:^11}' for role in ROLE_HIERARCHY))
+    for endpoint in sorted(current_app.view_functions):
+        roles = table.allowed_roles(endpoint)
+        if roles is None:
+            if protected_only:
+                continue
+            cells = ['public' for _ in ROLE_HIERARCHY]
+        else:
+            cells = ['yes' if role in roles else '-' for role in ROLE_HIERARCHY]
+        click.echo(f'{endpoint:<{width}}  ' + '  '.join(f'{cell:^11}' for cell in cells))
@@ -0,0 +1,229 @@
+# utils/rate_limit.py
+# Sliding-window rate limiting for the expensive auth endpoints, with per-process and cross-process backends.
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+
+from models.user import normalize_email
+
+
+RATE_LIMIT_DEFAULTS = {
+    'RATELIMIT_ENABLED': True,
+    'RATELIMIT_BACKEND': 'local',       # 'local' (per process) or 'sqlite' (shared by every worker on the host)
+    'RATELIMIT_SQLITE_PATH': None,      # defaults to <instance>/ratelimit.db
+    # '<count>/<second|minute|hour|day>' per client IP and per submitted email
+    'RATELIMIT_LOGIN_PER_IP': '30/minute',
+    'RATELIMIT_LOGIN_PER_ACCOUNT': '10/minute',
+    'RATELIMIT_FORGOT_PASSWORD_PER_IP': '10/minute',
+    'RATELIMIT_FORGOT_PASSWORD_PER_ACCOUNT': '3/hour',
+}
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rule(rule):
+    """This function parses a rule such as '5/minute'.
+    param rule: '<count>/<period>' (str)
+    Returns: (limit, period_seconds) (tuple)
+    """
+    count, _, period = rule.partition('/')
+    period = period.strip().rstrip('s')
+    if period not in PERIODS:
+        raise ValueError(f'Invalid rate limit period in {rule!r}')
+    return int(count), PERIODS[period]
+
+
+def sliding_window(now, period, window, count, previous):
+    """
+    Shared sliding-window-counter arithmetic.
+
+    The current fixed window's count plus the previous window's count weighted by how much of it still
+    overlaps the sliding window approximates a true sliding log in O(1) space per key.
+    Returns: (window, count, previous, estimate) rolled forward to `now` (tuple)
+    """
+    current_window = int(now // period)
+    if window != current_window:
+        previous = count if window == current_window - 1 else 0
+        count = 0
+        window = current_window
+    overlap = 1 - (now % period) / period
+    return window, count, previous, previous * overlap + count
+
+
+def _retry_after(now, period, limit, count, previous):
+    # Seconds until the weighted estimate drops below the limit again
+    if count >= limit or previous == 0:
+        return max(1, math.ceil(period - now % period))
+    needed_overlap = (limit - count) / previous
+    return max(1, math.ceil((1 - needed_overlap) * period - now % period))
+
+
+class LocalBackend:
+    """
+    Per-process store, least recently hit first. Each key maps to an immutable tuple that is re-inserted at
+    the end on every hit; one lock covers that read-modify-write, so concurrent requests from the same client
+    are all counted. It is held for a few dict operations only. Past `max_keys` the least recently hit keys
+    are evicted, which only ever forgets clients that have been quiet the longest.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            window, count, previous, _ = self._windows.pop(key, (0, 0, 0, period))
+            window, count, previous, estimate = sliding_window(now, period, window, count, previous)
+            if estimate + 1 > limit:
+                self._windows[key] = (window, count, previous, period)
+                return False, _retry_after(now, period, limit, count, previous)
+            self._windows[key] = (window, count + 1, previous, period)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        return True, 0
+
+    def sweep(self, now=None):
+        """Drops keys whose last activity no longer affects their sliding window."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for key, (window, _, _, period) in list(self._windows.items()):
+                if window < int(now // period) - 1:
+                    del self._windows[key]
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+
+
+class SQLiteBackend:
+    """
+    Host-wide store in a small SQLite file (WAL mode) so limits hold across gunicorn workers.
+
+    Each check is one short IMMEDIATE transaction on a primary-key row; stale rows are swept every
+    `sweep_every` checks.
+    """
+
+    def __init__(self, path, sweep_every=1000):
+        self.path = path
+        self.sweep_every = sweep_every
+        self._checks = 0
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                'key TEXT PRIMARY KEY, window INTEGER NOT NULL, count INTEGER NOT NULL, previous INTEGER NOT NULL, '
+                'period INTEGER NOT NULL)'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT window, count, previous FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            window, count, previous = row if row else (0, 0, 0)
+            window, count, previous, estimate = sliding_window(now, period, window, count, previous)
+            allowed = estimate + 1 <= limit
+            connection.execute(
+                'INSERT INTO rate_limits (key, window, count, previous, period) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET window = excluded.window, count = excluded.count, '
+                'previous = excluded.previous, period = excluded.period',
+                (key, window, count + 1 if allowed else count, previous, period),
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._checks += 1
+        if self._checks % self.sweep_every == 0:
+            self.sweep(now)
+        if allowed:
+            return True, 0
+        return False, _retry_after(now, period, limit, count, previous)
+
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        self._connect().execute('DELETE FROM rate_limits WHERE window < CAST(? / period AS INTEGER) - 1', (now,))
+
+    def reset(self):
+        self._connect().execute('DELETE FROM rate_limits')
+
+
+class RateLimiter:
+    """Flask extension holding the configured backend and parsed rules."""
+
+    def __init__(self, app=None):
+        self.backend = LocalBackend()
+        self.enabled = True
+        self.rules = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in RATE_LIMIT_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        if app.config['RATELIMIT_BACKEND'] == 'sqlite':
+            path = app.config['RATELIMIT_SQLITE_PATH'] or os.path.join(app.instance_path, 'ratelimit.db')
+            self.backend = SQLiteBackend(path)
+        else:
+            self.backend = LocalBackend()
+        self.rules = {
+            key[len('RATELIMIT_'):].lower(): parse_rule(value)
+            for key, value in app.config.items()
+            if key.startswith('RATELIMIT_') and ('_PER_IP' in key or '_PER_ACCOUNT' in key) and value
+        }
+        app.extensions['rate_limiter'] = self
+
+    def check(self, scope, kind, identifier):
+        """This function counts one attempt against rule '<scope>_per_<kind>'.
+        Returns: (allowed, retry_after_seconds) (tuple)
+        """
+        rule = self.rules.get(f'{scope}_per_{kind}')
+        if rule is None or not identifier:
+            return True, 0
+        limit, period = rule
+        return self.backend.hit(f'{scope}:{kind}:{identifier}', limit, period)
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limit(scope, account_field='email'):
+    """
+    Decorator limiting POSTs to a view per client IP and per submitted account.
+    param scope: Rule prefix, e.g. 'login' uses RATELIMIT_LOGIN_PER_IP / RATELIMIT_LOGIN_PER_ACCOUNT (str)
+    param account_field: Form field identifying the account (str)
+
+    Rejections return a bare 429 before the view runs: no template, no database, no hashing.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST' and rate_limiter.enabled:
+                allowed, retry_after = rate_limiter.check(scope, 'ip', request.remote_addr)
+                if allowed:
+                    account = normalize_email(request.form.get(account_field))
+                    allowed, retry_after = rate_limiter.check(scope, 'account', account)
+                if not allowed:
+                    return "Too many attempts, please try again later.", 429, {'Retry-After': str(retry_after)}
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
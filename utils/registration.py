@@ -0,0 +1,70 @@
+# utils/registration.py
+# Keeps track of whether registration is still open (i.e. the bootstrap admin has not been created yet).
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+from models.user import User
+from utils.db_routing import read_replica
+
+
+class RegistrationState:
+    """
+    Process-wide cache of the "bootstrap admin exists" check.
+
+    Registration only ever moves from open to closed, so once a user is seen the answer is cached for the
+    life of the process and the login page stops querying the user table for it.
+    """
+
+    def __init__(self):
+        self._closed = False
+
+    def is_closed(self, primary=False):
+        """
+        This function returns True once any user exists.
+        param primary: Ask the primary database instead of a replica (bool). Decisions that grant a role must
+            pass True: a lagging replica would still report "open" after the bootstrap admin was created.
+        Returns: (bool)
+        """
+        if self._closed:
+            return True
+        # EXISTS-style probe instead of COUNT(*): stops at the first row
+        if primary:
+            exists = self._user_exists()
+        else:
+            with read_replica():
+                exists = self._user_exists()
+        if exists:
+            self._closed = True
+        return self._closed
+
+    @staticmethod
+    def _user_exists():
+        return db.session.execute(db.select(User.id).limit(1)).first() is not None
+
+    def mark_closed(self):
+        self._closed = True
+
+    def reset(self):
+        """Forgets the cached state, e.g. after the user table has been emptied."""
+        self._closed = False
+
+
+registration_state = RegistrationState()
+
+
+@event.listens_for(Session, 'after_flush')
+def _remember_new_users(session, flush_context):
+    if any(isinstance(obj, User) for obj in session.new):
+        session.info['registration_user_created'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _close_registration_on_commit(session):
+    if session.info.pop('registration_user_created', False):
+        registration_state.mark_closed()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_new_users(session, previous_transaction):
+    session.info.pop('registration_user_created', None)
@@ -0,0 +1,115 @@
+# utils/reset_tokens.py
+# Single-use password reset tokens: each token carries the user's password epoch and a random id (jti) that
+# is recorded in the PasswordResetRedemptions table when the token is used.
+import secrets
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+from models import db
+from models.password_reset import PasswordResetRedemption
+
+
+RESET_TOKEN_SALT = 'password-reset-salt'
+
+RESET_TOKEN_DEFAULTS = {
+    'RESET_TOKEN_MAX_AGE': 3600,        # seconds a reset link stays valid
+    'RESET_TOKEN_SWEEP_EVERY': 100,     # sweep expired redemptions after this many redemptions (per process)
+    'RESET_TOKEN_SWEEP_BATCH': 500,     # rows deleted per sweep statement, keeps each write transaction short
+}
+
+ResetClaim = namedtuple('ResetClaim', 'email password_epoch jti expires_at')
+
+
+class ResetTokens:
+    """
+    Issues and redeems password reset tokens.
+
+    A token is only accepted while the user's password epoch still matches (any password change voids every
+    outstanding link) and its jti has not been redeemed. Redemption rows are only needed until the token
+    would have expired on its own, so they are deleted in small batches by expires_at (indexed), which keeps
+    the table bounded by the reset traffic of the last RESET_TOKEN_MAX_AGE seconds.
+    """
+
+    def __init__(self, app=None):
+        self._redemptions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in RESET_TOKEN_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        # Built once per app instead of once per request
+        app.extensions['reset_tokens'] = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=RESET_TOKEN_SALT)
+
+    @staticmethod
+    def _serializer():
+        return current_app.extensions['reset_tokens']
+
+    def generate(self, email, password_epoch):
+        """This function creates a reset token bound to the user's current password epoch.
+        param email: The user's email (str)
+        param password_epoch: `User.password_epoch` at the time the link is issued (int)
+        Returns: The signed token (str)
+        """
+        payload = {'e': email, 'p': password_epoch or 0, 'j': secrets.token_urlsafe(12)}
+        return self._serializer().dumps(payload)
+
+    def verify(self, token):
+        """This function checks the token's signature and age (not whether it was already used).
+        param token: The token from the reset link (str)
+        Returns: The token's claims (ResetClaim)
+        Raises: SignatureExpired or BadSignature, as `URLSafeTimedSerializer.loads`
+        """
+        max_age = current_app.config['RESET_TOKEN_MAX_AGE']
+        payload, issued_at = self._serializer().loads(token, max_age=max_age, return_timestamp=True)
+        # Links issued before tokens carried an epoch are not single-use; refuse them
+        if not isinstance(payload, dict) or not {'e', 'p', 'j'} <= payload.keys():
+            raise BadSignature('Unsupported reset token payload')
+        expires_at = issued_at.replace(tzinfo=None) + timedelta(seconds=max_age)
+        return ResetClaim(payload['e'], payload['p'], payload['j'], expires_at)
+
+    def is_redeemed(self, jti):
+        """Returns True if the token id has already been used (bool)."""
+        return db.session.get(PasswordResetRedemption, jti) is not None
+
+    def redeem(self, claim):
+        """
+        This function records the token as used in the current session; the caller commits.
+        A concurrent redemption of the same token fails that commit with an IntegrityError (primary key).
+        """
+        db.session.add(PasswordResetRedemption(jti=claim.jti, expires_at=claim.expires_at))
+        self._redemptions += 1
+
+    def maybe_sweep(self):
+        """Runs sweep() every RESET_TOKEN_SWEEP_EVERY redemptions, so cleanup needs no scheduler."""
+        if self._redemptions >= current_app.config['RESET_TOKEN_SWEEP_EVERY']:
+            self._redemptions = 0
+            self.sweep()
+
+    def sweep(self, now=None):
+        """This function deletes redemptions whose tokens have expired anyway.
+        Returns: Number of rows deleted (int)
+        """
+        now = now or datetime.utcnow()
+        batch_size = current_app.config['RESET_TOKEN_SWEEP_BATCH']
+        deleted = 0
+        while True:
+            expired = (
+                db.select(PasswordResetRedemption.jti)
+                .where(PasswordResetRedemption.expires_at < now)
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = db.session.execute(
+                db.delete(PasswordResetRedemption).where(PasswordResetRedemption.jti.in_(expired))
+            )
+            db.session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+
+
+reset_tokens = ResetTokens()
@@ -0,0 +1,324 @@
+# utils/server_session.py
+# Server-side Flask sessions: the cookie carries an opaque id, the data lives in the Sessions table behind a
+# per-process LRU.
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from models import db
+from models.session import UserSession
+
+
+SERVER_SESSION_DEFAULTS = {
+    'SESSION_CACHE_SIZE': 10000,      # sessions kept per process
+    'SESSION_CACHE_TTL': 15,          # seconds; bounds how long another worker's logout can go unnoticed here
+    'SESSION_TOUCH_INTERVAL': 60,     # seconds between last-seen updates of one session
+    'SESSION_TOUCH_BATCH': 200,       # pending last-seen updates written in one executemany
+    'SESSION_SWEEP_EVERY': 1000,      # writes between sweeps of expired sessions
+    'SESSION_SWEEP_BATCH': 500,
+}
+
+_serializer = TaggedJSONSerializer()
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """The session dict; `sid` is None until the first save of a non-empty session."""
+
+    def __init__(self, initial=None, sid=None, user_id=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.loaded_user_id = user_id  # to rotate the id when the logged-in user changes
+        self.modified = False
+        self.accessed = False
+
+
+def _session_user_id(session):
+    # Flask-Login keeps '<user id>:<epoch>' under '_user_id'
+    user_id, _, _ = str(session.get('_user_id') or '').partition(':')
+    return int(user_id) if user_id.isdigit() else None
+
+
+class SessionStore:
+    """
+    Sessions table access with a bounded LRU in front.
+
+    Reads hit the table only on a cache miss. Requests that do not change the session only record a
+    last-seen time in memory; those are written in one executemany per SESSION_TOUCH_BATCH sessions (or
+    when the oldest pending one is SESSION_TOUCH_INTERVAL old). Expired rows are ignored when read and
+    deleted in batches every SESSION_SWEEP_EVERY writes. All writes use their own short transaction,
+    never the request's db.session.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()   # sid -> (data, user_id, expires_at, last_seen, cached_until)
+        self._pending = {}              # sid -> last_seen waiting to be written
+        self._pending_since = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.config = dict(SERVER_SESSION_DEFAULTS)
+        self.lifetime = timedelta(days=31)
+
+    def configure(self, app):
+        self.config = {key: app.config[key] for key in SERVER_SESSION_DEFAULTS}
+        self.lifetime = app.permanent_session_lifetime
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self._pending_since = None
+
+    # Cache
+
+    def _cache(self, sid, data, user_id, expires_at, last_seen):
+        with self._lock:
+            self._entries[sid] = (data, user_id, expires_at, last_seen, time.monotonic() + self.config['SESSION_CACHE_TTL'])
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.config['SESSION_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+
+    def _cached(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None or entry[4] < time.monotonic():
+                self._entries.pop(sid, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sid)
+            self.hits += 1
+            return entry
+
+    # Reads and writes
+
+    def load(self, sid):
+        """This function returns (data, user_id) for a live session, or None if it is unknown or expired (tuple)."""
+        now = datetime.utcnow()
+        entry = self._cached(sid)
+        if entry is None:
+            table = UserSession.__table__
+            with db.engine.connect() as connection:
+                row = connection.execute(
+                    db.select(table.c.data, table.c.user_id, table.c.expires_at, table.c.last_seen)
+                    .where(table.c.id == sid)
+                ).first()
+            if row is None:
+                return None
+            entry = tuple(row)
+            self._cache(sid, *entry)
+        data, user_id, expires_at, last_seen = entry[:4]
+        if expires_at <= now:
+            # Lazy expiry: an expired session reads as missing; the sweep removes the row
+            self.discard(sid)
+            return None
+        if now - last_seen >= timedelta(seconds=self.config['SESSION_TOUCH_INTERVAL']):
+            self._touch(sid, now, data, user_id)
+        return data, user_id
+
+    def save(self, sid, data, user_id, new):
+        now = datetime.utcnow()
+        expires_at = now + self.lifetime
+        table = UserSession.__table__
+        with db.engine.begin() as connection:
+            if new:
+                connection.execute(table.insert().values(
+                    id=sid, data=data, user_id=user_id, created_at=now, last_seen=now, expires_at=expires_at
+                ))
+            else:
+                connection.execute(
+                    table.update().where(table.c.id == sid)
+                    .values(data=data, user_id=user_id, last_seen=now, expires_at=expires_at)
+                )
+        self._cache(sid, data, user_id, expires_at, now)
+        with self._lock:
+            self._pending.pop(sid, None)
+        self._count_write()
+
+    def delete(self, sid):
+        table = UserSession.__table__
+        with db.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.id == sid))
+        self.discard(sid)
+
+    def delete_user(self, user_id):
+        """This function ends every session of a user, e.g. on "log out everywhere".
+        Returns: Number of sessions deleted (int)
+
+        Other processes stop serving their cached copies within SESSION_CACHE_TTL.
+        """
+        table = UserSession.__table__
+        with db.engine.begin() as connection:
+            deleted = connection.execute(table.delete().where(table.c.user_id == user_id)).rowcount
+        with self._lock:
+            for sid in [sid for sid, entry in self._entries.items() if entry[1] == user_id]:
+                del self._entries[sid]
+                self._pending.pop(sid, None)
+        return deleted
+
+    def discard(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+            self._pending.pop(sid, None)
+
+    # Batched last-seen updates
+
+    def _touch(self, sid, now, data, user_id):
+        expires_at = now + self.lifetime
+        self._cache(sid, data, user_id, expires_at, now)
+        with self._lock:
+            self._pending[sid] = now
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            due = (len(self._pending) >= self.config['SESSION_TOUCH_BATCH']
+                   or time.monotonic() - self._pending_since >= self.config['SESSION_TOUCH_INTERVAL'])
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Writes pending last-seen times (and the matching expiry) in one executemany."""
+        with self._lock:
+            pending, self._pending, self._pending_since = self._pending, {}, None
+        if not pending:
+            return
+        table = UserSession.__table__
+        with db.engine.begin() as connection:
+            connection.execute(
+                table.update().where(table.c.id == db.bindparam('sid'))
+                .values(last_seen=db.bindparam('seen'), expires_at=db.bindparam('expires')),
+                [{'sid': sid, 'seen': seen, 'expires': seen + self.lifetime} for sid, seen in pending.items()],
+            )
+        self._count_write()
+
+    # Expiry
+
+    def _count_write(self):
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.config['SESSION_SWEEP_EVERY'] == 0
+        if due:
+            self.sweep()
+
+    def sweep(self, now=None):
+        """This function deletes expired sessions in batches.
+        Returns: Number of rows deleted (int)
+        """
+        now = now or datetime.utcnow()
+        table = UserSession.__table__
+        batch_size = self.config['SESSION_SWEEP_BATCH']
+        deleted = 0
+        while True:
+            expired = db.select(table.c.id).where(table.c.expires_at < now).limit(batch_size).scalar_subquery()
+            with db.engine.begin() as connection:
+                count = connection.execute(table.delete().where(table.c.id.in_(expired))).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    def collect(self):
+        """Metrics collector (see utils.metrics.MetricsRegistry.add_collector)."""
+        with self._lock:
+            size, hits, misses = len(self._entries), self.hits, self.misses
+        return [
+            ('session_cache_size', 'gauge', 'Server-side sessions held in this process.', {(): size}),
+            ('session_cache_lookups_total', 'counter', 'Session cache lookups by result.', {
+                (('result', 'hit'),): hits,
+                (('result', 'miss'),): misses,
+            }),
+        ]
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by SessionStore.
+
+    A request without a session cookie never touches the database. The id is rotated whenever the
+    logged-in user changes (login, logout), so a pre-login id can never become an authenticated one.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            record = self.store.load(sid)
+            if record is not None:
+                data, user_id = record
+                return ServerSideSession(_serializer.loads(data), sid=sid, user_id=user_id)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app))
+            return
+
+        user_id = _session_user_id(session)
+        sid = session.sid
+        if sid is not None and user_id != session.loaded_user_id:
+            self.store.delete(sid)
+            sid = None
+        new = sid is None
+        if new:
+            sid = secrets.token_urlsafe(32)
+        if new or session.modified:
+            self.store.save(sid, _serializer.dumps(dict(session)), user_id, new)
+
+        if new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def end_user_sessions(user_id):
+    """This function ends every server-side session of a user; a no-op with cookie sessions.
+    param user_id: The user whose sessions to delete (int)
+    Returns: Number of sessions deleted (int)
+    """
+    sessions = current_app.extensions.get('server_sessions')
+    return sessions.store.delete_user(user_id) if sessions is not None else 0
+
+
+class ServerSessions:
+    """Flask extension replacing the signed-cookie session with ServerSessionInterface."""
+
+    def __init__(self, app=None):
+        self.store = SessionStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in SERVER_SESSION_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.store.configure(app)
+        app.session_interface = ServerSessionInterface(self.store)
+        app.extensions['server_sessions'] = self
+
+
+server_sessions = ServerSessions()
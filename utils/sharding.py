@@ -0,0 +1,388 @@
+# utils/sharding.py
+# Optional hash-sharded user store: UserDetails rows live on one of N databases, chosen by a stable hash of the
+# normalized email, and every user id carries its shard so an id alone finds the row.
+import hashlib
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup, with_appcontext
+from flask.json.tag import TaggedJSONSerializer
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.orm import object_session
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+from models import db
+from models.audit import AuditEvent
+from models.session import UserSession
+from models.user import User, normalize_email
+from utils.db_routing import RoutingSession, engine_options
+
+
+USER_SHARD_DEFAULTS = {
+    # One URI per shard, e.g. ('sqlite:///users-0.db', 'sqlite:///users-1.db'); empty keeps users in the main database.
+    # Append to grow (then `flask shards rebalance`); never reorder.
+    'USER_SHARD_URIS': (),
+}
+
+SHARD_BIND_PREFIX = '__users_'
+# Shard s hands out ids s * SHARD_ID_SPAN + 1 .. (s + 1) * SHARD_ID_SPAN, so shard 0 keeps unsharded ids as they are
+SHARD_ID_SPAN = 1 << 40
+# session.info key: {shard: last id handed out by the flush in progress}
+FLUSH_IDS_KEY = 'user_shard_flush_ids'
+
+
+def jump_hash(key, buckets):
+    """This function maps a 64-bit key to a bucket with Lamping & Veach's jump consistent hash.
+    Returns: Bucket in range(buckets); going from N to N + 1 buckets only moves 1/(N + 1) of the keys (int)
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_email(email, count):
+    """This function returns the shard of an email address (the same for every process and Python version).
+    param email: Email address, in any case (str)
+    param count: Number of shards (int)
+    Returns: Shard index (int)
+    """
+    normalized = normalize_email(email) or ''
+    key = int.from_bytes(hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest(), 'big')
+    return jump_hash(key, count)
+
+
+def shard_for_id(user_id):
+    """Returns the shard a user id was issued by (int)."""
+    return (int(user_id) - 1) // SHARD_ID_SPAN
+
+
+def id_range(shard):
+    """Returns the first and last user id of a shard (tuple)."""
+    return shard * SHARD_ID_SPAN + 1, (shard + 1) * SHARD_ID_SPAN
+
+
+def bind_key(shard):
+    return f'{SHARD_BIND_PREFIX}{shard}'
+
+
+def shard_count():
+    """Returns the number of user shards, 0 when the user store is not sharded (int)."""
+    state = current_app.extensions.get('user_shards') if has_app_context() else None
+    return state['count'] if state else 0
+
+
+def allocate_ids(connection, shard, count, after=0):
+    """
+    This function reserves `count` new user ids on a shard.
+    param connection: Connection to that shard, inside the transaction that inserts the rows (Connection)
+    param after: An id already handed out but not inserted yet; the new ids come after it (int)
+    Returns: The ids (range)
+
+    Ids follow the highest one in the shard's range; two concurrent inserts can pick the same id, in which
+    case one fails on the primary key and can be retried (registration and imports are rare and short).
+    """
+    low, high = id_range(shard)
+    table = User.__table__
+    current = connection.execute(select(func.max(table.c.id)).where(table.c.id.between(low, high))).scalar()
+    start = max(current or low - 1, after) + 1
+    if start + count - 1 > high:
+        raise RuntimeError(f'User shard {shard} has run out of ids')
+    return range(start, start + count)
+
+
+def _is_user_table(mapper):
+    return mapper is not None and mapper.local_table is User.__table__
+
+
+def _flush_shard(mapper, instance):
+    # RoutingSession.connection_callable: where a flushed object is written (None: the usual bind)
+    if not _is_user_table(mapper):
+        return None
+    if instance.id is not None:
+        return bind_key(shard_for_id(instance.id))
+    return bind_key(shard_for_email(instance.email_normalized, shard_count()))
+
+
+def _comparison_shards(orm_context, count):
+    # Shards the WHERE clause restricts a User statement to, from top-level ANDed `id` / `email_normalized`
+    # equality and IN comparisons; None if it does not (the statement then runs on every shard)
+    where = getattr(orm_context.statement, 'whereclause', None)
+    if where is None:
+        return None
+    conjuncts = where.clauses if isinstance(where, BooleanClauseList) and where.operator is operators.and_ \
+        else (where,)
+    params = orm_context.parameters if isinstance(orm_context.parameters, dict) else {}
+    shards = None
+    for clause in conjuncts:
+        if not isinstance(clause, BinaryExpression) or clause.operator not in (operators.eq, operators.in_op):
+            continue
+        column, bind = clause.left, clause.right
+        if not isinstance(bind, BindParameter) or getattr(column, 'table', None) is not User.__table__:
+            continue
+        value = params.get(bind.key, bind.effective_value)
+        values = value if clause.operator is operators.in_op else (value,)
+        if column.key == 'id':
+            found = {shard_for_id(v) for v in values if v is not None}
+        elif column.key == 'email_normalized':
+            found = {shard_for_email(v, count) for v in values}
+        else:
+            continue
+        shards = found if shards is None else shards & found
+    return None if shards is None else sorted(s for s in shards if 0 <= s < count)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _route_user_statements(orm_context):
+    """
+    Sends ORM statements on User to their shard(s); other models are untouched.
+
+    A lookup by id or normalized email runs on exactly one shard. Anything else runs on every shard and the
+    results are concatenated in shard order (which is also id order). Bulk inserts are split per shard and
+    given ids from that shard's range. `execution_options(user_shard=n)` forces one shard.
+    """
+    count = shard_count()
+    if not count or not _is_user_table(orm_context.bind_mapper) or 'bind' in orm_context.bind_arguments:
+        return None
+    session = orm_context.session
+    engines = db.engines
+
+    if orm_context.is_insert:
+        params = orm_context.parameters
+        rows = params if isinstance(params, list) else [params]
+        groups = {}
+        for row in rows:
+            groups.setdefault(shard_for_email(row.get('email_normalized'), count), []).append(row)
+        result = None
+        for shard, group in sorted(groups.items()):
+            connection = session.connection(bind_arguments={'bind': engines[bind_key(shard)]})
+            missing = [row for row in group if row.get('id') is None]
+            for row, user_id in zip(missing, allocate_ids(connection, shard, len(missing))):
+                row['id'] = user_id
+            # Core executemany on the shard's connection in the session's transaction: the ORM bulk insert
+            # does not support per-row connections (rows are keyed by column name, as in utils.user_io)
+            result = connection.execute(User.__table__.insert(), group)
+        return result
+
+    forced = orm_context.execution_options.get('user_shard')
+    shards = [forced] if forced is not None else _comparison_shards(orm_context, count)
+    if shards is None:
+        shards = range(count)
+    elif not shards:
+        shards = [0]  # e.g. an id no configured shard issued: let shard 0 answer "no rows"
+    results = [
+        orm_context.invoke_statement(bind_arguments={**orm_context.bind_arguments, 'bind': engines[bind_key(shard)]})
+        for shard in shards
+    ]
+    return results[0] if len(results) == 1 else results[0].merge(*results[1:])
+
+
+@event.listens_for(User, 'before_insert')
+def _assign_sharded_id(mapper, connection, target):
+    # `connection` is already the shard's (see _flush_shard); reserve an id from its range. A flush runs this
+    # for every new user before inserting any of them, so ids handed out earlier in the flush are skipped too
+    count = shard_count()
+    if count and target.id is None:
+        shard = shard_for_email(target.email_normalized, count)
+        handed_out = object_session(target).info.setdefault(FLUSH_IDS_KEY, {})
+        target.id = allocate_ids(connection, shard, 1, after=handed_out.get(shard, 0))[0]
+        handed_out[shard] = target.id
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_flush_ids(session, *args):
+    # Once inserted (or rolled back) the shard's own max(id) is accurate again
+    session.info.pop(FLUSH_IDS_KEY, None)
+
+
+def remap_user_ids(mapping):
+    """
+    This function points the main database's rows that reference users at their new ids.
+    param mapping: {old user id: new user id} (dict)
+
+    AuditLog.user_id is rewritten, and so is Sessions.user_id together with the Flask-Login id ('<id>:<epoch>')
+    inside each session's data, so a moved user stays logged in and the old id can never resolve to whoever
+    is issued it next. Both tables are optional (JSONL audit sink, cookie sessions) and skipped when absent.
+    """
+    if not mapping:
+        return
+    engine = db.engines[None]
+    existing = inspect(engine)
+    old_ids = list(mapping)
+    with engine.begin() as connection:
+        if existing.has_table(AuditEvent.__tablename__):
+            table = AuditEvent.__table__
+            connection.execute(
+                table.update().where(table.c.user_id.in_(old_ids)).values(user_id=case(mapping, value=table.c.user_id))
+            )
+        if existing.has_table(UserSession.__tablename__):
+            table = UserSession.__table__
+            serializer = TaggedJSONSerializer()
+            updates = []
+            for sid, data, user_id in connection.execute(
+                select(table.c.id, table.c.data, table.c.user_id).where(table.c.user_id.in_(old_ids))
+            ):
+                values = serializer.loads(data)
+                _, _, epoch = str(values.get('_user_id') or '').partition(':')
+                values['_user_id'] = f'{mapping[user_id]}:{epoch or 0}'
+                updates.append({'sid': sid, 'new_data': serializer.dumps(values), 'new_user_id': mapping[user_id]})
+            if updates:
+                connection.execute(
+                    table.update().where(table.c.id == db.bindparam('sid'))
+                    .values(data=db.bindparam('new_data'), user_id=db.bindparam('new_user_id')),
+                    updates,
+                )
+
+
+class UserShards:
+    """Flask extension: registers one bind per USER_SHARD_URIS entry. Must be initialized before `db`."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in USER_SHARD_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        uris = app.config['USER_SHARD_URIS']
+        if not uris:
+            app.extensions.pop('user_shards', None)
+            return
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for shard, uri in enumerate(uris):
+            binds[bind_key(shard)] = {'url': uri, **engine_options(app, uri)}
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.extensions['user_shards'] = {'count': len(uris), 'flush_shard': _flush_shard}
+
+    @staticmethod
+    def create_tables():
+        """Creates the UserDetails table (and its indexes) on every shard that lacks it."""
+        for shard in range(shard_count()):
+            User.__table__.create(db.engines[bind_key(shard)], checkfirst=True)
+
+    @staticmethod
+    def counts():
+        """Returns {shard: (users, users whose email now hashes to another shard)} (dict)."""
+        count = shard_count()
+        table = User.__table__
+        counts = {}
+        for shard in range(count):
+            engine = db.engines[bind_key(shard)]
+            if not inspect(engine).has_table(table.name):
+                counts[shard] = (0, 0)
+                continue
+            with engine.connect() as connection:
+                emails = connection.execute(select(table.c.email_normalized)).scalars().all()
+            counts[shard] = (len(emails), sum(1 for email in emails if shard_for_email(email, count) != shard))
+        return counts
+
+    @staticmethod
+    def rebalance(batch_size=500, from_primary=False):
+        """
+        This function moves every user to the shard its email hashes to, e.g. after a shard was added.
+        param batch_size: Rows read, copied and deleted per step (int)
+        param from_primary: Also move the users of the unsharded UserDetails table in the main database (bool)
+        Returns: Number of users moved (int)
+
+        A moved user gets an id from the new shard's range (a user of the unsharded table moving to shard 0 keeps
+        theirs), and their audit events and server-side sessions follow it (see remap_user_ids); remember-me
+        cookies carry the old id and end. Each batch is inserted on the target, then remapped, then deleted from
+        the source, and a target that already holds the email is not written again but still remapped to the id
+        it holds, so an interrupted run can simply be repeated.
+        """
+        count = shard_count()
+        table = User.__table__
+        sources = [(shard, db.engines[bind_key(shard)]) for shard in range(count)]
+        primary = db.engines[None]
+        if from_primary and all(str(engine.url) != str(primary.url) for _, engine in sources):
+            sources.insert(0, (None, primary))
+
+        moved = 0
+        for source_shard, source in sources:
+            last_id = 0
+            while True:
+                with source.connect() as connection:
+                    rows = connection.execute(
+                        select(table).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+                    ).mappings().all()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                groups = {}
+                for row in rows:
+                    target = shard_for_email(row['email_normalized'], count)
+                    if target != source_shard:
+                        groups.setdefault(target, []).append(dict(row))
+                for target, group in groups.items():
+                    source_ids = [row['id'] for row in group]
+                    low, high = id_range(target)
+                    with db.engines[bind_key(target)].begin() as connection:
+                        present = dict(connection.execute(
+                            select(table.c.email_normalized, table.c.id)
+                            .where(table.c.email_normalized.in_([row['email_normalized'] for row in group]))
+                        ).all())
+                        copies = [row for row in group if row['email_normalized'] not in present]
+                        # Ids already inside the target's range (unsharded users moving to shard 0) are kept
+                        taken = set(connection.execute(
+                            select(table.c.id).where(table.c.id.in_([row['id'] for row in copies]))
+                        ).scalars())
+                        renumbered = [row for row in copies if not low <= row['id'] <= high or row['id'] in taken]
+                        for row, user_id in zip(renumbered, allocate_ids(connection, target, len(renumbered))):
+                            row['id'] = user_id
+                        if copies:
+                            connection.execute(table.insert(), copies)
+                    new_ids = {row['email_normalized']: row['id'] for row in copies}
+                    new_ids.update(present)
+                    remap_user_ids({
+                        old_id: new_ids[row['email_normalized']]
+                        for old_id, row in zip(source_ids, group) if new_ids[row['email_normalized']] != old_id
+                    })
+                    with source.begin() as connection:
+                        connection.execute(table.delete().where(table.c.id.in_(source_ids)))
+                    moved += len(group)
+        return moved
+
+
+user_shards = UserShards()
+
+
+shards_cli = AppGroup('shards', help='Manage the sharded user store (USER_SHARD_URIS).')
+
+
+def _require_shards():
+    if not shard_count():
+        raise click.ClickException('USER_SHARD_URIS is not set; the user store is not sharded.')
+
+
+@shards_cli.command('init')
+@with_appcontext
+def init_command():
+    """Create the UserDetails table on every shard."""
+    _require_shards()
+    user_shards.create_tables()
+    click.echo(f'{shard_count()} shard(s) ready.')
+
+
+@shards_cli.command('status')
+@with_appcontext
+def status_command():
+    """Show users per shard and how many belong elsewhere."""
+    _require_shards()
+    for shard, (users, misplaced) in user_shards.counts().items():
+        click.echo(f'shard {shard}: {users} user(s), {misplaced} to move')
+
+
+@shards_cli.command('rebalance')
+@click.option('--from-primary', is_flag=True, help='Also migrate the users of the unsharded main database.')
+@click.option('--batch-size', type=click.IntRange(1), default=500, show_default=True)
+@with_appcontext
+def rebalance_command(from_primary, batch_size):
+    """Move users to the shard their email hashes to (after adding a shard, or to migrate to sharding)."""
+    _require_shards()
+    user_shards.create_tables()
+    moved = user_shards.rebalance(batch_size, from_primary)
+    click.echo(f'Moved {moved} user(s). Moved users have new ids and must log in again.')
@@ -0,0 +1,142 @@
+# utils/templating.py
+# Template compilation caching shared by every worker, startup prewarming, and render-once email bodies.
+import os
+import re
+import secrets
+import threading
+
+from flask import current_app, render_template
+from jinja2 import FileSystemBytecodeCache, TemplateError
+from markupsafe import Markup, escape
+
+
+TEMPLATE_DEFAULTS = {
+    'TEMPLATE_BYTECODE_CACHE': True,       # compiled templates on disk, shared by every worker on the host
+    'TEMPLATE_CACHE_DIR': None,            # defaults to Jinja's per-user directory under the system temp dir
+    'TEMPLATE_PREWARM': None,              # compile every template in create_app(); None means "unless testing"
+    'TEMPLATE_EMAIL_FRAGMENTS': True,      # render_email() renders each email template once, then only substitutes
+    'TEMPLATE_FRAGMENT_CACHE_SIZE': 256,
+}
+
+
+class FragmentTemplate:
+    """
+    A template rendered once, split into static text around its per-recipient variables.
+
+    render() is a join over the static fragments and the escaped variable values, so sending the same
+    email to many recipients costs string concatenation instead of a template render.
+    """
+
+    def __init__(self, parts, autoescape):
+        self.parts = parts  # static strings, and (name,) tuples where a variable goes
+        self.autoescape = autoescape
+
+    def render(self, values):
+        quote = escape if self.autoescape else str
+        return ''.join(part if isinstance(part, str) else str(quote(values[part[0]])) for part in self.parts)
+
+    @classmethod
+    def compile(cls, template_name, variables, context):
+        """This function renders `template_name` with placeholders in place of `variables`.
+        Returns: The split template, or None if the template does more than print those variables (FragmentTemplate)
+
+        The template is rendered twice with different placeholders; if substituting the second set into the
+        first render does not reproduce the second render exactly (e.g. a variable is used in an `if` or
+        a filter), the template cannot be split and callers fall back to render_template().
+        """
+        first, second = (
+            {name: Markup(f'\x00{secrets.token_hex(8)}\x00') for name in variables} for _ in range(2)
+        )
+        rendered = render_template(template_name, **context, **first)
+        by_marker = {str(marker): name for name, marker in first.items()}
+        pieces = re.split('(' + '|'.join(re.escape(marker) for marker in by_marker) + ')', rendered) \
+            if by_marker else [rendered]
+        parts = []
+        for i, piece in enumerate(pieces):
+            if i % 2:
+                parts.append((by_marker[piece],))
+            elif piece:
+                parts.append(piece)
+
+        env = current_app.jinja_env
+        autoescape = env.autoescape(template_name) if callable(env.autoescape) else env.autoescape
+        template = cls(parts, autoescape)
+        if template.render(second) != render_template(template_name, **context, **second):
+            return None
+        return template
+
+
+class TemplateCache:
+    """Flask extension: Jinja bytecode cache, prewarming and the email fragment cache."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in TEMPLATE_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        if app.config['TEMPLATE_BYTECODE_CACHE']:
+            directory = app.config['TEMPLATE_CACHE_DIR']
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # With no directory Jinja picks (and permission-checks) one outside the source tree
+            # Jinja writes each entry to a temporary file and renames it, so workers can share the directory
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+        app.extensions['templates'] = {'fragments': {}, 'lock': threading.Lock()}
+        prewarm = app.config['TEMPLATE_PREWARM']
+        if prewarm or (prewarm is None and not app.testing):
+            self.prewarm(app)
+
+    @staticmethod
+    def prewarm(app):
+        """This function compiles every HTML template into Jinja's in-memory cache (and the bytecode cache).
+        Returns: Number of templates compiled (int)
+        """
+        env = app.jinja_env
+        compiled = 0
+        with app.app_context():
+            for name in env.list_templates(filter_func=lambda name: name.endswith('.html')):
+                try:
+                    env.get_template(name)
+                    compiled += 1
+                except TemplateError as e:
+                    app.logger.warning(f'Could not precompile template {name}: {e}')
+        return compiled
+
+
+template_cache = TemplateCache()
+
+_MISSING = object()
+
+
+def render_email(template_name, per_recipient, **shared):
+    """
+    This function renders an email body, rendering the template itself only once per set of `shared` values.
+    param template_name: Template to render (str)
+    param per_recipient: Variables that differ per recipient, e.g. {'name': ..., 'reset_url': ...} (dict)
+    param shared: Variables that are the same for every recipient, e.g. current_year; must be hashable
+    Returns: The rendered body (str)
+
+    Anything else the template reads (request, current_user, ...) is frozen at the first render, so email
+    templates should only use `per_recipient` and `shared`.
+    Falls back to a plain render_template() when TEMPLATE_EMAIL_FRAGMENTS is off, when templates are
+    auto-reloaded (debug), or when the template uses a per-recipient variable for more than output.
+    """
+    app = current_app
+    if not app.config['TEMPLATE_EMAIL_FRAGMENTS'] or app.jinja_env.auto_reload:
+        return render_template(template_name, **shared, **per_recipient)
+
+    state = app.extensions['templates']
+    key = (template_name, tuple(sorted(per_recipient)), tuple(sorted(shared.items())))
+    fragments = state['fragments']
+    template = fragments.get(key, _MISSING)
+    if template is _MISSING:
+        template = FragmentTemplate.compile(template_name, per_recipient, shared)
+        with state['lock']:
+            if len(fragments) >= app.config['TEMPLATE_FRAGMENT_CACHE_SIZE']:
+                fragments.clear()
+            fragments[key] = template
+    if template is None:
+        return render_template(template_name, **shared, **per_recipient)
+    return template.render(per_recipient)
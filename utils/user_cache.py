@@ -0,0 +1,192 @@
+# utils/user_cache.py
+# Per-process LRU/TTL cache of slim user principals used by the Flask-Login user_loader.
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+from models.user import User
+from utils.db_routing import read_primary
+from utils.permissions import role_mask
+
+
+USER_CACHE_DEFAULTS = {
+    'USER_CACHE_SIZE': 10000,   # principals kept per process
+    'USER_CACHE_TTL': 60,       # seconds; also bounds how stale another worker's copy can get
+}
+
+
+class UserPrincipal(UserMixin):
+    """
+    The read-only view of a user that `current_user` resolves to on authenticated requests.
+
+    Carries just what templates and access checks need; code that changes the user loads the full
+    `User` row with `db.session.get(User, current_user.id)`.
+    """
+    __slots__ = ('id', 'email', 'first_name', 'last_name', 'role', 'role_mask', 'password_epoch')
+
+    def __init__(self, id, email, first_name, last_name, role, password_epoch):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+        self.role_mask = role_mask(role)  # precomputed so access checks are a single AND
+        self.password_epoch = password_epoch or 0
+
+    def get_id(self):
+        return f'{self.id}:{self.password_epoch}'
+
+    def __repr__(self):
+        return f'<UserPrincipal {self.id} {self.email}>'
+
+
+def parse_session_id(session_id):
+    """This function splits a Flask-Login id of the form '<user id>:<password epoch>'.
+    param session_id: The id stored in the session or remember cookie (str)
+    Returns: (user_id, epoch) or (None, None) if malformed; ids from before epochs existed map to epoch 0 (tuple)
+    """
+    user_id, _, epoch = str(session_id).partition(':')
+    try:
+        return int(user_id), int(epoch or 0)
+    except ValueError:
+        return None, None
+
+
+class UserCache:
+    """Bounded LRU of UserPrincipal objects with a TTL, plus hit/miss counters."""
+
+    def __init__(self, maxsize=USER_CACHE_DEFAULTS['USER_CACHE_SIZE'], ttl=USER_CACHE_DEFAULTS['USER_CACHE_TTL']):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        for key, value in USER_CACHE_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.maxsize = app.config['USER_CACHE_SIZE']
+        self.ttl = app.config['USER_CACHE_TTL']
+        self.clear()
+        app.extensions['user_cache'] = self
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal):
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def collect(self):
+        """Metrics collector (see utils.metrics.MetricsRegistry.add_collector)."""
+        stats = self.stats()
+        return [
+            ('user_cache_size', 'gauge', 'Principals held in this process.', {(): stats['size']}),
+            ('user_cache_lookups_total', 'counter', 'user_loader cache lookups by result.', {
+                (('result', 'hit'),): stats['hits'],
+                (('result', 'miss'),): stats['misses'],
+            }),
+            ('user_cache_evictions_total', 'counter', 'Principals evicted by the LRU bound.', {(): stats['evictions']}),
+            ('user_cache_invalidations_total', 'counter', 'Principals dropped after a user change.',
+             {(): stats['invalidations']}),
+        ]
+
+    def load(self, session_id):
+        """
+        This function resolves a Flask-Login id to a principal, hitting the database only on a cache miss.
+        param session_id: '<user id>:<password epoch>' (str)
+        Returns: The principal, or None if the user is gone or the password changed since login (UserPrincipal)
+
+        Epochs only grow. A session newer than the cached (or replica) copy means that copy is stale, e.g. the
+        password was changed through another worker: the entry is dropped and the primary is asked once before
+        the session is rejected. A session older than the copy is rejected right away, without a query.
+        """
+        user_id, epoch = parse_session_id(session_id)
+        if user_id is None:
+            return None
+        principal = self.get(user_id)
+        if principal is None:
+            principal = self._fetch(user_id)
+        if principal is not None and principal.password_epoch > epoch:
+            return None
+        if principal is not None and principal.password_epoch < epoch:
+            self.invalidate(user_id)
+            with read_primary():
+                principal = self._fetch(user_id)
+            if principal is not None and principal.password_epoch != epoch:
+                return None
+        return principal
+
+    def _fetch(self, user_id):
+        row = db.session.execute(
+            db.select(User.id, User.email, User.first_name, User.last_name, User.role, User.password_epoch)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        principal = UserPrincipal(*row)
+        self.put(principal)
+        return principal
+
+
+user_cache = UserCache()
+
+
+# Any committed change to a user (password, role, names, deletion) drops that user's cached principal
+
+@event.listens_for(Session, 'after_flush')
+def _remember_changed_users(session, flush_context):
+    changed = {obj.id for obj in (session.dirty | session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault('user_cache_invalidate', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('user_cache_invalidate', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_changed_users(session, previous_transaction):
+    session.info.pop('user_cache_invalidate', None)
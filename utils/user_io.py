@@ -0,0 +1,194 @@
+# utils/user_io.py
+# Bulk user import/export (`flask users import|export`) streaming CSV or JSON Lines.
+import csv
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+
+import click
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import insert
+
+from models import db
+from models.user import User, normalize_email, normalize_name
+from utils.password_hashing import generate_hash, configured_method, SALT_LENGTH
+from utils.permissions import ROLE_HIERARCHY
+
+
+IMPORT_FIELDS = ('email', 'first_name', 'last_name', 'role', 'phone_number', 'password', 'password_hash')
+EXPORT_FIELDS = ('id', 'email', 'first_name', 'last_name', 'role', 'phone_number')
+
+ImportStats = namedtuple('ImportStats', 'read inserted duplicates invalid')
+
+
+def detect_format(filename, fmt=None):
+    """Returns 'csv' or 'jsonl', from `fmt` if given, else from the file extension (str)."""
+    if fmt:
+        return fmt
+    return 'jsonl' if filename.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_records(stream, fmt):
+    """This function yields one dict per input record without loading the whole file.
+    param stream: Open text stream (file)
+    param fmt: 'csv' (header row required) or 'jsonl' (str)
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _clean(record, default_role):
+    # Returns the row to insert (password still in plain text) or None if the record is unusable
+    email = normalize_email(record.get('email'))
+    first_name = (record.get('first_name') or '').strip()
+    last_name = (record.get('last_name') or '').strip()
+    role = (record.get('role') or default_role).strip()
+    if not email or '@' not in email or len(email) > 320 or not first_name or not last_name:
+        return None
+    if role not in ROLE_HIERARCHY or not (record.get('password') or record.get('password_hash')):
+        return None
+    return {
+        'email': record['email'].strip(),
+        'email_normalized': email,
+        'first_name': first_name,
+        'last_name': last_name,
+        'name_normalized': normalize_name(first_name, last_name),
+        'role': role,
+        'phone_number': record.get('phone_number') or None,
+        'password': record.get('password_hash') or None,
+        '_plain': record.get('password') if not record.get('password_hash') else None,
+    }
+
+
+def import_users(records, batch_size=1000, workers=None, default_role='User', method=None):
+    """
+    This function inserts new users from an iterable of records, one transaction per batch.
+    param records: Dicts with IMPORT_FIELDS; `password_hash` is stored as is, `password` is hashed (iterable)
+    param batch_size: Rows per INSERT ... executemany and commit (int)
+    param workers: Hashing processes, 0 to hash in this process; defaults to the CPU count (int)
+    param default_role: Role for records without one (str)
+    param method: Hash method, defaults to PASSWORD_HASH_METHOD (str)
+    Returns: Counts of records read, inserted, skipped as duplicates and skipped as invalid (ImportStats)
+
+    Emails are deduplicated on `email_normalized`, against the table (one IN query per batch) and within the
+    input. Plain-text passwords of each batch are hashed in parallel across a process pool.
+    """
+    method = method or configured_method()
+    workers = os.cpu_count() if workers is None else workers
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    seen = set()
+    read = inserted = duplicates = invalid = 0
+    try:
+        for batch in _batches(records, batch_size):
+            read += len(batch)
+            rows = []
+            for record in batch:
+                row = _clean(record, default_role)
+                if row is None:
+                    invalid += 1
+                elif row['email_normalized'] in seen:
+                    duplicates += 1
+                else:
+                    seen.add(row['email_normalized'])
+                    rows.append(row)
+
+            existing = set(db.session.execute(
+                db.select(User.email_normalized).where(User.email_normalized.in_([r['email_normalized'] for r in rows]))
+            ).scalars()) if rows else set()
+            duplicates += sum(1 for r in rows if r['email_normalized'] in existing)
+            rows = [r for r in rows if r['email_normalized'] not in existing]
+
+            to_hash = [r for r in rows if r['_plain'] is not None]
+            passwords = [r.pop('_plain') for r in to_hash]
+            for r in rows:
+                r.pop('_plain', None)
+            if pool is not None:
+                chunksize = max(1, len(passwords) // (workers * 4))
+                hashes = pool.map(generate_hash, passwords, repeat(method), repeat(SALT_LENGTH), chunksize=chunksize)
+            else:
+                hashes = (generate_hash(p, method, SALT_LENGTH) for p in passwords)
+            for row, hashed in zip(to_hash, hashes):
+                row['password'] = hashed
+
+            if rows:
+                db.session.execute(insert(User), rows)
+                db.session.commit()
+                inserted += len(rows)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return ImportStats(read, inserted, duplicates, invalid)
+
+
+def export_users(stream, fmt, batch_size=1000, include_hashes=False):
+    """
+    This function writes every user to `stream`, fetching `batch_size` rows at a time through a
+    server-side cursor so memory use does not grow with the table.
+    param include_hashes: Also export password hashes as `password_hash`, for moving accounts between
+        deployments with `flask users import` (bool)
+    Returns: Number of rows written (int)
+    """
+    fields = EXPORT_FIELDS + (('password_hash',) if include_hashes else ())
+    columns = [getattr(User, field) for field in EXPORT_FIELDS] + ([User.password] if include_hashes else [])
+    result = db.session.execute(
+        db.select(*columns).order_by(User.id).execution_options(stream_results=True, yield_per=batch_size)
+    )
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        write = writer.writerow
+    else:
+        def write(row):
+            stream.write(json.dumps(dict(zip(fields, row))) + '\n')
+    written = 0
+    for partition in result.partitions():
+        for row in partition:
+            write(row)
+        written += len(partition)
+    return written
+
+
+users_cli = AppGroup('users', help='Bulk import and export user accounts.')
+
+
+@users_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=click.IntRange(1), default=1000, show_default=True)
+@click.option('--workers', type=click.IntRange(0), default=None, help='Hashing processes [default: CPU count].')
+@click.option('--role', 'default_role', type=click.Choice(ROLE_HIERARCHY), default='User', show_default=True,
+              help='Role for records without one.')
+@with_appcontext
+def import_command(source, fmt, batch_size, workers, default_role):
+    """Create users from a CSV or JSONL file ('-' for stdin), skipping emails that already exist."""
+    fmt = detect_format(source.name, fmt)
+    stats = import_users(read_records(source, fmt), batch_size, workers, default_role)
+    click.echo(
+        f'Read {stats.read}, inserted {stats.inserted}, skipped {stats.duplicates} duplicate(s) '
+        f'and {stats.invalid} invalid record(s).'
+    )
+
+
+@users_cli.command('export')
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=click.IntRange(1), default=1000, show_default=True)
+@click.option('--include-hashes', is_flag=True, help='Include password hashes (handle the file as a secret).')
+@with_appcontext
+def export_command(target, fmt, batch_size, include_hashes):
+    """Write every user to a CSV or JSONL file ('-' for stdout)."""
+    written = export_users(target, detect_format(target.name, fmt), batch_size, include_hashes)
+    if target.name != '<stdout>':
+        click.echo(f'Exported {written} user(s).')
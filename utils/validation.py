@@ -0,0 +1,121 @@
+# utils/validation.py
+# Shared email / phone number validation with a bounded LRU of normalized results.
+import threading
+from collections import OrderedDict
+
+import email_validator
+
+
+VALIDATION_DEFAULTS = {
+    'VALIDATION_CACHE_SIZE': 4096,        # normalized results (and rejections) kept per process
+    'VALIDATION_OFFLINE': True,           # never resolve email domains (no DNS deliverability lookups)
+    'PHONE_DEFAULT_REGION': None,         # e.g. 'GB' to accept national numbers; None requires +<country code>
+}
+
+
+class InvalidValue(ValueError):
+    """Raised with a user-facing message when an email address or phone number is rejected."""
+
+
+class ValidationService:
+    """
+    Validates and normalizes email addresses and phone numbers, memoizing the outcome.
+
+    Results depend only on the input (and the config), so a resubmitted form or a repeated login is a
+    dictionary lookup. Rejections are cached too, except an undeliverable domain, which can be a transient
+    DNS failure. phonenumbers is imported on the first phone number, and it only loads the metadata of the
+    regions it actually sees, so processes that never validate one do not pay for it.
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()   # (kind, value, option) -> (valid, normalized value or error message)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.config = dict(VALIDATION_DEFAULTS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, value in VALIDATION_DEFAULTS.items():
+            app.config.setdefault(key, value)
+        self.config = {key: app.config[key] for key in VALIDATION_DEFAULTS}
+        self.clear()
+        app.extensions['validation'] = self
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            entry, cacheable = compute()
+            with self._lock:
+                self.misses += 1
+                if cacheable:
+                    self._entries[key] = entry
+                    while len(self._entries) > self.config['VALIDATION_CACHE_SIZE']:
+                        self._entries.popitem(last=False)
+        valid, value = entry
+        if not valid:
+            raise InvalidValue(value)
+        return value
+
+    def email(self, value):
+        """This function validates an email address (syntax only in offline mode).
+        param value: The submitted address (str)
+        Returns: The address with its domain normalized (str)
+        Raises: InvalidValue
+        """
+        check_deliverability = not self.config['VALIDATION_OFFLINE']
+
+        def compute():
+            try:
+                result = email_validator.validate_email(value, check_deliverability=check_deliverability)
+            except email_validator.EmailUndeliverableError:
+                return (False, 'Invalid email address.'), False
+            except email_validator.EmailNotValidError:
+                return (False, 'Invalid email address.'), True
+            return (True, getattr(result, 'normalized', None) or result.email), True
+
+        return self._lookup(('email', value, check_deliverability), compute)
+
+    def phone_number(self, value):
+        """This function validates a phone number.
+        param value: The submitted number, with +<country code> unless PHONE_DEFAULT_REGION is set (str)
+        Returns: The number in E.164 format (str)
+        Raises: InvalidValue
+        """
+        region = self.config['PHONE_DEFAULT_REGION']
+
+        def compute():
+            import phonenumbers  # deferred: the library and its metadata are only loaded when needed
+            try:
+                number = phonenumbers.parse(value, region)  # None lets the library detect the region from +<cc>
+            except phonenumbers.NumberParseException:
+                return (False, 'Invalid phone number format.'), True
+            if not phonenumbers.is_valid_number(number):
+                return (False, 'Invalid phone number.'), True
+            return (True, phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)), True
+
+        return self._lookup(('phone', value, region), compute)
+
+    def collect(self):
+        """Metrics collector (see utils.metrics.MetricsRegistry.add_collector)."""
+        with self._lock:
+            size, hits, misses = len(self._entries), self.hits, self.misses
+        return [
+            ('validation_cache_size', 'gauge', 'Memoized email/phone validation results.', {(): size}),
+            ('validation_cache_lookups_total', 'counter', 'Validation cache lookups by result.', {
+                (('result', 'hit'),): hits,
+                (('result', 'miss'),): misses,
+            }),
+        ]
+
+
+validation = ValidationService()
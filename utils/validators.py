@@ -1,12 +1,27 @@
 # validators.py
 
-import phonenumbers
 from wtforms.validators import ValidationError
 
+from utils.breached_passwords import breached_passwords
+from utils.validation import validation, InvalidValue
+
+
+def EmailValidator(form, field):
+    # Memoized, and offline unless VALIDATION_OFFLINE is turned off (see utils.validation)
+    try:
+        validation.email(field.data or '')
+    except InvalidValue as e:
+        raise ValidationError(str(e))
+
+
 def PhoneNumberValidator(form, field):
     try:
-        input_number = phonenumbers.parse(field.data, None)  # 'None' lets the library detect the region
-        if not phonenumbers.is_valid_number(input_number):
-            raise ValidationError('Invalid phone number.')
-    except phonenumbers.NumberParseException:
-        raise ValidationError('Invalid phone number format.')
+        validation.phone_number(field.data or '')
+    except InvalidValue as e:
+        raise ValidationError(str(e))
+
+
+def BreachedPasswordValidator(form, field):
+    # Local index lookup (see utils.breached_passwords); passes when no index is installed
+    if field.data and breached_passwords.is_breached(field.data):
+        raise ValidationError('This password has appeared in a data breach. Please choose a different one.')